@@ -0,0 +1,249 @@
+import json
+import math
+import queue
+import threading
+import time
+import urllib.request
+from database import now_ms
+from event_bus import TOPIC_ALERT
+from metrics import get_registry
+
+# 各类活动的基础严重度(1-5), 规模每翻一倍升一级
+BASE_SEVERITY = {
+    'large_trade': 2,
+    'rapid_trades': 2,
+    'price_manipulation': 3,
+}
+MAX_SEVERITY = 5
+
+
+def assign_severity(activity_type, magnitude=1):
+    base = BASE_SEVERITY.get(activity_type, 2)
+    return min(MAX_SEVERITY, base + int(math.log2(max(magnitude, 1))))
+
+
+class DatabaseSink:
+    """写入 suspicious_activities 表, 每批一个事务"""
+    name = 'database'
+
+    def __init__(self, db):
+        self.db = db
+
+    def write(self, alerts):
+        self.db.add_suspicious_activities([
+            (a['token_address'], a['timestamp'], a['activity_type'], a['description'], a['severity'])
+            for a in alerts
+        ])
+
+    def close(self):
+        # 在投递线程上调用, 关闭该线程打开的数据库连接
+        self.db.close_connection()
+
+
+class JsonlSink:
+    """追加写入 JSONL 文件, 每行一条警报"""
+    name = 'jsonl'
+
+    def __init__(self, path='token_alerts.jsonl'):
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def write(self, alerts):
+        self._file.write(''.join(json.dumps(a, ensure_ascii=False) + '\n' for a in alerts))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class EventBusSink:
+    """发布到事件总线的 alert 主题, 界面在推送模式下订阅"""
+    name = 'event_bus'
+
+    def __init__(self, event_bus):
+        self.event_bus = event_bus
+
+    def write(self, alerts):
+        for alert in alerts:
+            self.event_bus.publish(TOPIC_ALERT, alert)
+
+    def close(self):
+        pass
+
+
+class WebhookSink:
+    """
+    把一批警报以 JSON 数组 POST 到本地 webhook
+    请求在独立线程中发送, 慢或不可用的 webhook 不会拖住数据库、日志和界面输出; 积压过多时丢弃新的批次
+    """
+    name = 'webhook'
+
+    def __init__(self, url, timeout=5, queue_size=100):
+        self.url = url
+        self.timeout = timeout
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self.stats = {'sent': 0, 'errors': 0, 'dropped': 0}
+        self._m_sink_errors = get_registry().counter('alert_sink_errors_total', '警报输出失败的批次数')
+
+    def write(self, alerts):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._send_loop, name="alert-webhook")
+            self._thread.daemon = True
+            self._thread.start()
+        try:
+            self._queue.put_nowait(alerts)
+        except queue.Full:
+            self.stats['dropped'] += 1
+
+    def _post(self, alerts):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(alerts, ensure_ascii=False).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            method='POST',
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+    def _send_loop(self):
+        while True:
+            alerts = self._queue.get()
+            if alerts is None:
+                break
+            try:
+                self._post(alerts)
+                self.stats['sent'] += 1
+            except Exception as e:
+                self.stats['errors'] += 1
+                self._m_sink_errors.inc()
+                print(f"警报输出 {self.name} 失败: {e}")
+
+    def close(self):
+        """尽量发送完积压的批次; 最多等待两次请求超时, webhook 不可用时不会拖住退出"""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        self._thread.join(self.timeout * 2)
+        self._thread = None
+
+
+class AlertManager:
+    """
+    警报去重与异步投递
+    同一 (代币, 活动类型) 在冷却期内只发出一次, 期间严重度升高时立即再发;
+    检测线程只做去重和入队, 投递线程把警报成批交给各个输出
+    """
+
+    def __init__(self, sinks, cooldown=300, queue_size=10000, batch_size=500):
+        self.sinks = list(sinks)
+        self.cooldown = cooldown  # 秒
+        self.batch_size = batch_size
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._last = {}  # {(token_address, activity_type): [上次发出的时间(秒), 严重度, 被抑制的次数]}
+        self._lock = threading.Lock()
+        self._last_prune = time.monotonic()
+        self._thread = None
+        self.stats = {'reported': 0, 'emitted': 0, 'suppressed': 0, 'dropped': 0, 'delivered': 0, 'sink_errors': 0}
+
+        registry = get_registry()
+        self._m_emitted = registry.counter('alerts_emitted_total', '去重后发出的警报数')
+        self._m_suppressed = registry.counter('alerts_suppressed_total', '冷却期内被抑制的检测数')
+        self._m_sink_errors = registry.counter('alert_sink_errors_total', '警报输出失败的批次数')
+        registry.gauge('alerts_pending', '等待投递的警报数', fn=self._queue.qsize)
+
+    def report(self, token_address, token_name, detections, now=None):
+        """提交一次检测结果, detections 为 [{'activity_type', 'description', 'magnitude', ...}]"""
+        now = time.monotonic() if now is None else now
+        for detection in detections:
+            activity_type = detection['activity_type']
+            severity = assign_severity(activity_type, detection.get('magnitude', 1))
+            key = (token_address, activity_type)
+            with self._lock:
+                self.stats['reported'] += 1
+                last = self._last.get(key)
+                if last is not None and now - last[0] < self.cooldown and severity <= last[1]:
+                    last[2] += 1
+                    self.stats['suppressed'] += 1
+                    self._m_suppressed.inc()
+                    continue
+                suppressed = last[2] if last is not None else 0
+                self._last[key] = [now, severity, 0]
+            alert = dict(detection, token_address=token_address, token_name=token_name,
+                         severity=severity, suppressed=suppressed, timestamp=now_ms())
+            alert.pop('magnitude', None)
+            try:
+                self._queue.put_nowait(alert)
+            except queue.Full:
+                self.stats['dropped'] += 1
+                continue
+            self.stats['emitted'] += 1
+            self._m_emitted.inc()
+        if now - self._last_prune > self.cooldown:
+            self._prune(now)
+
+    def _prune(self, now):
+        # 冷却期已过的记录不再影响去重, 停止活动的代币不会一直占用内存
+        with self._lock:
+            self._last_prune = now
+            for key in [k for k, last in self._last.items() if now - last[0] >= self.cooldown]:
+                del self._last[key]
+
+    def _deliver(self, alerts):
+        for sink in self.sinks:
+            try:
+                sink.write(alerts)
+            except Exception as e:
+                self.stats['sink_errors'] += 1
+                self._m_sink_errors.inc()
+                print(f"警报输出 {sink.name} 失败: {e}")
+        self.stats['delivered'] += len(alerts)
+
+    def _deliver_loop(self):
+        while True:
+            alert = self._queue.get()
+            if alert is None:
+                break
+            batch = [alert]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    alert = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if alert is None:
+                    stop = True
+                    break
+                batch.append(alert)
+            self._deliver(batch)
+            if stop:
+                break
+        self._close_sinks()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._deliver_loop, name="alert-delivery")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """投递完队列中剩余的警报后关闭输出"""
+        if self._thread is None:
+            self._close_sinks()
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def _close_sinks(self):
+        # 由投递线程在退出前调用, 输出打开的连接属于该线程
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception as e:
+                print(f"关闭警报输出 {sink.name} 失败: {e}")
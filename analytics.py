@@ -0,0 +1,306 @@
+import threading
+import time
+from database import now_ms
+from metrics import get_registry
+
+# numpy 是可选依赖, 在 available() 中才导入, 不启用批量分析的进程不加载它; 没有安装时扫描器不启用批量分析
+np = None
+
+# 每笔交易保存的列及其类型
+COLUMNS = (
+    ('timestamp', 'int64'),     # 毫秒
+    ('trader', 'int32'),        # 代币内的交易者编号
+    ('side', 'int8'),           # 0 买, 1 卖
+    ('token_amount', 'float64'),
+    ('sol_amount', 'float64'),
+    ('v_sol', 'float64'),       # 交易后的联合曲线储备
+    ('v_tokens', 'float64'),
+)
+
+# 综合分数 = sum(权重 * 特征), 特征见 TradeAnalytics.compute
+DEFAULT_WEIGHTS = {
+    'abs_imbalance': 2.0,
+    'hhi': 3.0,
+    'max_price_impact': 10.0,
+    'large_trades': 0.5,
+    'log_volume_sol': 1.0,
+}
+
+
+def available():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return False
+        np = numpy
+    return True
+
+
+class TokenSeries:
+    """
+    单个代币的交易列数组
+    容量不够时先丢弃保留期之外的旧交易, 仍然不够才按两倍扩容
+    """
+
+    def __init__(self, capacity=256):
+        self.size = 0
+        self.traders = {}  # {trader_address: 编号}
+        for name, dtype in COLUMNS:
+            setattr(self, name, np.empty(capacity, dtype))
+
+    @property
+    def capacity(self):
+        return len(self.timestamp)
+
+    def append(self, timestamp, trader_address, side, token_amount, sol_amount, v_sol, v_tokens, keep_after=None):
+        if self.size == self.capacity:
+            if keep_after is not None:
+                self.trim(keep_after)
+            if self.size > self.capacity * 3 // 4:
+                self._resize(self.capacity * 2)
+        trader = self.traders.get(trader_address)
+        if trader is None:
+            trader = self.traders[trader_address] = len(self.traders)
+        i = self.size
+        self.timestamp[i] = timestamp
+        self.trader[i] = trader
+        self.side[i] = side
+        self.token_amount[i] = token_amount
+        self.sol_amount[i] = sol_amount
+        self.v_sol[i] = v_sol
+        self.v_tokens[i] = v_tokens
+        self.size = i + 1
+
+    def _resize(self, capacity):
+        for name, dtype in COLUMNS:
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def trim(self, before):
+        """丢弃时间早于 before(毫秒) 的交易, 返回丢弃的行数"""
+        start = int(np.searchsorted(self.timestamp[:self.size], before))
+        if start == 0:
+            return 0
+        remaining = self.size - start
+        for name, _ in COLUMNS:
+            column = getattr(self, name)
+            column[:remaining] = column[start:self.size]
+        self.size = remaining
+        return start
+
+    def window(self, since):
+        """时间不早于 since 的各列视图"""
+        start = int(np.searchsorted(self.timestamp[:self.size], since))
+        return {name: getattr(self, name)[start:self.size] for name, _ in COLUMNS}
+
+
+def _segment_ends(starts, total):
+    return np.append(starts[1:], total)
+
+
+class TradeAnalytics:
+    """
+    监控代币的向量化交易分析
+    每个代币的交易保存在可增长的列数组中, 定时把所有代币窗口内的交易拼接成一批,
+    用分段归约一次算出全部代币的特征和综合分数
+    """
+
+    def __init__(self, window=300, interval=5.0, large_trade_sol=10.0, weights=None, on_scores=None):
+        if not available():
+            raise RuntimeError("交易分析需要 numpy, 请先安装: pip install numpy")
+        self.window = window                # 秒, 特征只统计最近这段时间的交易
+        self.interval = interval            # 秒, 定时计算的间隔
+        self.large_trade_sol = large_trade_sol
+        self.weights = dict(DEFAULT_WEIGHTS if weights is None else weights)
+        self.on_scores = on_scores          # 回调: on_scores(tokens, features)
+
+        self._series = {}  # {token_address: TokenSeries}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.latest = ([], {})
+        self.stats = {'trades': 0, 'runs': 0, 'trimmed': 0}
+
+        registry = get_registry()
+        registry.gauge('analytics_tokens', '参与批量分析的代币数', fn=lambda: len(self._series))
+        self._m_seconds = registry.histogram('analytics_score_seconds', '一次批量计算全部代币特征的耗时')
+
+    def add_trade(self, trade_info):
+        """由检测阶段对监控代币的每笔交易调用"""
+        timestamp = trade_info['timestamp']
+        token_address = trade_info['token_address']
+        with self._lock:
+            series = self._series.get(token_address)
+            if series is None:
+                series = self._series[token_address] = TokenSeries()
+            series.append(
+                timestamp,
+                trade_info['trader_address'],
+                1 if trade_info['type'] == 'sell' else 0,
+                trade_info['token_amount'] or 0.0,
+                trade_info['sol_amount'] or 0.0,
+                trade_info.get('v_sol') or 0.0,
+                trade_info.get('v_tokens') or 0.0,
+                keep_after=timestamp - self.window * 1000,
+            )
+            self.stats['trades'] += 1
+
+    def remove(self, token_address):
+        with self._lock:
+            self._series.pop(token_address, None)
+
+    def _collect(self, since, tokens=None):
+        """在锁内把各代币窗口内的交易拷贝成一批, 返回 (代币列表, 每个代币的行数, 拼接后的列)"""
+        with self._lock:
+            if tokens is None:
+                items = list(self._series.items())
+            else:
+                items = [(t, self._series[t]) for t in tokens if t in self._series]
+            names, lengths, parts = [], [], {name: [] for name, _ in COLUMNS}
+            for token_address, series in items:
+                window = series.window(since)
+                n = len(window['timestamp'])
+                if n == 0:
+                    continue
+                names.append(token_address)
+                lengths.append(n)
+                for name, column in window.items():
+                    parts[name].append(column)
+            if not names:
+                return names, None, None
+            columns = {name: np.concatenate(chunks) for name, chunks in parts.items()}
+        return names, np.array(lengths, dtype=np.int64), columns
+
+    def compute(self, now=None, tokens=None):
+        """
+        计算代币在最近 window 秒内的特征, 返回 (代币列表, {特征名: 数组})
+        数组与代币列表一一对应, 窗口内没有交易的代币不出现在结果中
+        """
+        now = now_ms() if now is None else now
+        names, lengths, c = self._collect(now - self.window * 1000, tokens)
+        if not names:
+            return names, {}
+        k = len(names)
+        total = int(lengths.sum())
+        starts = np.zeros(k, dtype=np.int64)
+        np.cumsum(lengths[:-1], out=starts[1:])
+        ends = _segment_ends(starts, total)
+
+        sol = c['sol_amount']
+        is_buy = c['side'] == 0
+        volume_sol = np.add.reduceat(sol, starts)
+        buy_sol = np.add.reduceat(np.where(is_buy, sol, 0.0), starts)
+        sell_sol = volume_sol - buy_sol
+        imbalance = np.divide(buy_sol - sell_sol, volume_sol, out=np.zeros(k), where=volume_sol > 0)
+
+        # 联合曲线价格, 以及每笔交易相对上一笔的价格冲击(每个代币的第一笔记为 0)
+        price = np.divide(c['v_sol'], c['v_tokens'], out=np.full(total, np.nan), where=c['v_tokens'] > 0)
+        impact = np.zeros(total)
+        if total > 1:
+            ratio = np.ones(total - 1)
+            valid = np.isfinite(price[1:]) & np.isfinite(price[:-1]) & (price[:-1] > 0)
+            np.divide(price[1:], price[:-1], out=ratio, where=valid)
+            impact[1:] = np.abs(ratio - 1)
+        impact[starts] = 0.0
+        first_price = price[starts]
+        last_price = price[ends - 1]
+        price_change = np.divide(last_price, first_price, out=np.ones(k),
+                                 where=np.isfinite(first_price) & (first_price > 0)) - 1
+        price_change = np.nan_to_num(price_change, nan=0.0)
+
+        # 交易者集中度: 按 (代币, 交易者) 分组的 SOL 成交量份额
+        token_index = np.repeat(np.arange(k, dtype=np.int64), lengths)
+        keys, inverse = np.unique((token_index << 32) | c['trader'].astype(np.int64), return_inverse=True)
+        key_token = keys >> 32
+        key_volume = np.bincount(inverse, weights=sol, minlength=len(keys))
+        share = np.divide(key_volume, volume_sol[key_token], out=np.zeros(len(keys)),
+                          where=volume_sol[key_token] > 0)
+        key_starts = np.searchsorted(key_token, np.arange(k))
+
+        features = {
+            'trades': lengths,
+            'volume_sol': volume_sol,
+            'volume_tokens': np.add.reduceat(c['token_amount'], starts),
+            'buy_sol': buy_sol,
+            'sell_sol': sell_sol,
+            'imbalance': imbalance,
+            'abs_imbalance': np.abs(imbalance),
+            'price': np.nan_to_num(last_price, nan=0.0),
+            'price_change': price_change,
+            'max_price_impact': np.maximum.reduceat(impact, starts),
+            'large_trades': np.add.reduceat((sol >= self.large_trade_sol).astype(np.int64), starts),
+            'unique_traders': np.bincount(key_token, minlength=k),
+            'top_trader_share': np.maximum.reduceat(share, key_starts),
+            'hhi': np.bincount(key_token, weights=share * share, minlength=k),
+            'trade_rate': lengths / float(self.window),
+            'log_volume_sol': np.log1p(volume_sol),
+        }
+        score = np.zeros(k)
+        for name, weight in self.weights.items():
+            score += weight * features[name]
+        features['score'] = score
+        return names, features
+
+    def features(self, token_address, now=None):
+        """单个代币的特征字典, 窗口内没有交易时返回 None"""
+        names, features = self.compute(now, tokens=[token_address])
+        if not names:
+            return None
+        return {name: values[0].item() for name, values in features.items()}
+
+    def top(self, n=10, by='score'):
+        """最近一次计算结果中按某个特征排名前 n 的 [(token_address, 值)]"""
+        names, features = self.latest
+        if not names:
+            return []
+        values = features[by]
+        order = np.argsort(-values)[:n]
+        return [(names[i], values[i].item()) for i in order]
+
+    def trim(self, now=None):
+        """丢弃所有代币保留期之外的交易, 长时间没有交易的代币释放全部空间"""
+        before = (now_ms() if now is None else now) - self.window * 1000
+        with self._lock:
+            trimmed = sum(series.trim(before) for series in self._series.values())
+        self.stats['trimmed'] += trimmed
+        return trimmed
+
+    def run_once(self, now=None):
+        now = now_ms() if now is None else now
+        start = time.perf_counter()
+        self.trim(now)
+        result = self.compute(now)
+        self._m_seconds.observe(time.perf_counter() - start)
+        self.latest = result
+        self.stats['runs'] += 1
+        if self.on_scores is not None and result[0]:
+            try:
+                self.on_scores(*result)
+            except Exception as e:
+                print(f"处理分析结果时出错: {e}")
+        return result
+
+    def _score_loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"批量分析出错: {e}")
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._score_loop, name="analytics-scorer")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
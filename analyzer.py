@@ -1,12 +1,11 @@
-from googleapiclient.discovery import build
-import tweepy
 import time
 import asyncio
-import yaml
-from datetime import datetime
+from score_cache import ScoreCache
+from search_client import CustomSearchClient
+from metrics import get_registry
 
 class TokenAnalyzer:
-    def __init__(self, config_path='config.yaml'):
+    def __init__(self, config_path='config.yaml', db_path='pump_fun.db'):
         print("初始化 TokenAnalyzer...")
         
         # 加载配置
@@ -14,33 +13,52 @@ class TokenAnalyzer:
         
         # 初始化API客户端
         self.init_apis()
-        self.cache = {}
-        self.cache_duration = 300  # 缓存5分钟
+        
+        registry = get_registry()
+        self._m_api_latency = registry.histogram('analyzer_api_seconds', '外部搜索API请求耗时', {'api': 'google'})
+        self._m_api_errors = registry.counter('analyzer_api_errors_total', '外部搜索API请求失败数', {'api': 'google'})
+        
+        # 评分缓存: LRU + TTL, 持久化到扫描器使用的数据库, 重启后不再重复消耗配额
+        self.cache_duration = self.config.get('SCORE_CACHE_TTL', 300)  # 默认缓存5分钟
+        self.cache = ScoreCache(
+            max_size=self.config.get('SCORE_CACHE_SIZE', 10000),
+            ttl=self.cache_duration,
+            negative_ttl=self.config.get('SCORE_CACHE_NEGATIVE_TTL', 60),
+            db_path=db_path if self.config.get('SCORE_CACHE_PERSIST', True) else None
+        )
         
     def load_config(self, config_path):
-        """加载配置文件"""
+        """加载配置文件, config_path 为 None 时不读取配置(无评分模式)"""
+        if config_path is None:
+            return {}
         try:
+            # yaml 只在加载配置时导入
+            import yaml
             with open(config_path, 'r', encoding='utf-8') as f:
                 config = yaml.safe_load(f)
             print("成功加载配置文件")
-            return config
+            return config or {}
         except Exception as e:
+            # 没有配置时以无评分模式运行, 不影响扫描器启动
             print(f"加载配置文件失败: {e}")
-            raise
+            return {}
         
     def init_apis(self):
-        """初始化各平台API"""
+        """初始化各平台API, 没有 API Key 时进入无评分模式"""
+        self.google_api = None
+        api_key = self.config.get('GOOGLE_API_KEY')
+        if not api_key:
+            print("未配置 GOOGLE_API_KEY, 以无评分模式运行")
+            return
         try:
-            # Google API
+            # Google API: 直接请求 REST 接口, 构造时不发起网络请求
             print("正在初始化 Google API...")
-            self.google_api = build(
-                "customsearch", "v1",
-                developerKey=self.config['GOOGLE_API_KEY']
-            )
+            self.google_api = CustomSearchClient(api_key)
             print("Google API 初始化成功")
             
             # # Twitter API
             # print("正在初始化 Twitter API...")
+            # import tweepy
             # self.twitter_client = tweepy.Client(
             #     bearer_token=self.config['TWITTER_BEARER_TOKEN']
             # )
@@ -48,7 +66,18 @@ class TokenAnalyzer:
             
         except Exception as e:
             print(f"API初始化失败: {e}")
-            raise
+            self.google_api = None
+
+    def close(self):
+        """关闭评分缓存的数据库连接和搜索客户端的连接池"""
+        self.cache.close()
+        if self.google_api is not None:
+            self.google_api.close()
+
+    @property
+    def enabled(self):
+        """是否可以评分; 无评分模式下扫描器不再提交评分请求"""
+        return self.google_api is not None
             
     async def test_apis(self):
         """测试所有API是否正常工作"""
@@ -57,10 +86,7 @@ class TokenAnalyzer:
         # 测试 Google API
         try:
             print("\n测试 Google API...")
-            result = self.google_api.cse().list(
-                q="test",
-                cx=self.config['GOOGLE_SEARCH_ENGINE_ID']
-            ).execute()
+            result = self.google_api.search("test", self.config['GOOGLE_SEARCH_ENGINE_ID'])
             
             # 添加调试信息
             print("Google API 原始返回:", result)
@@ -86,15 +112,16 @@ class TokenAnalyzer:
     
     async def analyze_token_mentions(self, token_address, token_name):
         """分析代币在各平台的提及情况"""
+        if not self.enabled:
+            return {'google_mentions': 0, 'total_score': 0, 'timestamp': time.time(), 'degraded': True}
+        
         print(f"\n开始分析代币: {token_name} ({token_address})")
         
         # 检查缓存
-        if token_address in self.cache:
-            cache_age = time.time() - self.cache[token_address]['timestamp']
-            print(f"发现缓存数据，年龄: {cache_age}秒")
-            if cache_age < self.cache_duration:
-                print("使用缓存数据") 
-                return self.cache[token_address]['data']
+        cached = self.cache.get(token_address)
+        if cached is not None:
+            print(f"使用缓存数据，年龄: {time.time() - cached['timestamp']:.0f}秒")
+            return cached
         
         tasks = [
             self.get_google_mentions(token_address),
@@ -112,11 +139,8 @@ class TokenAnalyzer:
             'timestamp': time.time()
         }
         
-        # 更新缓存
-        self.cache[token_address] = {
-            'data': analysis,
-            'timestamp': time.time()
-        }
+        # 更新缓存, 零分或失败的结果使用较短的有效期
+        self.cache.set(token_address, analysis)
         
         print(f"分析完成: {analysis}")
         return analysis
@@ -125,11 +149,19 @@ class TokenAnalyzer:
         """获取Google搜索结果数量"""
         print(f"获取 Google 提及度: {token_address}")
         try:
-            result = self.google_api.cse().list(
-                q=f'"{token_address}"',
-                # cx=self.config['GOOGLE_SEARCH_ENGINE_ID']
-                cx="017576662512468239146:omuauf_lfve"
-            ).execute()
+            # search() 是阻塞的HTTP请求, 放到线程池中执行, 不阻塞事件循环
+            loop = asyncio.get_running_loop()
+            start = time.perf_counter()
+            try:
+                result = await loop.run_in_executor(
+                    None,
+                    self.google_api.search,
+                    f'"{token_address}"',
+                    # self.config['GOOGLE_SEARCH_ENGINE_ID']
+                    "017576662512468239146:omuauf_lfve"
+                )
+            finally:
+                self._m_api_latency.observe(time.perf_counter() - start)
             
             # 添加结果调试
             print("Google 搜索原始返回:", result)
@@ -140,6 +172,7 @@ class TokenAnalyzer:
             print(f"Google 提及次数: {count}")
             return count
         except Exception as e:
+            self._m_api_errors.inc()
             print(f"Google API 错误: {e}")
             print(f"错误类型: {type(e)}")
             import traceback
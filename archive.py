@@ -0,0 +1,338 @@
+import argparse
+import json
+import os
+import shutil
+import time
+from bisect import bisect_left
+from database import TokenDatabase, now_ms
+
+# numpy 是可选依赖, 只有使用归档时才需要
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DAY_MS = 86400 * 1000
+
+# 数值列及其类型
+NUMERIC_COLUMNS = (
+    ('id', 'int64'),
+    ('timestamp', 'int64'),
+    ('type', 'int8'),   # 0 买, 1 卖
+    ('token_amount', 'float64'),
+    ('sol_amount', 'float64'),
+    ('market_cap', 'float64'),
+    ('v_tokens', 'float64'),
+    ('v_sol', 'float64'),
+)
+# 字典编码的字符串列: 列文件保存 int32 编号, 字典单独保存
+DICTIONARY_COLUMNS = ('token', 'trader', 'bonding_curve')
+TRADE_TYPES = ('buy', 'sell')
+
+SELECT_ARCHIVE_SQL = '''
+    SELECT id, token_address, trader_address, timestamp, type,
+           token_amount, sol_amount, market_cap, bonding_curve,
+           v_tokens, v_sol, transaction_signature
+    FROM trades
+    WHERE timestamp < ?
+    ORDER BY id
+    LIMIT ?
+'''
+
+
+def _prefix_dir(token_address, prefix_len):
+    # 代币地址是区分大小写的 base58, 目录名用字符编码的十六进制, 在不区分大小写的文件系统上也不会冲突
+    return 'prefix=' + token_address[:prefix_len].encode('utf-8').hex()
+
+
+def _day_dir(day_index):
+    return 'day=' + time.strftime('%Y-%m-%d', time.gmtime(day_index * DAY_MS / 1000))
+
+
+class TradeArchive:
+    """
+    冷数据归档: 把超过一定时间的交易从 SQLite 移到按天和代币地址前缀分区的列式文件
+    目录结构: root/day=YYYY-MM-DD/prefix=xx/seg-<起始id>-<结束id>/<列>.npy
+    每个分段内按 (代币, id) 排序, 字符串列字典编码, 读取时通过内存映射只加载需要的部分
+    """
+
+    def __init__(self, root='archive', db_path='pump_fun.db', prefix_len=1):
+        if np is None:
+            raise RuntimeError("交易归档需要 numpy, 请先安装: pip install numpy")
+        self.root = root
+        self.db_path = db_path
+        self.prefix_len = prefix_len
+        self._db = None
+        os.makedirs(root, exist_ok=True)
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = TokenDatabase(self.db_path)
+        return self._db
+
+    # ---- 写入 ----
+
+    def _state_path(self):
+        return os.path.join(self.root, '_pending.json')
+
+    def _write_state(self, pending):
+        tmp = self._state_path() + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(pending, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._state_path())
+
+    def _prefix_dirs(self):
+        for day in os.listdir(self.root):
+            day_path = os.path.join(self.root, day)
+            if not day.startswith('day=') or not os.path.isdir(day_path):
+                continue
+            for prefix in os.listdir(day_path):
+                prefix_path = os.path.join(day_path, prefix)
+                if os.path.isdir(prefix_path):
+                    yield prefix_path
+
+    def _chunk_segments(self, min_id, max_id):
+        name = f'seg-{min_id}-{max_id}'
+        for prefix_path in self._prefix_dirs():
+            path = os.path.join(prefix_path, name)
+            if os.path.isdir(path):
+                yield path
+
+    def _tmp_segments(self):
+        """写入中断留下的临时分段目录, 重新归档时分块范围可能不同, 不会被覆盖"""
+        for prefix_path in self._prefix_dirs():
+            for name in os.listdir(prefix_path):
+                if name.startswith('.tmp-seg-'):
+                    yield os.path.join(prefix_path, name)
+
+    def recover(self):
+        """
+        处理上次中断的归档: 如果 SQLite 中对应的行已删除, 保留分段文件;
+        否则删除写了一半的分段, 这些行下次重新归档; 临时分段目录总是删除
+        """
+        for path in list(self._tmp_segments()):
+            shutil.rmtree(path)
+        if not os.path.exists(self._state_path()):
+            return
+        with open(self._state_path(), encoding='utf-8') as f:
+            pending = json.load(f)
+        conn, cursor = self.db.get_connection()
+        cursor.execute('SELECT COUNT(*) FROM trades WHERE id BETWEEN ? AND ? AND timestamp < ?',
+                       (pending['min_id'], pending['max_id'], pending['cutoff']))
+        if cursor.fetchone()[0] > 0:
+            for path in list(self._chunk_segments(pending['min_id'], pending['max_id'])):
+                shutil.rmtree(path)
+            print(f"归档: 清理未完成的分段 {pending['min_id']}-{pending['max_id']}")
+        os.remove(self._state_path())
+
+    def _write_segment(self, path, rows):
+        """rows 已按 (代币, id) 排序"""
+        tmp = os.path.join(os.path.dirname(path), '.tmp-' + os.path.basename(path))
+        if os.path.exists(tmp):
+            shutil.rmtree(tmp)
+        os.makedirs(tmp)
+
+        columns = {
+            'id': [r[0] for r in rows],
+            'timestamp': [r[3] for r in rows],
+            'type': [1 if r[4] == 'sell' else 0 for r in rows],
+            'token_amount': [r[5] for r in rows],
+            'sol_amount': [r[6] for r in rows],
+            'market_cap': [r[7] for r in rows],
+            'v_tokens': [r[9] for r in rows],
+            'v_sol': [r[10] for r in rows],
+        }
+        for name, dtype in NUMERIC_COLUMNS:
+            np.save(os.path.join(tmp, f'{name}.npy'), np.asarray(columns[name], dtype=dtype))
+
+        for name, index in (('token', 1), ('trader', 2), ('bonding_curve', 8)):
+            values = [r[index] or '' for r in rows]
+            # 字典排序后保存, 按代币查询时可以二分查找
+            dictionary, codes = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+            np.save(os.path.join(tmp, f'{name}_dict.npy'), dictionary)
+            np.save(os.path.join(tmp, f'{name}.npy'), codes.astype('int32'))
+            if name == 'token':
+                # 行按代币排序, 第 i 个代币的行是 [offsets[i], offsets[i+1])
+                offsets = np.searchsorted(codes, np.arange(len(dictionary) + 1))
+                np.save(os.path.join(tmp, 'token_offsets.npy'), offsets.astype('int64'))
+
+        signatures = [(r[11] or '').encode('ascii') for r in rows]
+        np.save(os.path.join(tmp, 'signature.npy'), np.asarray(signatures, dtype=bytes))
+
+        with open(os.path.join(tmp, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'rows': len(rows),
+                'min_id': min(columns['id']),
+                'max_id': max(columns['id']),
+                'min_timestamp': min(columns['timestamp']),
+                'max_timestamp': max(columns['timestamp']),
+            }, f)
+        os.replace(tmp, path)
+
+    def _write_chunk(self, rows, min_id, max_id):
+        partitions = {}
+        for row in rows:
+            key = (row[3] // DAY_MS, _prefix_dir(row[1], self.prefix_len))
+            partitions.setdefault(key, []).append(row)
+        for (day_index, prefix), part in partitions.items():
+            directory = os.path.join(self.root, _day_dir(day_index), prefix)
+            os.makedirs(directory, exist_ok=True)
+            part.sort(key=lambda r: (r[1], r[0]))
+            self._write_segment(os.path.join(directory, f'seg-{min_id}-{max_id}'), part)
+        return len(partitions)
+
+    def archive(self, older_than_ms, batch_rows=200000):
+        """把早于 now - older_than_ms 的交易移入归档, 返回归档的行数"""
+        self.recover()
+        cutoff = now_ms() - older_than_ms
+        conn, cursor = self.db.get_connection()
+        total = 0
+        while True:
+            cursor.execute(SELECT_ARCHIVE_SQL, (cutoff, batch_rows))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            min_id, max_id = rows[0][0], rows[-1][0]
+            # 先记录正在归档的范围, 中断后 recover 据此判断分段是否有效
+            self._write_state({'min_id': min_id, 'max_id': max_id, 'cutoff': cutoff})
+            segments = self._write_chunk(rows, min_id, max_id)
+            with conn:
+                cursor.execute('DELETE FROM trades WHERE id BETWEEN ? AND ? AND timestamp < ?',
+                               (min_id, max_id, cutoff))
+            os.remove(self._state_path())
+            total += len(rows)
+            print(f"归档: 已移出 {len(rows)} 笔交易 (id {min_id}-{max_id}, {segments} 个分段)")
+        return total
+
+    # ---- 读取 ----
+
+    def _segments(self, start_ms=None, end_ms=None, token_address=None):
+        """按时间范围和代币前缀筛选分段目录"""
+        first_day = None if start_ms is None else _day_dir(start_ms // DAY_MS)
+        last_day = None if end_ms is None else _day_dir(end_ms // DAY_MS)
+        prefix = None if token_address is None else _prefix_dir(token_address, self.prefix_len)
+        for day in sorted(os.listdir(self.root)):
+            if not day.startswith('day='):
+                continue
+            if (first_day and day < first_day) or (last_day and day > last_day):
+                continue
+            day_path = os.path.join(self.root, day)
+            prefixes = [prefix] if prefix else sorted(os.listdir(day_path))
+            for p in prefixes:
+                prefix_path = os.path.join(day_path, p)
+                if not os.path.isdir(prefix_path):
+                    continue
+                for name in sorted(os.listdir(prefix_path)):
+                    if name.startswith('seg-'):
+                        yield os.path.join(prefix_path, name)
+
+    def scan(self, start_ms=None, end_ms=None, token_address=None, columns=None):
+        """
+        逐个分段返回列数组, 供回测等批量计算使用
+        每次返回 {列名: 数组}, 数值列是内存映射的视图(有过滤条件时为副本), 字符串列为字典编号,
+        对应的字典在 '<列名>_dict' 中, signature 为定长字节串
+        """
+        columns = columns or [name for name, _ in NUMERIC_COLUMNS] + list(DICTIONARY_COLUMNS) + ['signature']
+        for path in self._segments(start_ms, end_ms, token_address):
+            with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+                meta = json.load(f)
+            if (start_ms is not None and meta['max_timestamp'] < start_ms) or \
+                    (end_ms is not None and meta['min_timestamp'] >= end_ms):
+                continue
+
+            lo, hi = 0, meta['rows']
+            if token_address is not None:
+                tokens = np.load(os.path.join(path, 'token_dict.npy'))
+                i = bisect_left(tokens, token_address)
+                if i == len(tokens) or tokens[i] != token_address:
+                    continue
+                offsets = np.load(os.path.join(path, 'token_offsets.npy'), mmap_mode='r')
+                lo, hi = int(offsets[i]), int(offsets[i + 1])
+
+            timestamps = np.load(os.path.join(path, 'timestamp.npy'), mmap_mode='r')[lo:hi]
+            mask = None
+            if start_ms is not None or end_ms is not None:
+                mask = np.ones(hi - lo, dtype=bool)
+                if start_ms is not None:
+                    mask &= timestamps >= start_ms
+                if end_ms is not None:
+                    mask &= timestamps < end_ms
+                if not mask.any():
+                    continue
+                if mask.all():
+                    mask = None
+
+            segment = {}
+            for name in columns:
+                array = np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')[lo:hi]
+                segment[name] = array if mask is None else array[mask]
+                if name in DICTIONARY_COLUMNS:
+                    segment[f'{name}_dict'] = np.load(os.path.join(path, f'{name}_dict.npy'))
+            yield segment
+
+    def read_trades(self, token_address, start_ms=None, end_ms=None):
+        """某个代币的归档交易, 行格式与 TokenDatabase.get_token_trades 相同, 按 id 升序"""
+        rows = []
+        for seg in self.scan(start_ms, end_ms, token_address,
+                             ['id', 'trader', 'timestamp', 'type', 'token_amount', 'sol_amount', 'market_cap',
+                              'signature', 'v_tokens', 'v_sol']):
+            traders = seg['trader_dict'][seg['trader']]
+            for i in range(len(seg['id'])):
+                side = TRADE_TYPES[seg['type'][i]]
+                amount = float(seg['token_amount'][i])
+                v_tokens = float(seg['v_tokens'][i])
+                rows.append((
+                    int(seg['id'][i]), token_address, str(traders[i]), int(seg['timestamp'][i]), side,
+                    amount, float(seg['sol_amount'][i]), float(seg['market_cap'][i]),
+                    amount if side == 'buy' else -amount,
+                    seg['signature'][i].decode('ascii'),
+                    float(seg['v_sol'][i]) / v_tokens if v_tokens > 0 else None,
+                ))
+        rows.sort(key=lambda r: r[0])
+        return rows
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+class TieredTradeStore:
+    """合并查询: 近期交易来自 SQLite, 更早的交易来自归档"""
+
+    def __init__(self, db, archive):
+        self.db = db
+        self.archive = archive
+
+    def get_token_trades(self, token_address, start_ms=None, end_ms=None):
+        live = self.db.get_token_trades_between(token_address, start_ms, end_ms)
+        archived = self.archive.read_trades(token_address, start_ms, end_ms)
+        if not archived:
+            return live
+        # 归档过程中断时同一行可能同时存在于两层, 以 SQLite 中的为准
+        live_ids = {row[0] for row in live}
+        merged = [row for row in archived if row[0] not in live_ids] + live
+        merged.sort(key=lambda r: r[0])
+        return merged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='把旧交易从 SQLite 归档到列式文件')
+    parser.add_argument('--db', default='pump_fun.db')
+    parser.add_argument('--root', default='archive', help='归档目录')
+    parser.add_argument('--older-than-hours', type=float, default=48, help='归档早于这么多小时的交易')
+    parser.add_argument('--batch-rows', type=int, default=200000)
+    args = parser.parse_args(argv)
+
+    archive = TradeArchive(args.root, args.db)
+    start = time.perf_counter()
+    total = archive.archive(int(args.older_than_hours * 3600 * 1000), args.batch_rows)
+    archive.close()
+    print(f"归档完成: {total} 笔交易, 耗时 {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
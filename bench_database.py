@@ -0,0 +1,276 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from database import TokenDatabase
+
+# 合成数据的起始时间(毫秒)和相邻交易的时间间隔
+BASE_TIMESTAMP = 1700000000000
+TRADE_INTERVAL_MS = 10
+TRADES_PER_TOKEN = 20
+TRADER_POOL = 100000
+
+
+class SyntheticData:
+    """按固定随机种子生成代币和交易, 同样的参数每次生成的数据相同"""
+
+    def __init__(self, seed=42):
+        self.seed = seed
+
+    def token_address(self, i):
+        return f'{i:012x}{random.Random(self.seed * 1000003 + i).getrandbits(128):032x}pump'
+
+    def tokens(self, count, start=0):
+        rng = random.Random(self.seed + start)
+        for i in range(start, start + count):
+            yield {
+                'timestamp': BASE_TIMESTAMP + i * TRADE_INTERVAL_MS * TRADES_PER_TOKEN,
+                'token_address': self.token_address(i),
+                'token_name': f'Token {i}',
+                'token_symbol': f'T{i % 100000}',
+                'market_cap': rng.uniform(25, 500),
+                'initial_buy': rng.uniform(0, 1e8),
+                'v_tokens': rng.uniform(8e8, 1.07e9),
+                'v_sol': rng.uniform(30, 100),
+            }
+
+    def trades(self, count, token_count, start=0):
+        rng = random.Random(self.seed * 7 + start)
+        for i in range(start, start + count):
+            token_index = min(i // TRADES_PER_TOKEN, token_count - 1)
+            yield {
+                'timestamp': BASE_TIMESTAMP + i * TRADE_INTERVAL_MS,
+                'token_address': self.token_address(token_index),
+                'trader_address': f'trader{rng.randrange(TRADER_POOL):08d}',
+                'token_amount': rng.uniform(1e3, 1e7),
+                'sol_amount': rng.uniform(0.01, 10),
+                'market_cap': rng.uniform(25, 500),
+                'bonding_curve': f'curve{token_index:012x}',
+                'v_tokens': rng.uniform(8e8, 1.07e9),
+                'v_sol': rng.uniform(30, 100),
+                'type': 'buy' if rng.random() < 0.6 else 'sell',
+                'signature': f'{i:016x}{rng.getrandbits(256):064x}',
+            }
+
+
+def _percentiles(samples):
+    """延迟样本(秒)的分位数, 单位毫秒"""
+    if not samples:
+        return {'count': 0}
+    samples = sorted(samples)
+
+    def pick(q):
+        return round(samples[min(len(samples) - 1, int(q * len(samples)))] * 1000, 3)
+
+    return {
+        'count': len(samples),
+        'p50_ms': pick(0.50),
+        'p90_ms': pick(0.90),
+        'p99_ms': pick(0.99),
+        'max_ms': round(samples[-1] * 1000, 3),
+    }
+
+
+def _rate(rows, seconds):
+    return round(rows / seconds, 1) if seconds > 0 else None
+
+
+def bench_single_inserts(db_path, data, token_count, trade_count):
+    """逐行提交: 每次 add_new_token / add_trade 一个事务"""
+    db = TokenDatabase(db_path)
+    start = time.perf_counter()
+    for token_info in data.tokens(token_count):
+        db.add_new_token(token_info)
+    token_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for trade_info in data.trades(trade_count, token_count):
+        db.add_trade(trade_info)
+    trade_seconds = time.perf_counter() - start
+    db.close()
+    return {
+        'tokens': token_count,
+        'tokens_per_second': _rate(token_count, token_seconds),
+        'trades': trade_count,
+        'trades_per_second': _rate(trade_count, trade_seconds),
+    }
+
+
+def bench_batched_inserts(db_path, data, token_count, trade_count, batch_size):
+    """批量提交: 满 batch_size 行合并成一个事务, 同时把数据库填充到目标规模"""
+    # 刷新间隔设得很长, 只按行数触发提交, 结果不受定时器影响
+    db = TokenDatabase(db_path, batch_size=batch_size, flush_interval_ms=3600 * 1000)
+    start = time.perf_counter()
+    for token_info in data.tokens(token_count):
+        db.add_new_token(token_info)
+    db.flush()
+    token_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    report_every = max(trade_count // 10, 1)
+    for n, trade_info in enumerate(data.trades(trade_count, token_count), 1):
+        db.add_trade(trade_info)
+        if n % report_every == 0:
+            print(f"  已写入 {n}/{trade_count} 笔交易")
+    db.flush()
+    trade_seconds = time.perf_counter() - start
+    db.close()
+    return {
+        'batch_size': batch_size,
+        'tokens': token_count,
+        'tokens_per_second': _rate(token_count, token_seconds),
+        'trades': trade_count,
+        'trades_per_second': _rate(trade_count, trade_seconds),
+    }
+
+
+def _writer(db_path, data, token_count, trade_start, batch_size, rate, stop, result):
+    """并发写入线程: 按扫描器的方式批量写入新交易, rate 为每秒行数, 0 表示不限速"""
+    db = TokenDatabase(db_path, batch_size=batch_size, flush_interval_ms=100)
+    written = 0
+    start = time.perf_counter()
+    trades = data.trades(10 ** 12, token_count, start=trade_start)
+    while not stop.is_set():
+        db.add_trade(next(trades))
+        written += 1
+        if rate > 0:
+            ahead = written / rate - (time.perf_counter() - start)
+            if ahead > 0:
+                time.sleep(ahead)
+    db.close()
+    result['rows'] = written
+    result['rows_per_second'] = _rate(written, time.perf_counter() - start)
+
+
+def bench_queries_under_write(db_path, data, token_count, trade_count, batch_size, write_rate, duration, tail):
+    """
+    写入线程运行期间测量读取延迟
+    读取方与界面一样使用只读连接, 增量查询从当前最大 id 往前 tail 行开始
+    """
+    stop = threading.Event()
+    writer_result = {}
+    writer = threading.Thread(
+        target=_writer, name="bench-writer",
+        args=(db_path, data, token_count, trade_count, batch_size, write_rate, stop, writer_result)
+    )
+    writer.start()
+
+    reader = TokenDatabase(db_path, read_only=True)
+    conn, cursor = reader.get_connection()
+    rng = random.Random(data.seed)
+    latencies = {'get_new_tokens': [], 'get_new_trades': [], 'get_token_trades': []}
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        cursor.execute('SELECT MAX(rowid) FROM tokens')
+        max_token_id = cursor.fetchone()[0] or 0
+        cursor.execute('SELECT MAX(id) FROM trades')
+        max_trade_id = cursor.fetchone()[0] or 0
+
+        start = time.perf_counter()
+        reader.get_new_tokens(max(max_token_id - tail, 0))
+        latencies['get_new_tokens'].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        reader.get_new_trades(max(max_trade_id - tail, 0))
+        latencies['get_new_trades'].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        reader.get_token_trades(data.token_address(rng.randrange(token_count)))
+        latencies['get_token_trades'].append(time.perf_counter() - start)
+
+    stop.set()
+    writer.join()
+    reader.close()
+    return {
+        'duration_seconds': duration,
+        'tail_rows': tail,
+        'writer': writer_result,
+        'latency': {name: _percentiles(samples) for name, samples in latencies.items()},
+    }
+
+
+def run(sizes, batch_size=500, single_rows=5000, write_rate=2000, duration=10, tail=1000,
+        workdir=None, keep=False, seed=42):
+    data = SyntheticData(seed)
+    workdir = workdir or tempfile.mkdtemp(prefix='pump-db-bench-')
+    os.makedirs(workdir, exist_ok=True)
+    report = {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'config': {
+            'batch_size': batch_size,
+            'single_rows': single_rows,
+            'write_rate': write_rate,
+            'query_duration': duration,
+            'tail_rows': tail,
+            'trades_per_token': TRADES_PER_TOKEN,
+            'seed': seed,
+        },
+        'results': [],
+    }
+
+    try:
+        for size in sizes:
+            print(f"规模 {size} 行交易:")
+            token_count = max(size // TRADES_PER_TOKEN, 1)
+            result = {'trade_rows': size, 'token_rows': token_count}
+
+            # 逐行提交非常慢, 只在单独的数据库上测一小部分样本
+            single_path = os.path.join(workdir, f'single_{size}.db')
+            sample = min(single_rows, size)
+            print(f"  逐行写入 {sample} 行样本")
+            result['single_insert'] = bench_single_inserts(single_path, data, max(sample // TRADES_PER_TOKEN, 1), sample)
+            os.remove(single_path)
+
+            db_path = os.path.join(workdir, f'bench_{size}.db')
+            print(f"  批量写入 {size} 行")
+            result['batched_insert'] = bench_batched_inserts(db_path, data, token_count, size, batch_size)
+            result['db_size_mb'] = round(os.path.getsize(db_path) / 1024 / 1024, 1)
+
+            print(f"  并发写入下测量查询延迟 {duration} 秒")
+            result['queries'] = bench_queries_under_write(
+                db_path, data, token_count, size, batch_size, write_rate, duration, tail
+            )
+            report['results'].append(result)
+            if not keep:
+                for suffix in ('', '-wal', '-shm'):
+                    if os.path.exists(db_path + suffix):
+                        os.remove(db_path + suffix)
+    finally:
+        if not keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='TokenDatabase 存储性能基准测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000, 10000000],
+                        help='交易表的行数规模')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--single-rows', type=int, default=5000, help='逐行写入测试的样本行数')
+    parser.add_argument('--write-rate', type=int, default=2000, help='查询测试期间的写入速率(行/秒), 0 表示不限速')
+    parser.add_argument('--duration', type=float, default=10, help='每个规模的查询测试时长(秒)')
+    parser.add_argument('--tail', type=int, default=1000, help='增量查询从最大 id 往前的行数')
+    parser.add_argument('--workdir', help='数据库文件目录, 默认使用临时目录')
+    parser.add_argument('--keep', action='store_true', help='保留生成的数据库文件')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='bench_database.json')
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.batch_size, args.single_rows, args.write_rate, args.duration,
+                 args.tail, args.workdir, args.keep, args.seed)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"结果已写入 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+import threading
+from database import now_ms
+from metrics import get_registry
+
+# 默认维护的K线周期(秒)
+INTERVALS = (1, 60, 300)
+
+
+def bonding_curve_price(v_sol, v_tokens):
+    """由联合曲线储备计算的价格(SOL/代币), 储备无效时返回 None"""
+    if not v_tokens or v_sol is None:
+        return None
+    return v_sol / v_tokens
+
+
+class Candle:
+    """一根 OHLCV K线"""
+    __slots__ = ('start', 'open', 'high', 'low', 'close', 'volume_sol', 'volume_tokens', 'trades')
+
+    def __init__(self, start, price):
+        self.start = start
+        self.open = self.high = self.low = self.close = price
+        self.volume_sol = 0.0
+        self.volume_tokens = 0.0
+        self.trades = 0
+
+    def add(self, price, sol_amount, token_amount):
+        if price > self.high:
+            self.high = price
+        if price < self.low:
+            self.low = price
+        self.close = price
+        self.volume_sol += sol_amount
+        self.volume_tokens += token_amount
+        self.trades += 1
+
+    def row(self, token_address, interval):
+        """candles 表的一行"""
+        return (token_address, interval, self.start, self.open, self.high, self.low, self.close,
+                self.volume_sol, self.volume_tokens, self.trades)
+
+
+class CandleEngine:
+    """
+    按代币增量维护多个周期的K线
+    每个 (代币, 周期) 只在内存中保留当前未收盘的一根, 收盘的K线定时批量写入 candles 表
+    """
+
+    def __init__(self, db, intervals=INTERVALS, flush_interval=1.0, grace_ms=2000):
+        self.db = db
+        self.intervals = tuple(intervals)
+        self.flush_interval = flush_interval
+        self.grace_ms = grace_ms  # 周期结束后再等这么久才收盘, 容忍稍晚到达的交易
+
+        self._open = {}     # {(token_address, interval): Candle}
+        self._closed = []   # 待写入的行
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {'trades': 0, 'closed': 0, 'late': 0, 'flushed': 0}
+
+        registry = get_registry()
+        registry.gauge('candles_open', '内存中未收盘的K线数', fn=lambda: len(self._open))
+        self._m_flushed = registry.counter('candles_flushed_total', '写入数据库的K线数')
+
+    def update(self, trade_info):
+        """由持久化阶段对每笔入库的交易调用"""
+        price = bonding_curve_price(trade_info.get('v_sol'), trade_info.get('v_tokens'))
+        if price is None:
+            return
+        timestamp = trade_info['timestamp']
+        token_address = trade_info['token_address']
+        sol_amount = trade_info['sol_amount'] or 0.0
+        token_amount = trade_info['token_amount'] or 0.0
+        with self._lock:
+            self.stats['trades'] += 1
+            for interval in self.intervals:
+                period = interval * 1000
+                start = timestamp - timestamp % period
+                key = (token_address, interval)
+                candle = self._open.get(key)
+                if candle is None or start > candle.start:
+                    if candle is not None:
+                        self._closed.append(candle.row(token_address, interval))
+                        self.stats['closed'] += 1
+                    # 开盘价取本周期第一笔交易的价格
+                    candle = self._open[key] = Candle(start, price)
+                elif start < candle.start:
+                    # 早于当前K线的乱序交易, 所在的K线已经收盘
+                    self.stats['late'] += 1
+                    continue
+                candle.add(price, sol_amount, token_amount)
+
+    def close_expired(self, now=None):
+        """收盘周期已结束的K线, 长时间没有交易的代币不会一直占用内存"""
+        now = now_ms() if now is None else now
+        with self._lock:
+            expired = [
+                key for key, candle in self._open.items()
+                if candle.start + key[1] * 1000 + self.grace_ms <= now
+            ]
+            for key in expired:
+                self._closed.append(self._open.pop(key).row(*key))
+            self.stats['closed'] += len(expired)
+        return len(expired)
+
+    def flush(self):
+        """把收盘的K线写入数据库"""
+        with self._lock:
+            rows, self._closed = self._closed, []
+        if not rows:
+            return 0
+        try:
+            self.db.upsert_candles(rows)
+        except Exception as e:
+            print(f"写入K线失败: {e}")
+            with self._lock:
+                self._closed[:0] = rows
+            return 0
+        self.stats['flushed'] += len(rows)
+        self._m_flushed.inc(len(rows))
+        return len(rows)
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.close_expired()
+            self.flush()
+        self.db.close_connection()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._flush_loop, name="candle-flusher")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """停止时把未收盘的K线也写入, 重启后同一周期的数据会合并到这一行"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            for key, candle in self._open.items():
+                self._closed.append(candle.row(*key))
+            self._open = {}
+        self.flush()
+
+    def get_candles(self, token_address, interval, start_ms=None, end_ms=None):
+        """
+        查询K线, 包括尚未写入的和当前未收盘的
+        返回 [(start_time, open, high, low, close, volume_sol, volume_tokens, trades)], 按时间升序
+        """
+        self.flush()
+        rows = self.db.get_candles(token_address, interval, start_ms, end_ms)
+        with self._lock:
+            candle = self._open.get((token_address, interval))
+            if candle is None:
+                return rows
+            current = candle.row(token_address, interval)[2:]
+        if (start_ms is not None and current[0] < start_ms) or (end_ms is not None and current[0] >= end_ms):
+            return rows
+        if rows and rows[-1][0] == current[0]:
+            # 重启前写入过同一周期的K线, 与数据库中的合并规则一致
+            previous = rows.pop()
+            current = (
+                current[0], previous[1], max(previous[2], current[2]), min(previous[3], current[3]),
+                current[4], previous[5] + current[5], previous[6] + current[6], previous[7] + current[7],
+            )
+        rows.append(current)
+        return rows
@@ -0,0 +1,150 @@
+import random
+import threading
+import time
+import websocket
+from metrics import get_registry
+
+# 连接状态, 指标中以序号表示
+STATES = ('disconnected', 'connecting', 'connected', 'backoff', 'stopped')
+
+
+class ConnectionSupervisor:
+    """
+    维护唯一的一条 WebSocket 连接
+    所有连接都在同一个线程上依次建立; 断线后按指数退避加随机抖动重连, 用 ping/pong 检测假死连接
+    回调签名与 websocket.WebSocketApp 相同: on_open(ws), on_message(ws, message), on_close(ws, code, msg)
+    """
+
+    def __init__(self, url, on_message, on_open=None, on_close=None, on_error=None,
+                 ping_interval=15, ping_timeout=10, initial_backoff=0.1, max_backoff=30,
+                 backoff_multiplier=2, stable_after=30):
+        if ping_timeout and ping_timeout >= ping_interval:
+            raise ValueError("ping_timeout 必须小于 ping_interval")
+        self.url = url
+        self.on_message = on_message
+        self.on_open = on_open
+        self.on_close = on_close
+        self.on_error = on_error
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.backoff_multiplier = backoff_multiplier
+        self.stable_after = stable_after  # 连接保持这么久(秒)之后, 退避重新从 initial_backoff 开始
+
+        self.state = 'disconnected'
+        self.ws = None
+        self._attempt = 0
+        self._connected_at = None
+        self._disconnected_at = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {'connects': 0, 'reconnects': 0, 'disconnects': 0, 'last_reconnect_ms': None}
+
+        registry = get_registry()
+        registry.gauge('ws_connection_state', '连接状态: ' + ', '.join(f'{i}={s}' for i, s in enumerate(STATES)),
+                       fn=lambda: STATES.index(self.state))
+        registry.gauge('ws_connected_seconds', '当前连接已保持的时间',
+                       fn=lambda: time.monotonic() - self._connected_at if self._connected_at else 0)
+        self._m_reconnects = registry.counter('ws_reconnects_total', 'WebSocket重连次数')
+        self._m_disconnects = registry.counter('ws_disconnects_total', '连接失败或断开的次数')
+        self._m_reconnect_time = registry.histogram('ws_reconnect_seconds', '从断开到重新连上的耗时')
+
+    def _set_state(self, state):
+        self.state = state
+
+    def next_backoff(self):
+        """下一次重连前的等待时间: 指数增长, 在 [delay/2, delay] 之间随机抖动, 避免多个客户端同时重连"""
+        delay = min(self.max_backoff, self.initial_backoff * self.backoff_multiplier ** self._attempt)
+        self._attempt += 1
+        return random.uniform(delay / 2, delay)
+
+    def _handle_open(self, ws):
+        now = time.monotonic()
+        self._connected_at = now
+        self._set_state('connected')
+        self.stats['connects'] += 1
+        if self._disconnected_at is not None:
+            elapsed = now - self._disconnected_at
+            self.stats['reconnects'] += 1
+            self.stats['last_reconnect_ms'] = round(elapsed * 1000, 1)
+            self._m_reconnects.inc()
+            self._m_reconnect_time.observe(elapsed)
+            print(f"WebSocket已重连, 耗时 {elapsed * 1000:.0f}ms")
+            self._disconnected_at = None
+        if self.on_open:
+            self.on_open(ws)
+
+    def _handle_close(self, ws, close_status_code, close_msg):
+        if self.on_close:
+            self.on_close(ws, close_status_code, close_msg)
+
+    def _handle_error(self, ws, error):
+        if self.on_error:
+            self.on_error(ws, error)
+
+    def _run(self):
+        """连接线程: run_forever 返回即表示连接已断开, 退避后在同一线程上重连"""
+        while not self._stop.is_set():
+            self._set_state('connecting')
+            ws = websocket.WebSocketApp(
+                self.url,
+                on_open=self._handle_open,
+                on_message=self.on_message,
+                on_error=self._handle_error,
+                on_close=self._handle_close,
+            )
+            with self._lock:
+                self.ws = ws
+            try:
+                # 解码阶段会校验消息内容, 这里跳过 websocket-client 纯 Python 实现的 UTF-8 校验
+                ws.run_forever(ping_interval=self.ping_interval, ping_timeout=self.ping_timeout,
+                               skip_utf8_validation=True, reconnect=0)
+            except Exception as e:
+                print(f"WebSocket连接异常: {e}")
+            with self._lock:
+                self.ws = None
+
+            if self._connected_at is not None:
+                if time.monotonic() - self._connected_at >= self.stable_after:
+                    self._attempt = 0
+                self._connected_at = None
+            if self._stop.is_set():
+                break
+
+            self.stats['disconnects'] += 1
+            self._m_disconnects.inc()
+            if self._disconnected_at is None:
+                self._disconnected_at = time.monotonic()
+            delay = self.next_backoff()
+            self._set_state('backoff')
+            print(f"WebSocket连接断开, {delay * 1000:.0f}ms 后重连")
+            self._stop.wait(delay)
+        self._set_state('stopped')
+
+    def send(self, text):
+        with self._lock:
+            ws = self.ws
+        if ws is None or self.state != 'connected':
+            raise ConnectionError("WebSocket未连接")
+        ws.send(text)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ws-connection")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """关闭连接并等待连接线程退出"""
+        self._stop.set()
+        with self._lock:
+            ws = self.ws
+        if ws is not None:
+            ws.close()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
@@ -1,35 +1,277 @@
-from database import TokenDatabase
-from PyQt6.QtWidgets import (QMainWindow, QApplication, QTableWidget, 
-                           QTableWidgetItem, QVBoxLayout, QHBoxLayout, 
+from database import TokenDatabase, format_timestamp, now_ms
+from PyQt6.QtWidgets import (QMainWindow, QApplication, QTableView, 
+                           QVBoxLayout, QHBoxLayout, 
                            QWidget, QLabel, QLineEdit, QPushButton)
-from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtCore import Qt, QTimer, QObject, QThread, pyqtSignal, pyqtSlot
 from PyQt6.QtGui import QPalette, QColor, QFont
+from table_models import RingBufferTableModel
+from event_bus import TOPIC_TOKEN, TOPIC_TRADE, TOPIC_ALERT
+from metrics import get_registry
+from candles import bonding_curve_price
 import sys
+import copy
+import heapq
+import time
+import threading
 from datetime import datetime
 
+def token_row_from_db(token):
+    """tokens 表的一行(带 rowid)转换为代币表格行"""
+    return (
+        format_timestamp(token[4]),  # creation_time
+        token[2],  # token_name
+        token[3],  # token_symbol
+        token[1],  # token_address
+        token[5],  # market_cap
+    )
+
+
+def token_row_from_event(token_info):
+    """扫描器推送的 token_info 转换为代币表格行"""
+    return (
+        format_timestamp(token_info['timestamp']),
+        token_info['token_name'],
+        token_info['token_symbol'],
+        token_info['token_address'],
+        token_info['market_cap'],
+    )
+
+
+def format_price(price):
+    """价格通常只有 1e-8 SOL 量级, 用有效数字显示"""
+    return '' if price is None else f"{price:.4g}"
+
+
+def trade_value(token_amount, price):
+    """交易额(SOL) = 数量 x 价格"""
+    return '' if price is None else f"{float(token_amount) * price:.4f}"
+
+
+def trade_row_from_db(trade):
+    """trades 表的一行转换为交易表格行"""
+    return (
+        format_timestamp(trade[3]),  # timestamp
+        trade[1],  # token_address
+        format_price(bonding_curve_price(trade[10], trade[9])),  # v_sol / v_tokens
+        trade[5],  # token_amount
+        trade[4]   # type
+    )
+
+
+def trade_row_from_event(trade_info):
+    """扫描器推送的 trade_info 转换为交易表格行"""
+    return (
+        format_timestamp(trade_info['timestamp']),
+        trade_info['token_address'],
+        format_price(bonding_curve_price(trade_info['v_sol'], trade_info['v_tokens'])),
+        trade_info['token_amount'],
+        trade_info['type']
+    )
+
+
+def monitor_row_from_db(trade):
+    """get_token_trades 的一行转换为监控表格行"""
+    price = trade[10] if len(trade) > 10 else None
+    return (
+        format_timestamp(trade[3]),  # timestamp
+        trade[1],  # token_address
+        trade[4],  # type
+        format_price(price),
+        trade[5],  # token_amount
+        trade_value(trade[5], price),
+        trade[2],  # trader_address
+        trade[8] if len(trade) > 8 else ''  # balance_change
+    )
+
+
+def monitor_row_from_event(trade_info):
+    """扫描器推送的 trade_info 转换为监控表格行"""
+    token_amount = trade_info['token_amount']
+    price = bonding_curve_price(trade_info['v_sol'], trade_info['v_tokens'])
+    if trade_info['type'] == 'buy':
+        balance_change = token_amount
+    elif trade_info['type'] == 'sell':
+        balance_change = -token_amount
+    else:
+        balance_change = 0
+    return (
+        format_timestamp(trade_info['timestamp']),
+        trade_info['token_address'],
+        trade_info['type'],
+        format_price(price),
+        token_amount,
+        trade_value(token_amount, price),
+        trade_info['trader_address'],
+        balance_change
+    )
+
+
+def alert_row_from_event(alert):
+    """扫描器推送的警报转换为警报表格行"""
+    return (
+        format_timestamp(alert['timestamp']),
+        alert.get('token_name') or '',
+        alert['token_address'],
+        alert['activity_type'],
+        alert['severity'],
+        alert['description'],
+    )
+
+
+class EventBridge(QObject):
+    """
+    事件总线到界面的桥接
+    扫描器线程上的事件先进入缓冲区, 由界面线程的定时器每帧合并成一次信号发出
+    """
+    events_ready = pyqtSignal(list)  # [(topic, event)]
+
+    def __init__(self, event_bus, topics, frame_interval_ms=16, parent=None):
+        super().__init__(parent)
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._unsubscribers = [
+            event_bus.subscribe(topic, lambda event, topic=topic: self._on_event(topic, event))
+            for topic in topics
+        ]
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._emit_frame)
+        self._timer.start(frame_interval_ms)
+
+    def _on_event(self, topic, event):
+        # 运行在发布者线程, 只做入队
+        with self._lock:
+            self._buffer.append((topic, event))
+
+    def _emit_frame(self):
+        with self._lock:
+            if not self._buffer:
+                return
+            batch, self._buffer = self._buffer, []
+        self.events_ready.emit(batch)
+
+    def close(self):
+        self._timer.stop()
+        for unsubscribe in self._unsubscribers:
+            unsubscribe()
+
+
+class DbFetchWorker(QObject):
+    """
+    后台数据库读取
+    运行在独立线程上, 使用自己的只读连接查询, 把转换好的表格行通过信号交回界面线程
+    """
+    results_ready = pyqtSignal(object)
+
+    def __init__(self, db_path):
+        super().__init__()
+        self.db = TokenDatabase(db_path, read_only=True)
+
+    @pyqtSlot(object)
+    def fetch(self, request):
+        kind = request['kind']
+        try:
+            if kind == 'poll':
+                result = self.poll(request['last_read'], request['monitored_tokens'])
+            elif kind == 'history':
+                result = self.history(request['limit'])
+            else:
+                result = self.monitor_history(request['token_address'])
+        except Exception as e:
+            print(f"更新数据时出错: {e}")
+            result = {'error': str(e)}
+        result['kind'] = kind
+        self.results_ready.emit(result)
+
+    def poll(self, last_read, monitored_tokens):
+        """增量读取新代币、新交易和监控代币的交易"""
+        # 获取新的代币数据
+        token_rows = []
+        for token in self.db.get_new_tokens(last_read['tokens']['id'], last_read['tokens'].get('timestamp')):
+            token_rows.append(token_row_from_db(token))
+            last_read['tokens']['id'] = token[0]  # rowid
+            last_read['tokens']['timestamp'] = token[4]  # creation_time
+        
+        # 获取新的交易数据
+        trade_rows = []
+        for trade in self.db.get_new_trades(last_read['trades']['id'], last_read['trades'].get('timestamp')):
+            trade_rows.append(trade_row_from_db(trade))
+            last_read['trades']['id'] = trade[0]  # id
+            last_read['trades']['timestamp'] = trade[3]  # timestamp
+        
+        # 更新监控数据: 所有监控代币共用一个高水位, 每次只查询一次
+        monitors = last_read['monitors']
+        high_water = monitors['id']
+        monitor_trades = []
+        for token_address in monitored_tokens - monitors['tokens']:
+            # 新加入的代币先补齐高水位之前的历史
+            monitor_trades.extend(
+                trade for trade in self.db.get_token_trades(token_address) if trade[0] <= high_water
+            )
+            monitors['tokens'].add(token_address)
+        monitor_trades.sort(key=lambda trade: trade[0])
+        
+        grouped = self.db.get_trades_for_tokens(monitors['tokens'], high_water)
+        # 各代币的结果按 id 合并, 保持时间顺序
+        for trade in heapq.merge(*grouped.values(), key=lambda trade: trade[0]):
+            monitor_trades.append(trade)
+            monitors['id'] = max(monitors['id'], trade[0])
+        monitor_rows = [monitor_row_from_db(trade) for trade in monitor_trades]
+        
+        return {
+            'last_read': last_read,
+            'token_rows': token_rows,
+            'trade_rows': trade_rows,
+            'monitor_rows': monitor_rows,
+        }
+
+    def history(self, limit):
+        """加载最近的代币和交易, 同时返回主键用于与实时事件去重"""
+        tokens = self.db.get_recent_tokens(limit)
+        trades = self.db.get_recent_trades(limit)
+        return {
+            'token_rows': [token_row_from_db(token) for token in tokens],
+            'trade_rows': [trade_row_from_db(trade) for trade in trades],
+            'keys': {
+                'tokens': {token[1] for token in tokens},
+                'trades': {trade[11] for trade in trades},
+            },
+        }
+
+    def monitor_history(self, token_address):
+        """加载单个监控代币的历史交易"""
+        trades = self.db.get_token_trades(token_address)
+        return {
+            'token_address': token_address,
+            'monitor_rows': [monitor_row_from_db(trade) for trade in trades],
+            'signatures': {trade[9] for trade in trades},
+        }
+
+
 class CyberpunkUI(QMainWindow):
-    def __init__(self):
+    fetch_requested = pyqtSignal(object)  # 发给后台读取线程的查询请求
+
+    def __init__(self, max_rows=5000, event_bus=None, db=None):
         super().__init__()
-        self.db = TokenDatabase()
+        # 与扫描器在同一进程时可共用数据库对象
+        self.db = db if db is not None else TokenDatabase()
+        self.max_rows = max_rows
         self.start_time = datetime.now()  # 记录程序启动时间
-        self.last_trade_id = 0  # 只需要记录最后的交易ID
-        self.last_monitor_id = 0  # 监控的最后ID
         self.setWindowTitle("Pump.fun Token Scanner - Cyberpunk Edition")
         self.setStyleSheet("""
             QMainWindow {
                 background-color: #0a0a0f;
             }
-            QTableWidget {
+            QTableView {
                 background-color: #1a1a2e;
                 color: #00ff9f;
                 gridline-color: #ff0055;
                 border: 2px solid #ff0055;
                 border-radius: 5px;
             }
-            QTableWidget::item {
+            QTableView::item {
                 border-bottom: 1px solid #ff0055;
             }
-            QTableWidget::item:selected {
+            QTableView::item:selected {
                 background-color: #ff005577;
             }
             QHeaderView::section {
@@ -109,28 +351,33 @@ class CyberpunkUI(QMainWindow):
         monitor_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         layout.addWidget(monitor_label)
         
-        self.monitor_table = QTableWidget()
-        self.monitor_table.setColumnCount(8)
-        self.monitor_table.setHorizontalHeaderLabels([
+        # 表格使用固定容量的模型, 只保留最近 max_rows 行
+        self.monitor_model = RingBufferTableModel([
             "时间", "代币地址", "交易类型", "价格(SOL)", 
             "数量", "交易额(SOL)", "交易者地址", "持仓变化"
-        ])
+        ], capacity=max_rows, side_column=2)
+        self.monitor_table = self.create_table(self.monitor_model)
         layout.addWidget(self.monitor_table)
         
-        # 设置监控表格列宽
-        header = self.monitor_table.horizontalHeader()
-        for i in range(self.monitor_table.columnCount()):
-            header.setSectionResizeMode(i, header.ResizeMode.Stretch)
-        
         # 存储当前监控的代币
         self.monitored_tokens = set()
         
+        # 可疑活动警报, 只在推送模式下由扫描器推送
+        self.alert_model = RingBufferTableModel([
+            "时间", "代币名称", "代币地址", "类型", "严重度", "描述"
+        ], capacity=max_rows)
+        self.alert_table = self.create_table(self.alert_model)
+        if event_bus is not None:
+            alert_label = QLabel("可疑活动警报")
+            alert_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+            layout.addWidget(alert_label)
+            layout.addWidget(self.alert_table)
+        
         # 创建新代币表格
-        self.token_table = QTableWidget()
-        self.token_table.setColumnCount(5)
-        self.token_table.setHorizontalHeaderLabels([
+        self.token_model = RingBufferTableModel([
             "时间", "代币名称", "符号", "地址", "市值(SOL)"
-        ])
+        ], capacity=max_rows)
+        self.token_table = self.create_table(self.token_model)
         layout.addWidget(self.token_table)
         
         # 创建交易表格标题
@@ -139,30 +386,163 @@ class CyberpunkUI(QMainWindow):
         layout.addWidget(trades_label)
         
         # 创建交易表格
-        self.trades_table = QTableWidget()
-        self.trades_table.setColumnCount(5)
-        self.trades_table.setHorizontalHeaderLabels([
+        self.trades_model = RingBufferTableModel([
             "时间", "代币地址", "价格", "数量", "类型"
-        ])
+        ], capacity=max_rows, side_column=4)
+        self.trades_table = self.create_table(self.trades_model)
         layout.addWidget(self.trades_table)
-        
-        # 设置表格列宽
-        for table in [self.token_table, self.trades_table]:
-            header = table.horizontalHeader()
-            for i in range(table.columnCount()):
-                header.setSectionResizeMode(i, header.ResizeMode.Stretch)
                 
         # 使用字典来存储最后读取的ID和时间戳
         self.last_read = {
             'tokens': {'id': 0, 'timestamp': None},
             'trades': {'id': 0, 'timestamp': None},
-            'monitors': {}  # {token_address: last_id}
+            'monitors': {'id': 0, 'tokens': set()}  # 所有监控代币共用的高水位和已加载历史的代币
         }
         
-        # 设置更新间隔为1秒
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_data)
-        self.timer.start(1000)
+        # 数据库查询在后台线程执行, 界面线程只负责把结果行加入表格
+        self.skipped_ticks = 0
+        self._poll_in_flight = False
+        self.fetch_thread = QThread(self)
+        self.fetch_worker = DbFetchWorker(self.db.db_path)
+        self.fetch_worker.moveToThread(self.fetch_thread)
+        self.fetch_requested.connect(self.fetch_worker.fetch)
+        self.fetch_worker.results_ready.connect(self.on_fetch_results)
+        self.fetch_thread.start()
+        
+        registry = get_registry()
+        self._m_render = registry.histogram('ui_render_seconds', '界面一次批量更新表格的耗时')
+        self._m_ui_latency = registry.histogram('ui_event_latency_seconds', '交易入库到界面显示的延迟')
+        
+        self.event_bridge = None
+        if event_bus is not None:
+            # 推送模式: 先订阅再加载历史; 历史到达前的事件先缓存, 重叠部分按主键去重
+            self._history_loaded = False
+            self._buffered_batches = []
+            self._pending_monitor_events = {}  # {token_address: [trade_info]}
+            self._history_keys = None
+            self._monitor_keys = {}  # {token_address: 已加载的交易签名}
+            self.dedup_window = 2.0  # 秒
+            self._dedup_until = None
+            self.event_bridge = EventBridge(event_bus, [TOPIC_TOKEN, TOPIC_TRADE, TOPIC_ALERT], parent=self)
+            self.event_bridge.events_ready.connect(self.on_events)
+            self.fetch_requested.emit({'kind': 'history', 'limit': self.max_rows})
+        else:
+            # 轮询模式: 设置更新间隔为1秒
+            self.timer = QTimer()
+            self.timer.timeout.connect(self.update_data)
+            self.timer.start(1000)
+
+    def create_table(self, model):
+        """创建绑定模型的表格视图"""
+        table = QTableView()
+        table.setModel(model)
+        table.verticalHeader().setDefaultSectionSize(24)
+        # 设置表格列宽
+        header = table.horizontalHeader()
+        for i in range(model.columnCount()):
+            header.setSectionResizeMode(i, header.ResizeMode.Stretch)
+        return table
+
+    def append_rows(self, model, table, rows):
+        if rows:
+            with self._m_render.time():
+                model.append_rows(rows)
+                table.scrollToBottom()
+
+    def on_fetch_results(self, result):
+        """后台查询完成后在界面线程上更新表格"""
+        kind = result['kind']
+        if kind == 'poll':
+            self._poll_in_flight = False
+        if 'error' in result:
+            if kind == 'history':
+                # 历史加载失败时不再等待, 否则推送的事件会一直缓存; 界面只显示之后推送的数据
+                self._finish_history_load()
+            return
+        
+        if kind == 'poll':
+            if result['token_rows']:
+                print(f"UI: 读取到 {len(result['token_rows'])} 条新代币数据")
+            if result['trade_rows']:
+                print(f"UI: 读取到 {len(result['trade_rows'])} 条新交易数据")
+            if result['monitor_rows']:
+                print(f"UI: 读取到 {len(result['monitor_rows'])} 条监控数据")
+            self.last_read = result['last_read']
+            self.append_rows(self.token_model, self.token_table, result['token_rows'])
+            self.append_rows(self.trades_model, self.trades_table, result['trade_rows'])
+            self.append_rows(self.monitor_model, self.monitor_table, result['monitor_rows'])
+        elif kind == 'history':
+            self.append_rows(self.token_model, self.token_table, result['token_rows'])
+            self.append_rows(self.trades_model, self.trades_table, result['trade_rows'])
+            # 查询与事件推送并发进行, 历史加载后的一小段时间内仍按主键去重
+            self._history_keys = result['keys']
+            self._dedup_until = time.monotonic() + self.dedup_window
+            self._finish_history_load()
+        elif kind == 'monitor_history':
+            token_address = result['token_address']
+            pending = self._pending_monitor_events.pop(token_address, None)
+            if token_address not in self.monitored_tokens or pending is None:
+                return
+            self.append_rows(self.monitor_model, self.monitor_table, result['monitor_rows'])
+            loaded = result['signatures']
+            self._monitor_keys[token_address] = loaded
+            self._dedup_until = time.monotonic() + self.dedup_window
+            self.append_rows(self.monitor_model, self.monitor_table, [
+                monitor_row_from_event(event) for event in pending
+                if event.get('signature') not in loaded
+            ])
+
+    def _finish_history_load(self):
+        """结束历史加载, 处理加载期间缓存的事件"""
+        self._history_loaded = True
+        for batch in self._buffered_batches:
+            self.apply_events(batch)
+        self._buffered_batches = []
+
+    def on_events(self, batch):
+        """推送模式下每帧处理一批事件"""
+        if not self._history_loaded:
+            self._buffered_batches.append(batch)
+            return
+        self.apply_events(batch)
+
+    def apply_events(self, batch):
+        if self._dedup_until and time.monotonic() > self._dedup_until:
+            # 去重窗口结束, 释放历史主键
+            self._history_keys = None
+            self._monitor_keys = {}
+            self._dedup_until = None
+        history_keys = self._history_keys
+        
+        token_rows = []
+        trade_rows = []
+        monitor_rows = []
+        alert_rows = []
+        for topic, event in batch:
+            if topic == TOPIC_ALERT:
+                alert_rows.append(alert_row_from_event(event))
+            elif topic == TOPIC_TOKEN:
+                if history_keys and event['token_address'] in history_keys['tokens']:
+                    continue
+                token_rows.append(token_row_from_event(event))
+            elif topic == TOPIC_TRADE:
+                self._m_ui_latency.observe((now_ms() - event['timestamp']) / 1000)
+                signature = event.get('signature')
+                if not (history_keys and signature in history_keys['trades']):
+                    trade_rows.append(trade_row_from_event(event))
+                token_address = event['token_address']
+                if token_address in self._pending_monitor_events:
+                    # 该代币的历史还在加载, 先缓存
+                    self._pending_monitor_events[token_address].append(event)
+                elif token_address in self.monitored_tokens:
+                    if signature in self._monitor_keys.get(token_address, ()):
+                        continue
+                    monitor_rows.append(monitor_row_from_event(event))
+        
+        self.append_rows(self.token_model, self.token_table, token_rows)
+        self.append_rows(self.trades_model, self.trades_table, trade_rows)
+        self.append_rows(self.monitor_model, self.monitor_table, monitor_rows)
+        self.append_rows(self.alert_model, self.alert_table, alert_rows)
 
     def start_monitoring(self):
         """开始监控指定代币"""
@@ -172,126 +552,31 @@ class CyberpunkUI(QMainWindow):
                 self.monitored_tokens.add(token_address)
                 print(f"开始监控代币: {token_address}")
                 # 清空上次的监控数据
-                self.last_monitor_id = 0
-                self.monitor_table.setRowCount(0)
+                self.monitor_model.clear()
+                if self.event_bridge is not None:
+                    # 推送模式下只需读取一次历史, 之后由事件更新
+                    self._pending_monitor_events[token_address] = []
+                    self.fetch_requested.emit({'kind': 'monitor_history', 'token_address': token_address})
             else:
                 print(f"已在监控此代币: {token_address}")
 
     def update_data(self):
-        try:
-            current_time = datetime.now()
-            
-            # 获取新的代币数据
-            new_tokens = self.db.get_new_tokens(
-                self.last_read['tokens']['id'],
-                self.last_read['tokens'].get('timestamp')
-            )
-            
-            if new_tokens:
-                print(f"UI: 读取到 {len(new_tokens)} 条新代币数据")
-                for token in new_tokens:
-                    row_position = self.token_table.rowCount()
-                    self.token_table.insertRow(row_position)
-                    
-                    items = [
-                        token[4],  # creation_time
-                        token[2],  # token_name
-                        token[3],  # token_symbol
-                        token[1],  # token_address
-                        str(token[5]),  # market_cap
-                    ]
-                    
-                    for col, item in enumerate(items):
-                        table_item = QTableWidgetItem(str(item))
-                        table_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                        self.token_table.setItem(row_position, col, table_item)
-                    
-                    self.last_read['tokens']['id'] = token[0]  # rowid
-                    self.last_read['tokens']['timestamp'] = token[4]  # creation_time
-                
-                self.token_table.scrollToBottom()
-            
-            # 获取新的交易数据
-            new_trades = self.db.get_new_trades(
-                self.last_read['trades']['id'],
-                self.last_read['trades'].get('timestamp')
-            )
-            
-            if new_trades:
-                print(f"UI: 读取到 {len(new_trades)} 条新交易数据")
-                for trade in new_trades:
-                    row_position = self.trades_table.rowCount()
-                    self.trades_table.insertRow(row_position)
-                    
-                    items = [
-                        trade[3],  # timestamp
-                        trade[1],  # token_address
-                        str(trade[6]),  # sol_amount
-                        str(trade[5]),  # token_amount
-                        trade[4]   # type
-                    ]
-                    
-                    for col, item in enumerate(items):
-                        table_item = QTableWidgetItem(str(item))
-                        table_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                        
-                        if col == 4:  # 交易类型列
-                            if item.lower() == 'buy':
-                                table_item.setForeground(QColor('#00ff00'))
-                            elif item.lower() == 'sell':
-                                table_item.setForeground(QColor('#ff0000'))
-                                
-                        self.trades_table.setItem(row_position, col, table_item)
-                    
-                    self.last_read['trades']['id'] = trade[0]  # id
-                    self.last_read['trades']['timestamp'] = trade[3]  # timestamp
-                
-                self.trades_table.scrollToBottom()
-            
-            # 更新监控数据
-            for token_address in self.monitored_tokens:
-                if token_address not in self.last_read['monitors']:
-                    self.last_read['monitors'][token_address] = 0
-                
-                trades = self.db.get_token_trades(
-                    token_address,
-                    self.last_read['monitors'][token_address]
-                )
-                
-                if trades:
-                    print(f"UI: 读取到 {len(trades)} 条监控数据")
-                    for trade in trades:
-                        row_position = self.monitor_table.rowCount()
-                        self.monitor_table.insertRow(row_position)
-                        
-                        trade_value = float(trade[5]) * float(trade[6])
-                        
-                        items = [
-                            trade[3],  # timestamp
-                            trade[1],  # token_address
-                            trade[4],  # type
-                            str(trade[6]),  # sol_amount
-                            str(trade[5]),  # token_amount
-                            f"{trade_value:.4f}",
-                            trade[2],  # trader_address
-                            str(trade[8] if len(trade) > 8 else '')
-                        ]
-                        
-                        for col, item in enumerate(items):
-                            table_item = QTableWidgetItem(str(item))
-                            table_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                            
-                            if col == 2:  # 交易类型列
-                                if item.lower() == 'buy':
-                                    table_item.setForeground(QColor('#00ff00'))
-                                elif item.lower() == 'sell':
-                                    table_item.setForeground(QColor('#ff0000'))
-                            
-                            self.monitor_table.setItem(row_position, col, table_item)
-                        
-                        self.last_read['monitors'][token_address] = trade[0]
-                    
-                    self.monitor_table.scrollToBottom()
-                    
-        except Exception as e:
-            print(f"更新数据时出错: {e}")
\ No newline at end of file
+        """轮询模式的定时任务: 上一次查询未完成时跳过本次"""
+        if self._poll_in_flight:
+            self.skipped_ticks += 1
+            return
+        self._poll_in_flight = True
+        self.fetch_requested.emit({
+            'kind': 'poll',
+            'last_read': copy.deepcopy(self.last_read),
+            'monitored_tokens': set(self.monitored_tokens),
+        })
+
+    def closeEvent(self, event):
+        if self.event_bridge is not None:
+            self.event_bridge.close()
+        self.fetch_thread.quit()
+        self.fetch_thread.wait()
+        # 读取线程已退出, 关闭它打开的只读连接
+        self.fetch_worker.db.close()
+        super().closeEvent(event)
@@ -1,159 +1,503 @@
 import sqlite3
+import time
 from datetime import datetime
 import threading
 import queue
+from metrics import get_registry
+from collections import OrderedDict
+
+INSERT_TOKEN_SQL = '''
+INSERT OR IGNORE INTO tokens (
+    token_address, token_name, token_symbol, creation_time,
+    market_cap, initial_buy, v_tokens, v_sol
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+INSERT_TRADE_SQL = '''
+INSERT OR IGNORE INTO trades (
+    token_address, trader_address, timestamp, type,
+    token_amount, sol_amount, market_cap, bonding_curve,
+    v_tokens, v_sol, transaction_signature
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# get_token_trades / get_trades_for_tokens 返回的列
+TOKEN_TRADE_COLUMNS = '''
+    trades.id, trades.token_address, trader_address, timestamp, type,
+    token_amount, sol_amount, market_cap,
+    CASE 
+        WHEN type = 'buy' THEN token_amount
+        WHEN type = 'sell' THEN -token_amount
+        ELSE 0
+    END as balance_change,
+    transaction_signature,
+    CASE WHEN v_tokens > 0 THEN v_sol / v_tokens END as price
+'''
+
+# 同一周期的K线再次写入时(例如重启前后)合并: 保留开盘价, 取最高/最低, 成交量累加
+UPSERT_CANDLE_SQL = '''
+INSERT INTO candles (
+    token_address, interval, start_time, open, high, low, close,
+    volume_sol, volume_tokens, trades
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (token_address, interval, start_time) DO UPDATE SET
+    high = MAX(high, excluded.high),
+    low = MIN(low, excluded.low),
+    close = excluded.close,
+    volume_sol = volume_sol + excluded.volume_sol,
+    volume_tokens = volume_tokens + excluded.volume_tokens,
+    trades = trades + excluded.trades
+'''
+
+# 交易者统计只写入增量, 与已有的行累加
+UPSERT_TRADER_STATS_SQL = '''
+INSERT INTO trader_stats (
+    trader_address, token_address, total_buy_amount, total_sell_amount,
+    trade_count, last_trade_time
+) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (trader_address, token_address) DO UPDATE SET
+    total_buy_amount = total_buy_amount + excluded.total_buy_amount,
+    total_sell_amount = total_sell_amount + excluded.total_sell_amount,
+    trade_count = trade_count + excluded.trade_count,
+    last_trade_time = MAX(COALESCE(last_trade_time, 0), excluded.last_trade_time)
+'''
+
+# trader_stats 查询返回的列
+TRADER_STATS_COLUMNS = '''
+    trader_address, token_address, total_buy_amount, total_sell_amount,
+    trade_count, last_trade_time
+'''
+
+# IN 列表的最大长度, 超过时改用临时表
+MAX_IN_LIST = 500
+
+def _migration_initial_schema(cursor):
+    """初始表结构, 对迁移框架出现之前创建的数据库无副作用"""
+    # 代币基本信息表
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS tokens (
+        token_address TEXT PRIMARY KEY,
+        token_name TEXT,
+        token_symbol TEXT,
+        creation_time TIMESTAMP,
+        market_cap REAL,
+        initial_buy REAL,
+        v_tokens REAL,
+        v_sol REAL,
+        UNIQUE(token_address)
+    )
+    ''')
+    
+    # 交易记录表
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS trades (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        token_address TEXT,
+        trader_address TEXT,
+        timestamp TIMESTAMP,
+        type TEXT,  -- 'buy' or 'sell'
+        token_amount REAL,
+        sol_amount REAL,
+        market_cap REAL,
+        bonding_curve TEXT,
+        v_tokens REAL,
+        v_sol REAL,
+        transaction_signature TEXT UNIQUE,  -- 添加交易签名作为唯一标识
+        FOREIGN KEY (token_address) REFERENCES tokens(token_address)
+    )
+    ''')
+    
+    # 交易者统计表
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS trader_stats (
+        trader_address TEXT,
+        token_address TEXT,
+        total_buy_amount REAL,
+        total_sell_amount REAL,
+        trade_count INTEGER,
+        last_trade_time TIMESTAMP,
+        PRIMARY KEY (trader_address, token_address),
+        FOREIGN KEY (token_address) REFERENCES tokens(token_address)
+    )
+    ''')
+    
+    # 可疑活动记录表
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS suspicious_activities (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        token_address TEXT,
+        timestamp TIMESTAMP,
+        activity_type TEXT,  -- 'large_trade', 'rapid_trades', 'price_manipulation'
+        description TEXT,
+        severity INTEGER,  -- 1-5
+        FOREIGN KEY (token_address) REFERENCES tokens(token_address)
+    )
+    ''')
+
+
+def _migration_add_indexes(cursor):
+    """按代币查询交易和按时间查询时使用索引, 不再全表扫描"""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_trades_token_id ON trades(token_address, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_trades_timestamp ON trades(timestamp)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tokens_creation_time ON tokens(creation_time)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_suspicious_token ON suspicious_activities(token_address, id)')
+
+
+def _migration_epoch_ms_timestamps(cursor):
+    """把 "%Y-%m-%d %H:%M:%S" 本地时间字符串转换为整数毫秒时间戳"""
+    for table, column in (
+        ('tokens', 'creation_time'),
+        ('trades', 'timestamp'),
+        ('trader_stats', 'last_trade_time'),
+        ('suspicious_activities', 'timestamp'),
+    ):
+        # 'utc' 修饰符把左侧的本地时间换算成 UTC, 与 time.time() 保持一致
+        cursor.execute(f'''
+            UPDATE {table}
+            SET {column} = CAST(strftime('%s', {column}, 'utc') AS INTEGER) * 1000
+            WHERE typeof({column}) = 'text'
+        ''')
+
+
+def _migration_candles(cursor):
+    """按代币和周期保存的 OHLCV K线, 主键即查询顺序"""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS candles (
+        token_address TEXT,
+        interval INTEGER,  -- 秒
+        start_time INTEGER,  -- 毫秒时间戳, 周期起点
+        open REAL,
+        high REAL,
+        low REAL,
+        close REAL,
+        volume_sol REAL,
+        volume_tokens REAL,
+        trades INTEGER,
+        PRIMARY KEY (token_address, interval, start_time)
+    ) WITHOUT ROWID
+    ''')
+
+
+def _migration_trader_stats(cursor):
+    """交易者统计的查询索引, 并用已有的交易回填(此前该表从未写入)"""
+    # 代币内按成交量排名
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_trader_stats_token_volume
+        ON trader_stats(token_address, total_buy_amount + total_sell_amount DESC)
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_trader_stats_last_trade ON trader_stats(last_trade_time)')
+    cursor.execute('''
+        INSERT INTO trader_stats (
+            trader_address, token_address, total_buy_amount, total_sell_amount,
+            trade_count, last_trade_time
+        )
+        SELECT trader_address, token_address,
+               TOTAL(CASE WHEN type = 'buy' THEN token_amount END),
+               TOTAL(CASE WHEN type = 'sell' THEN token_amount END),
+               COUNT(*), MAX(timestamp)
+        FROM trades
+        WHERE trader_address IS NOT NULL AND token_address IS NOT NULL
+        GROUP BY trader_address, token_address
+        ON CONFLICT (trader_address, token_address) DO NOTHING
+    ''')
+
+
+def _migration_score_cache(cursor):
+    """评分缓存的持久层(score_cache.py), 此前由缓存自行建表, 已有的表保持不变"""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS score_cache (
+        cache_key TEXT PRIMARY KEY,
+        data TEXT,  -- JSON
+        expires_at REAL  -- 秒级时间戳, 与 time.time() 一致
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_score_cache_expires ON score_cache(expires_at)')
+
+
+# 版本号只能递增, 已发布的迁移不要修改, 新的表结构变更追加到末尾
+MIGRATIONS = [
+    (1, '初始表结构', _migration_initial_schema),
+    (2, '交易和代币索引', _migration_add_indexes),
+    (3, '整数毫秒时间戳', _migration_epoch_ms_timestamps),
+    (4, 'K线表', _migration_candles),
+    (5, '交易者统计索引和回填', _migration_trader_stats),
+    (6, '评分缓存表', _migration_score_cache),
+]
+
+
+def now_ms():
+    """当前时间的毫秒时间戳, 所有表的时间列统一使用该格式"""
+    return int(time.time() * 1000)
+
+
+def format_timestamp(ms):
+    """毫秒时间戳转换为本地时间字符串, 用于界面显示"""
+    if ms is None:
+        return ''
+    if isinstance(ms, str):
+        return ms
+    return datetime.fromtimestamp(ms / 1000).strftime("%Y-%m-%d %H:%M:%S")
+
 
 class TokenDatabase:
-    def __init__(self):
+    def __init__(self, db_path='pump_fun.db', batch_size=0, flush_interval_ms=200, read_only=False):
+        self.db_path = db_path
+        # 只读模式用于界面等读取方, 不执行迁移也不写入
+        self.read_only = read_only
         self.db_queue = queue.Queue()
         self._local = threading.local()
-        self.init_database()
+        self._connections = []  # 各线程打开的连接, close() 时全部关闭
+        self._connections_lock = threading.Lock()
+        
+        # 批量写入模式: batch_size > 0 时缓冲写入, 满 N 行或每 M 毫秒合并提交一次
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self._pending_tokens = []
+        self._pending_trades = []
+        self._recent_tokens = OrderedDict()  # 最近写入的代币地址, 用于批量模式下去重
+        self._recent_tokens_limit = 100000
+        self._recent_trades = OrderedDict()  # 最近写入的交易签名, 批量模式下识别重复投递的交易
+        self._recent_trades_limit = 100000
+        # 写入持续失败时缓冲区最多保留的行数, 超出后丢弃最旧的行
+        self._max_pending = max(self._recent_trades_limit, batch_size * 100)
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flush_stop = threading.Event()
+        self._flush_thread = None
+        
+        registry = get_registry()
+        self._m_write = registry.histogram('db_write_seconds', '一次提交(单行或批量)的耗时')
+        self._m_rows = registry.counter('db_rows_written_total', '提交到数据库的行数')
+        
+        if not self.read_only:
+            self.init_database()
+        
+        if self.batch_size > 0 and not self.read_only:
+            # 只有批量写入方有缓冲区; 只读或逐行写入的实例(界面, 归档)不注册, 否则会把指标指向空闲的实例
+            registry.gauge('db_pending_rows', '等待批量写入的行数',
+                           fn=lambda: len(self._pending_tokens) + len(self._pending_trades))
+            self._flush_thread = threading.Thread(target=self._flush_loop, name="db-flusher")
+            self._flush_thread.daemon = True
+            self._flush_thread.start()
         
     def get_connection(self):
         """为每个线程获取独立的数据库连接"""
         if not hasattr(self._local, 'conn'):
-            self._local.conn = sqlite3.connect('pump_fun.db')
-            self._local.cursor = self._local.conn.cursor()
+            # 连接只在打开它的线程上使用; 关闭 check_same_thread 是为了 close() 能关闭其他线程留下的连接
+            if self.read_only:
+                conn = sqlite3.connect(f'file:{self.db_path}?mode=ro', uri=True, timeout=30, check_same_thread=False)
+            else:
+                conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+                # WAL 模式下读写互不阻塞, 提交时只需追加日志
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA cache_size=-65536')  # 64MB 页缓存
+            conn.execute('PRAGMA temp_store=MEMORY')
+            self._local.conn = conn
+            self._local.cursor = conn.cursor()
+            with self._connections_lock:
+                self._connections.append(conn)
         return self._local.conn, self._local.cursor
 
     def init_database(self):
-        """初始化数据库表"""
+        """初始化数据库表, 按版本号依次执行尚未应用的迁移"""
         conn, cursor = self.get_connection()
-        # 代币基本信息表
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS tokens (
-            token_address TEXT PRIMARY KEY,
-            token_name TEXT,
-            token_symbol TEXT,
-            creation_time TIMESTAMP,
-            market_cap REAL,
-            initial_buy REAL,
-            v_tokens REAL,
-            v_sol REAL,
-            UNIQUE(token_address)
-        )
-        ''')
-        
-        # 交易记录表
         cursor.execute('''
-        CREATE TABLE IF NOT EXISTS trades (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            token_address TEXT,
-            trader_address TEXT,
-            timestamp TIMESTAMP,
-            type TEXT,  -- 'buy' or 'sell'
-            token_amount REAL,
-            sol_amount REAL,
-            market_cap REAL,
-            bonding_curve TEXT,
-            v_tokens REAL,
-            v_sol REAL,
-            transaction_signature TEXT UNIQUE,  -- 添加交易签名作为唯一标识
-            FOREIGN KEY (token_address) REFERENCES tokens(token_address)
-        )
-        ''')
-        
-        # 交易者统计表
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS trader_stats (
-            trader_address TEXT,
-            token_address TEXT,
-            total_buy_amount REAL,
-            total_sell_amount REAL,
-            trade_count INTEGER,
-            last_trade_time TIMESTAMP,
-            PRIMARY KEY (trader_address, token_address),
-            FOREIGN KEY (token_address) REFERENCES tokens(token_address)
-        )
-        ''')
-        
-        # 可疑活动记录表
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS suspicious_activities (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            token_address TEXT,
-            timestamp TIMESTAMP,
-            activity_type TEXT,  -- 'large_trade', 'rapid_trades', 'price_manipulation'
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
             description TEXT,
-            severity INTEGER,  -- 1-5
-            FOREIGN KEY (token_address) REFERENCES tokens(token_address)
+            applied_at INTEGER
         )
         ''')
-        
         conn.commit()
+        
+        for version, description, migrate in MIGRATIONS:
+            # 每个迁移一个事务; 加写锁后再检查版本, 多个进程同时启动时只有一个执行
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                cursor.execute('SELECT 1 FROM schema_version WHERE version = ?', (version,))
+                if cursor.fetchone():
+                    conn.rollback()
+                    continue
+                print(f"数据库: 执行迁移 {version} - {description}")
+                migrate(cursor)
+                cursor.execute(
+                    'INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)',
+                    (version, description, now_ms())
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def get_schema_version(self):
+        """当前数据库的表结构版本"""
+        conn, cursor = self.get_connection()
+        cursor.execute('SELECT MAX(version) FROM schema_version')
+        return cursor.fetchone()[0] or 0
 
     def add_new_token(self, token_info):
         """添加新代币"""
+        row = (
+            token_info['token_address'],
+            token_info['token_name'],
+            token_info['token_symbol'],
+            token_info['timestamp'],
+            token_info['market_cap'],
+            token_info['initial_buy'],
+            token_info['v_tokens'],
+            token_info['v_sol']
+        )
+        
+        if self.batch_size > 0:
+            # 批量模式下无法立即得知是否重复: 先查最近写入的地址集合, 不在集合中时(重启后或已被淘汰)再按主键查表
+            if not self._remember(self._recent_tokens, self._recent_tokens_limit, row[0],
+                                  'SELECT 1 FROM tokens WHERE token_address = ?'):
+                return False
+            with self._buffer_lock:
+                self._pending_tokens.append(row)
+                should_flush = len(self._pending_tokens) + len(self._pending_trades) >= self.batch_size
+            if should_flush:
+                self.flush()
+            return True
+        
         try:
             conn, cursor = self.get_connection()
-            print(f"数据库: 尝试添加新代币 {token_info['token_address']}")
-            
-            # 首先检查是否已存在
-            cursor.execute('SELECT 1 FROM tokens WHERE token_address = ?', 
-                          (token_info['token_address'],))
-            if cursor.fetchone():
-                print(f"数据库: 代币已存在，跳过添加")
-                return False
-            
-            cursor.execute('''
-            INSERT OR IGNORE INTO tokens (
-                token_address, token_name, token_symbol, creation_time,
-                market_cap, initial_buy, v_tokens, v_sol
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                token_info['token_address'],
-                token_info['token_name'],
-                token_info['token_symbol'],
-                token_info['timestamp'],
-                token_info['market_cap'],
-                token_info['initial_buy'],
-                token_info['v_tokens'],
-                token_info['v_sol']
-            ))
-            conn.commit()
-            success = cursor.rowcount > 0
-            print(f"数据库: {'成功' if success else '失败'}添加新代币")
-            return success
+            with self._m_write.time():
+                # 依赖主键约束去重, 不再预先查询
+                cursor.execute(INSERT_TOKEN_SQL, row)
+                conn.commit()
+            self._m_rows.inc()
+            return cursor.rowcount > 0
         except Exception as e:
             print(f"添加新代币失败: {e}")
             return False
 
     def add_trade(self, trade_info):
-        """记录交易"""
+        """记录交易, 返回是否为新交易; 重复投递的交易(签名已存在)不写入并返回 False"""
+        row = (
+            trade_info['token_address'],
+            trade_info['trader_address'],
+            trade_info['timestamp'],
+            trade_info['type'],
+            trade_info['token_amount'],
+            trade_info['sol_amount'],
+            trade_info['market_cap'],
+            trade_info['bonding_curve'],
+            trade_info['v_tokens'],
+            trade_info['v_sol'],
+            trade_info.get('signature', '')
+        )
+        
+        if self.batch_size > 0:
+            if not self._remember(self._recent_trades, self._recent_trades_limit, row[-1],
+                                  'SELECT 1 FROM trades WHERE transaction_signature = ?'):
+                return False
+            with self._buffer_lock:
+                self._pending_trades.append(row)
+                should_flush = len(self._pending_tokens) + len(self._pending_trades) >= self.batch_size
+            if should_flush:
+                self.flush()
+            return True
+        
         try:
             conn, cursor = self.get_connection()
-            print(f"数据库: 尝试添加新交易 {trade_info.get('signature', '')}")
-            
-            # 首先检查是否已存在
-            cursor.execute('SELECT 1 FROM trades WHERE transaction_signature = ?', 
-                          (trade_info.get('signature', ''),))
-            if cursor.fetchone():
-                print(f"数据库: 交易已存在，跳过添加")
-                return
-            
-            cursor.execute('''
-            INSERT OR IGNORE INTO trades (
-                token_address, trader_address, timestamp, type,
-                token_amount, sol_amount, market_cap, bonding_curve,
-                v_tokens, v_sol, transaction_signature
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                trade_info['token_address'],
-                trade_info['trader_address'],
-                trade_info['timestamp'],
-                trade_info['type'],
-                trade_info['token_amount'],
-                trade_info['sol_amount'],
-                trade_info['market_cap'],
-                trade_info['bonding_curve'],
-                trade_info['v_tokens'],
-                trade_info['v_sol'],
-                trade_info.get('signature', '')
-            ))
-            conn.commit()
-            print(f"数据库: {'成功' if cursor.rowcount > 0 else '失败'}添加新交易")
+            with self._m_write.time():
+                # 依赖交易签名的 UNIQUE 约束去重, 不再预先查询
+                cursor.execute(INSERT_TRADE_SQL, row)
+                conn.commit()
+            self._m_rows.inc()
+            return cursor.rowcount > 0
         except Exception as e:
             print(f"记录交易失败: {e}")
+            return False
+
+    def _remember(self, recent, limit, key, exists_sql):
+        """批量模式下判断 key 是否第一次出现并记入最近集合; 集合中没有时走唯一索引查表"""
+        with self._buffer_lock:
+            if key in recent:
+                return False
+        try:
+            conn, cursor = self.get_connection()
+            cursor.execute(exists_sql, (key,))
+            stored = cursor.fetchone() is not None
+        except Exception as e:
+            # 查不了表时仍按集合判断, 真正的重复会在写入时被唯一约束忽略
+            print(f"查询是否重复失败: {e}")
+            stored = False
+        with self._buffer_lock:
+            # 查表期间其他线程可能已经加入了同一个 key
+            if key in recent:
+                return False
+            recent[key] = True
+            if len(recent) > limit:
+                recent.popitem(last=False)
+        return not stored
+
+    def flush(self):
+        """把缓冲的代币和交易在一个事务中写入数据库"""
+        with self._flush_lock:
+            with self._buffer_lock:
+                tokens, self._pending_tokens = self._pending_tokens, []
+                trades, self._pending_trades = self._pending_trades, []
+            if not tokens and not trades:
+                return 0
+            try:
+                conn, cursor = self.get_connection()
+                with self._m_write.time(), conn:
+                    if tokens:
+                        cursor.executemany(INSERT_TOKEN_SQL, tokens)
+                    if trades:
+                        cursor.executemany(INSERT_TRADE_SQL, trades)
+                self._m_rows.inc(len(tokens) + len(trades))
+            except Exception as e:
+                print(f"批量写入失败: {e}")
+                # 写入失败时放回缓冲区, 下次刷新时重试; 持续失败时只保留最新的 _max_pending 行
+                with self._buffer_lock:
+                    self._pending_tokens[:0] = tokens
+                    self._pending_trades[:0] = trades
+                    dropped = len(self._pending_tokens) + len(self._pending_trades) - self._max_pending
+                    if dropped > 0:
+                        n = min(dropped, len(self._pending_trades))
+                        del self._pending_trades[:n]
+                        del self._pending_tokens[:dropped - n]
+                if dropped > 0:
+                    print(f"批量写入持续失败, 丢弃 {dropped} 行最旧的缓冲数据")
+                return 0
+            return len(tokens) + len(trades)
+
+    def _flush_loop(self):
+        """后台定时刷新线程"""
+        while not self._flush_stop.wait(self.flush_interval):
+            self.flush()
+        self.close_connection()
+
+    def close(self):
+        """
+        停止后台刷新, 写入剩余数据并关闭所有线程打开的连接
+        调用前其他使用本对象的线程(流水线、刷新线程、查询方)应已停止
+        """
+        self._flush_stop.set()
+        if self._flush_thread is not None:
+            self._flush_thread.join()
+            self._flush_thread = None
+        self.flush()
+        self.close_connection()
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+
+    def close_connection(self):
+        """关闭当前线程的连接; 使用本对象的后台线程退出前调用, 连接不会随线程泄漏"""
+        if hasattr(self._local, 'conn'):
+            conn = self._local.conn
+            with self._connections_lock:
+                if conn in self._connections:
+                    self._connections.remove(conn)
+            conn.close()
+            del self._local.conn
+            del self._local.cursor
 
     def get_new_tokens(self, last_id, last_timestamp=None):
         """获取新代币数据"""
@@ -163,14 +507,14 @@ class TokenDatabase:
                 SELECT rowid, *
                 FROM tokens
                 WHERE rowid > ? AND creation_time > ?
-                ORDER BY creation_time DESC
+                ORDER BY rowid
             ''', (last_id, last_timestamp))
         else:
             cursor.execute('''
                 SELECT rowid, *
                 FROM tokens
                 WHERE rowid > ?
-                ORDER BY creation_time DESC
+                ORDER BY rowid
             ''', (last_id,))
         return cursor.fetchall()
 
@@ -182,34 +526,194 @@ class TokenDatabase:
                 SELECT *
                 FROM trades
                 WHERE id > ? AND timestamp > ?
-                ORDER BY timestamp DESC
+                ORDER BY id
             ''', (last_id, last_timestamp))
         else:
             cursor.execute('''
                 SELECT *
                 FROM trades
                 WHERE id > ?
-                ORDER BY timestamp DESC
+                ORDER BY id
             ''', (last_id,))
         return cursor.fetchall()
 
+    def get_recent_tokens(self, limit):
+        """获取最近的 limit 个代币, 按写入顺序返回, 用于界面加载历史"""
+        conn, cursor = self.get_connection()
+        cursor.execute('''
+            SELECT * FROM (
+                SELECT rowid, *
+                FROM tokens
+                ORDER BY rowid DESC
+                LIMIT ?
+            ) ORDER BY rowid
+        ''', (limit,))
+        return cursor.fetchall()
+
+    def get_recent_trades(self, limit):
+        """获取最近的 limit 笔交易, 按写入顺序返回, 用于界面加载历史"""
+        conn, cursor = self.get_connection()
+        cursor.execute('''
+            SELECT * FROM (
+                SELECT *
+                FROM trades
+                ORDER BY id DESC
+                LIMIT ?
+            ) ORDER BY id
+        ''', (limit,))
+        return cursor.fetchall()
+
+    def get_trades_for_tokens(self, token_addresses, last_id=0):
+        """
+        一次查询多个代币在 last_id 之后的交易
+        返回 {token_address: [行]}, 行格式与 get_token_trades 相同, 每组按 id 升序
+        """
+        grouped = {token_address: [] for token_address in token_addresses}
+        if not grouped:
+            return grouped
+        try:
+            conn, cursor = self.get_connection()
+            if len(grouped) <= MAX_IN_LIST:
+                placeholders = ','.join('?' * len(grouped))
+                cursor.execute(f'''
+                    SELECT {TOKEN_TRADE_COLUMNS}
+                    FROM trades
+                    WHERE token_address IN ({placeholders}) AND id > ?
+                    ORDER BY id
+                ''', (*grouped, last_id))
+            else:
+                # 监控列表较长时使用临时表连接, 避免超出参数个数限制
+                cursor.execute('CREATE TEMP TABLE IF NOT EXISTS watch_list (token_address TEXT PRIMARY KEY)')
+                cursor.execute('DELETE FROM watch_list')
+                cursor.executemany('INSERT INTO watch_list (token_address) VALUES (?)',
+                                   ((token_address,) for token_address in grouped))
+                cursor.execute(f'''
+                    SELECT {TOKEN_TRADE_COLUMNS}
+                    FROM watch_list w
+                    JOIN trades ON trades.token_address = w.token_address AND trades.id > ?
+                    ORDER BY id
+                ''', (last_id,))
+            for row in cursor.fetchall():
+                grouped[row[1]].append(row)
+            conn.commit()
+        except Exception as e:
+            print(f"获取代币交易记录失败: {e}")
+        return grouped
+
     def get_token_trades(self, token_address, last_id=0):
         """获取指定代币的交易记录"""
         try:
             conn, cursor = self.get_connection()
-            cursor.execute('''
-                SELECT id, token_address, trader_address, timestamp, type,
-                       token_amount, sol_amount, market_cap,
-                       CASE 
-                           WHEN type = 'buy' THEN token_amount
-                           WHEN type = 'sell' THEN -token_amount
-                           ELSE 0
-                       END as balance_change
+            cursor.execute(f'''
+                SELECT {TOKEN_TRADE_COLUMNS}
                 FROM trades
                 WHERE token_address = ? AND id > ?
-                ORDER BY timestamp DESC
+                ORDER BY id
             ''', (token_address, last_id))
             return cursor.fetchall()
         except Exception as e:
             print(f"获取代币交易记录失败: {e}")
-            return []
\ No newline at end of file
+            return []
+
+    def get_token_trades_between(self, token_address, start_ms=None, end_ms=None):
+        """获取指定代币在 [start_ms, end_ms) 内的交易, 行格式与 get_token_trades 相同"""
+        try:
+            conn, cursor = self.get_connection()
+            cursor.execute(f'''
+                SELECT {TOKEN_TRADE_COLUMNS}
+                FROM trades
+                WHERE token_address = ? AND timestamp >= ? AND timestamp < ?
+                ORDER BY id
+            ''', (token_address,
+                  start_ms if start_ms is not None else 0,
+                  end_ms if end_ms is not None else 2 ** 62))
+            return cursor.fetchall()
+        except Exception as e:
+            print(f"获取代币交易记录失败: {e}")
+            return []
+
+    def add_suspicious_activities(self, rows):
+        """
+        在一个事务中写入一批可疑活动
+        rows 为 [(token_address, timestamp, activity_type, description, severity)]
+        """
+        conn, cursor = self.get_connection()
+        with self._m_write.time(), conn:
+            cursor.executemany('''
+                INSERT INTO suspicious_activities (
+                    token_address, timestamp, activity_type, description, severity
+                ) VALUES (?, ?, ?, ?, ?)
+            ''', rows)
+        self._m_rows.inc(len(rows))
+
+    def upsert_candles(self, rows):
+        """在一个事务中写入一批K线"""
+        conn, cursor = self.get_connection()
+        with self._m_write.time(), conn:
+            cursor.executemany(UPSERT_CANDLE_SQL, rows)
+        self._m_rows.inc(len(rows))
+
+    def get_candles(self, token_address, interval, start_ms=None, end_ms=None):
+        """获取指定代币和周期在 [start_ms, end_ms) 内的K线, 按时间升序"""
+        conn, cursor = self.get_connection()
+        cursor.execute('''
+            SELECT start_time, open, high, low, close, volume_sol, volume_tokens, trades
+            FROM candles
+            WHERE token_address = ? AND interval = ? AND start_time >= ? AND start_time < ?
+            ORDER BY start_time
+        ''', (token_address, interval,
+              start_ms if start_ms is not None else 0,
+              end_ms if end_ms is not None else 2 ** 62))
+        return cursor.fetchall()
+
+    def upsert_trader_stats(self, rows):
+        """在一个事务中累加一批交易者统计增量"""
+        conn, cursor = self.get_connection()
+        with self._m_write.time(), conn:
+            cursor.executemany(UPSERT_TRADER_STATS_SQL, rows)
+        self._m_rows.inc(len(rows))
+
+    def get_token_leaderboard(self, token_address, limit=20):
+        """指定代币成交量(买入+卖出)最大的交易者"""
+        conn, cursor = self.get_connection()
+        cursor.execute(f'''
+            SELECT {TRADER_STATS_COLUMNS}
+            FROM trader_stats
+            WHERE token_address = ?
+            ORDER BY total_buy_amount + total_sell_amount DESC
+            LIMIT ?
+        ''', (token_address, limit))
+        return cursor.fetchall()
+
+    def get_trader_stats(self, trader_address):
+        """钱包在各代币上的统计, 最近交易的在前"""
+        conn, cursor = self.get_connection()
+        cursor.execute(f'''
+            SELECT {TRADER_STATS_COLUMNS}
+            FROM trader_stats
+            WHERE trader_address = ?
+            ORDER BY last_trade_time DESC
+        ''', (trader_address,))
+        return cursor.fetchall()
+
+    def get_active_traders(self, since_ms, limit=20):
+        """
+        最近活跃的交易者排行, 按交易次数排序
+        返回 [(trader_address, 代币数, total_buy_amount, total_sell_amount, trade_count, last_trade_time)]
+        只汇总 since_ms 之后有交易的 (交易者, 代币) 行, 通过 last_trade_time 索引读取
+        """
+        conn, cursor = self.get_connection()
+        # 先用索引取出窗口内的行再分组, 避免按主键扫描整张表
+        cursor.execute('''
+            SELECT trader_address, COUNT(*), TOTAL(total_buy_amount), TOTAL(total_sell_amount),
+                   SUM(trade_count), MAX(last_trade_time)
+            FROM (
+                SELECT trader_address, total_buy_amount, total_sell_amount, trade_count, last_trade_time
+                FROM trader_stats INDEXED BY idx_trader_stats_last_trade
+                WHERE last_trade_time >= ?
+            )
+            GROUP BY trader_address
+            ORDER BY SUM(trade_count) DESC
+            LIMIT ?
+        ''', (since_ms, limit))
+        return cursor.fetchall()
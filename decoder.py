@@ -0,0 +1,158 @@
+import json
+import re
+from typing import NamedTuple, Optional
+
+# 按速度依次选择可用的 JSON 后端
+try:
+    import msgspec
+    JSON_BACKEND = 'msgspec'
+except ImportError:
+    msgspec = None
+    try:
+        import orjson
+        JSON_BACKEND = 'orjson'
+    except ImportError:
+        orjson = None
+        JSON_BACKEND = 'json'
+
+
+class CreateEvent(NamedTuple):
+    """新代币创建事件, 只包含流水线用到的字段"""
+    mint: str
+    name: str
+    symbol: str
+    market_cap_sol: float
+    initial_buy: float
+    v_tokens: float
+    v_sol: float
+    trader: str
+    signature: str
+
+
+class TradeEvent(NamedTuple):
+    """买入/卖出事件, 只包含流水线用到的字段"""
+    tx_type: str
+    mint: str
+    trader: str
+    token_amount: float
+    sol_amount: float
+    market_cap_sol: float
+    bonding_curve: str
+    v_tokens: float
+    v_sol: float
+    signature: str
+
+
+TRADE_TYPES = ('buy', 'sell')
+
+# 预过滤用的正则, 在完整解码前从原始文本中取出事件类型和代币地址
+_TX_TYPE_RE = re.compile(r'"txType"\s*:\s*"(\w+)"')
+_MINT_RE = re.compile(r'"mint"\s*:\s*"([^"]+)"')
+
+
+# 缺失或为 null 的字段使用的默认值
+_DEFAULTS = {
+    'mint': '', 'name': '', 'symbol': '', 'traderPublicKey': '', 'signature': '',
+    'tokenAmount': 0, 'solAmount': 0, 'initialBuy': 0, 'marketCapSol': 0,
+    'bondingCurveKey': '', 'vTokensInBondingCurve': 0, 'vSolInBondingCurve': 0,
+}
+
+if msgspec is not None:
+    class _Frame(msgspec.Struct):
+        """msgspec 直接解码到该结构, 未声明的字段被跳过"""
+        mint: Optional[str] = None
+        name: Optional[str] = None
+        symbol: Optional[str] = None
+        traderPublicKey: Optional[str] = None
+        signature: Optional[str] = None
+        tokenAmount: Optional[float] = None
+        solAmount: Optional[float] = None
+        initialBuy: Optional[float] = None
+        marketCapSol: Optional[float] = None
+        bondingCurveKey: Optional[str] = None
+        vTokensInBondingCurve: Optional[float] = None
+        vSolInBondingCurve: Optional[float] = None
+
+    _frame_decoder = msgspec.json.Decoder(_Frame)
+
+    def _load_fields(raw):
+        frame = _frame_decoder.decode(raw)
+        return lambda key: getattr(frame, key) or _DEFAULTS[key]
+else:
+    _loads = orjson.loads if orjson is not None else json.loads
+
+    def _load_fields(raw):
+        data = _loads(raw)
+        return lambda key: data.get(key) or _DEFAULTS[key]
+
+
+class MessageDecoder:
+    """
+    WebSocket 消息解码器
+    先用正则做廉价的预过滤, 丢弃不关心的事件和未监控代币的交易, 只对剩下的消息做完整解码
+    """
+
+    def __init__(self, is_watched=None):
+        self.is_watched = is_watched  # is_watched(mint) -> bool, None 表示接收所有交易
+        self.backend = JSON_BACKEND
+        self.stats = {
+            'frames': 0,
+            'decoded': 0,
+            'rejected_type': 0,
+            'rejected_unwatched': 0,
+            'errors': 0,
+        }
+
+    def decode(self, raw):
+        """返回 CreateEvent / TradeEvent, 被过滤的消息返回 None"""
+        self.stats['frames'] += 1
+        if isinstance(raw, (bytes, bytearray)):
+            raw = raw.decode('utf-8')
+
+        match = _TX_TYPE_RE.search(raw)
+        tx_type = match.group(1) if match else None
+        if tx_type != 'create' and tx_type not in TRADE_TYPES:
+            # 订阅确认等非交易消息
+            self.stats['rejected_type'] += 1
+            return None
+
+        if tx_type in TRADE_TYPES and self.is_watched is not None:
+            match = _MINT_RE.search(raw)
+            if not match or not self.is_watched(match.group(1)):
+                self.stats['rejected_unwatched'] += 1
+                return None
+
+        try:
+            field = _load_fields(raw)
+            if tx_type == 'create':
+                event = CreateEvent(
+                    field('mint'),
+                    field('name'),
+                    field('symbol'),
+                    field('marketCapSol'),
+                    field('initialBuy'),
+                    field('vTokensInBondingCurve'),
+                    field('vSolInBondingCurve'),
+                    field('traderPublicKey'),
+                    field('signature'),
+                )
+            else:
+                event = TradeEvent(
+                    tx_type,
+                    field('mint'),
+                    field('traderPublicKey'),
+                    field('tokenAmount'),
+                    field('solAmount'),
+                    field('marketCapSol'),
+                    field('bondingCurveKey'),
+                    field('vTokensInBondingCurve'),
+                    field('vSolInBondingCurve'),
+                    field('signature'),
+                )
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"解码WebSocket消息失败: {e}")
+            return None
+
+        self.stats['decoded'] += 1
+        return event
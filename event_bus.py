@@ -0,0 +1,49 @@
+import threading
+
+# 扫描器发布的事件主题
+TOPIC_TOKEN = 'token'   # 新代币入库, 事件为 token_info 字典
+TOPIC_TRADE = 'trade'   # 交易入库, 事件为 trade_info 字典
+TOPIC_ANALYTICS = 'analytics'   # 批量分析结果, 事件为 {'timestamp', 'tokens', 'features'}
+TOPIC_ALERT = 'alert'   # 去重后的可疑活动警报, 事件为 alert 字典
+
+
+class EventBus:
+    """
+    进程内发布/订阅总线
+    回调在发布者线程上同步执行, 订阅者应只做入队之类的轻量操作
+    """
+
+    def __init__(self):
+        self._subscribers = {}  # {topic: [callback]}
+        self._lock = threading.Lock()
+        self.stats = {'published': 0, 'callback_errors': 0}
+
+    def subscribe(self, topic, callback):
+        """订阅主题, 返回取消订阅的函数"""
+        with self._lock:
+            # 写时复制, 发布时无需加锁遍历
+            self._subscribers[topic] = self._subscribers.get(topic, []) + [callback]
+        return lambda: self.unsubscribe(topic, callback)
+
+    def unsubscribe(self, topic, callback):
+        with self._lock:
+            callbacks = [cb for cb in self._subscribers.get(topic, []) if cb is not callback]
+            if callbacks:
+                self._subscribers[topic] = callbacks
+            else:
+                self._subscribers.pop(topic, None)
+
+    def has_subscribers(self, topic):
+        return bool(self._subscribers.get(topic))
+
+    def publish(self, topic, event):
+        callbacks = self._subscribers.get(topic)
+        if not callbacks:
+            return
+        self.stats['published'] += 1
+        for callback in callbacks:
+            try:
+                callback(event)
+            except Exception as e:
+                self.stats['callback_errors'] += 1
+                print(f"事件回调出错 {topic}: {e}")
@@ -1,26 +1,7 @@
-from scan_pumpfun import PumpFunScanner
-from cyberpunk_ui import CyberpunkUI
-from PyQt6.QtWidgets import QApplication
 import sys
-import threading
-import os
+from pump_scanner import main
 
 if __name__ == "__main__":
     print("正在启动应用程序...")
-    
-    # 创建 Qt 应用
-    app = QApplication(sys.argv)
-    
-    print("正在创建扫描器...")
-    # 创建并启动扫描器
-    scanner = PumpFunScanner()
-    scanner.start_scanning()
-    
-    print("正在创建UI界面...")
-    # 创建并显示 UI
-    window = CyberpunkUI()
-    window.show()
-    
-    print("应用程序开始运行...")
-    # 运行应用
-    sys.exit(app.exec())
\ No newline at end of file
+    # 图形界面入口, 等同于 python -m pump_scanner ui; 无界面运行使用 python -m pump_scanner serve
+    sys.exit(main(['ui'] + sys.argv[1:]))
@@ -0,0 +1,292 @@
+import threading
+import time
+
+# 延迟直方图的默认分桶(秒)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in sorted(labels.items())) + '}'
+
+
+class _Timer:
+    """with histogram.time(): ... 记录代码块耗时"""
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Counter:
+    """单调递增计数器"""
+    kind = 'counter'
+
+    def __init__(self, name, help='', labels=None):
+        self.name = name
+        self.help = help
+        self.labels = labels or {}
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self._lock:
+            self.value += n
+
+    def samples(self):
+        yield self.name, self.labels, self.value
+
+
+class Gauge:
+    """瞬时值, 可以直接设置, 也可以在采集时调用函数取值"""
+    kind = 'gauge'
+
+    def __init__(self, name, help='', labels=None, fn=None):
+        self.name = name
+        self.help = help
+        self.labels = labels or {}
+        self.fn = fn
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, n=1):
+        self.value += n
+
+    def dec(self, n=1):
+        self.value -= n
+
+    def samples(self):
+        value = self.value
+        if self.fn is not None:
+            try:
+                value = self.fn()
+            except Exception:
+                value = float('nan')
+        yield self.name, self.labels, value
+
+
+class Histogram:
+    """固定分桶的延迟直方图"""
+    kind = 'histogram'
+
+    def __init__(self, name, help='', labels=None, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels or {}
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一个是 +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = 0
+        for bound in self.buckets:
+            if value <= bound:
+                break
+            i += 1
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        return _Timer(self)
+
+    def percentile(self, q):
+        """按分桶线性插值估算分位数(q 取 0~1), 没有样本时返回 None"""
+        with self._lock:
+            counts = list(self.counts)
+            count = self.count
+        if count == 0:
+            return None
+        rank = q * count
+        cumulative = 0
+        lower = 0.0
+        for bound, n in zip(self.buckets, counts):
+            if n and cumulative + n >= rank:
+                return lower + (bound - lower) * (rank - cumulative) / n
+            cumulative += n
+            lower = bound
+        # 落在 +Inf 桶中, 只能给出最大的有限边界
+        return self.buckets[-1]
+
+    def samples(self):
+        with self._lock:
+            counts = list(self.counts)
+            total, count = self.sum, self.count
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float('inf'),), counts):
+            cumulative += n
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            yield self.name + '_bucket', dict(self.labels, le=le), cumulative
+        yield self.name + '_sum', self.labels, total
+        yield self.name + '_count', self.labels, count
+
+
+class MetricsRegistry:
+    """指标注册表, 按名称和标签复用同一个指标对象"""
+    enabled = True
+
+    def __init__(self):
+        self._metrics = {}  # {(name, labels): metric}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, labels, **kwargs):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            metric = self._metrics.get(key)
+            if metric is None:
+                metric = self._metrics[key] = cls(name, help, labels, **kwargs)
+            return metric
+
+    def counter(self, name, help='', labels=None):
+        return self._get(Counter, name, help, labels)
+
+    def gauge(self, name, help='', labels=None, fn=None):
+        gauge = self._get(Gauge, name, help, labels, fn=fn)
+        if fn is not None:
+            # 同名同标签的回调指标只应由持有该数据的实例注册;
+            # 再次注册时(例如同一进程中创建了新的扫描器)改为读取新的实例, 旧实例可以被回收
+            gauge.fn = fn
+        return gauge
+
+    def histogram(self, name, help='', labels=None, buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help, labels, buckets=buckets)
+
+    def render(self):
+        """Prometheus 文本格式"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        described = set()
+        for metric in metrics:
+            if metric.name not in described:
+                described.add(metric.name)
+                if metric.help:
+                    lines.append(f'# HELP {metric.name} {metric.help}')
+                lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+class _NoopMetric:
+    """关闭指标时使用, 所有操作都是空操作"""
+
+    def inc(self, n=1):
+        pass
+
+    def dec(self, n=1):
+        pass
+
+    def set(self, value):
+        pass
+
+    def observe(self, value):
+        pass
+
+    def time(self):
+        return _NOOP_TIMER
+
+
+class _NoopTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_METRIC = _NoopMetric()
+_NOOP_TIMER = _NoopTimer()
+
+
+class NoopRegistry:
+    """关闭指标时的注册表, 返回共享的空操作指标"""
+    enabled = False
+
+    def counter(self, name, help='', labels=None):
+        return _NOOP_METRIC
+
+    def gauge(self, name, help='', labels=None, fn=None):
+        return _NOOP_METRIC
+
+    def histogram(self, name, help='', labels=None, buckets=DEFAULT_BUCKETS):
+        return _NOOP_METRIC
+
+    def render(self):
+        return ''
+
+
+_registry = NoopRegistry()
+
+
+def get_registry():
+    """当前的指标注册表; 组件在构造时获取指标对象, 因此需要在创建扫描器之前调用 enable_metrics"""
+    return _registry
+
+
+def enable_metrics():
+    global _registry
+    if not _registry.enabled:
+        _registry = MetricsRegistry()
+    return _registry
+
+
+class MetricsServer:
+    """本地 HTTP 采集端点, GET /metrics 返回 Prometheus 文本格式"""
+
+    def __init__(self, registry, host='127.0.0.1', port=9108):
+        # http.server 连带导入 email 等模块, 只在启用采集端点时才导入
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        self.registry = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(handler):
+                if handler.path.split('?')[0] != '/metrics':
+                    handler.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                handler.send_response(200)
+                handler.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                handler.send_header('Content-Length', str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, format, *args):
+                # 不打印每次采集的访问日志
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, name="metrics-server")
+        self._thread.daemon = True
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def start(self):
+        self._thread.start()
+        print(f"指标端点已启动: http://{self.server.server_address[0]}:{self.port}/metrics")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def start_metrics_server(host='127.0.0.1', port=9108):
+    """启用指标并启动采集端点"""
+    return MetricsServer(enable_metrics(), host, port).start()
@@ -0,0 +1,123 @@
+from collections import OrderedDict
+from datetime import datetime
+
+# 超过上限时的淘汰策略
+EVICTION_POLICIES = ('lru', 'lowest_activity')
+
+
+class MonitorRegistry:
+    """
+    监控代币注册表
+    用法与 {token_address: TokenMonitor} 字典相同, 但监控数量有上限, 空闲的监控会被淘汰
+    """
+
+    def __init__(self, max_monitors=500, idle_timeout=1800, policy='lru'):
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"未知的淘汰策略: {policy}")
+        self.max_monitors = max_monitors
+        self.idle_timeout = idle_timeout  # 秒, 从 TokenMonitor.last_update 开始计算
+        self.policy = policy
+
+        self._monitors = OrderedDict()  # 按最近活动排序, 末尾是最近活跃的
+        self._add_listeners = []
+        self._evict_listeners = []
+        self.stats = {
+            'added': 0,
+            'evicted_idle': 0,
+            'evicted_capacity': 0,
+            'removed': 0,
+        }
+
+    def add_listener(self, on_add=None, on_evict=None):
+        """注册回调: on_add(token_address, monitor), on_evict(token_address, monitor, reason)"""
+        if on_add is not None:
+            self._add_listeners.append(on_add)
+        if on_evict is not None:
+            self._evict_listeners.append(on_evict)
+
+    def __contains__(self, token_address):
+        return token_address in self._monitors
+
+    def __getitem__(self, token_address):
+        return self._monitors[token_address]
+
+    def __setitem__(self, token_address, monitor):
+        self.add(token_address, monitor)
+
+    def __len__(self):
+        return len(self._monitors)
+
+    def __iter__(self):
+        return iter(list(self._monitors))
+
+    def get(self, token_address, default=None):
+        return self._monitors.get(token_address, default)
+
+    def keys(self):
+        return list(self._monitors.keys())
+
+    def values(self):
+        return list(self._monitors.values())
+
+    def items(self):
+        return list(self._monitors.items())
+
+    def add(self, token_address, monitor):
+        """加入监控, 超过上限时按策略淘汰一个监控"""
+        is_new = token_address not in self._monitors
+        self._monitors[token_address] = monitor
+        self._monitors.move_to_end(token_address)
+        if not is_new:
+            return
+        self.stats['added'] += 1
+        for listener in self._add_listeners:
+            listener(token_address, monitor)
+        while len(self._monitors) > self.max_monitors:
+            self._evict(self._pick_victim(exclude=token_address), 'capacity')
+
+    def touch(self, token_address):
+        """有新交易时调用, 更新LRU顺序"""
+        if token_address in self._monitors:
+            self._monitors.move_to_end(token_address)
+
+    def remove(self, token_address):
+        """主动停止监控"""
+        if token_address in self._monitors:
+            self._evict(token_address, 'removed')
+
+    def _pick_victim(self, exclude=None):
+        if self.policy == 'lru':
+            for token_address in self._monitors:
+                if token_address != exclude:
+                    return token_address
+        # lowest_activity: 淘汰窗口内交易最少的监控
+        candidates = ((address, monitor) for address, monitor in self._monitors.items()
+                      if address != exclude)
+        return min(candidates, key=lambda item: item[1].volume_window.count)[0]
+
+    def _evict(self, token_address, reason):
+        monitor = self._monitors.pop(token_address)
+        key = 'removed' if reason == 'removed' else f'evicted_{reason}'
+        self.stats[key] += 1
+        print(f"停止监控代币: {monitor.token_info.get('token_name')} ({token_address}), 原因: {reason}")
+        for listener in self._evict_listeners:
+            listener(token_address, monitor, reason)
+
+    def evict_idle(self, now=None):
+        """淘汰空闲超过 idle_timeout 的监控, 返回淘汰数量"""
+        if now is None:
+            now = datetime.now()
+        # LRU 顺序下最久未活跃的在前面, 遇到未超时的即可停止
+        expired = []
+        for token_address, monitor in self._monitors.items():
+            if (now - monitor.last_update).total_seconds() < self.idle_timeout:
+                break
+            expired.append(token_address)
+        for token_address in expired:
+            self._evict(token_address, 'idle')
+        return len(expired)
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['live'] = len(self._monitors)
+        return stats
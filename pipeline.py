@@ -0,0 +1,237 @@
+import queue
+import threading
+import tempfile
+import pickle
+import time
+from metrics import get_registry
+
+# 队列满时的背压策略
+BACKPRESSURE_POLICIES = ('block', 'drop_oldest', 'spill')
+
+
+class SpillBuffer:
+    """溢出缓冲区: 队列满时把消息序列化到临时文件, 队列有空位时再按顺序读回"""
+
+    def __init__(self, spill_dir=None):
+        self._spill_dir = spill_dir
+        self._file = None
+        self._read_pos = 0
+        self._write_pos = 0
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def push(self, item):
+        with self._lock:
+            if self._file is None:
+                self._file = tempfile.TemporaryFile(dir=self._spill_dir)
+            self._file.seek(self._write_pos)
+            pickle.dump(item, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+            self._write_pos = self._file.tell()
+            self.count += 1
+
+    def pop(self):
+        """取出最早溢出的消息, 没有时返回 None"""
+        with self._lock:
+            if self.count == 0:
+                return None
+            self._file.seek(self._read_pos)
+            item = pickle.load(self._file)
+            self._read_pos = self._file.tell()
+            self.count -= 1
+            if self.count == 0:
+                # 全部读回后截断文件, 避免临时文件无限增长
+                self._file.seek(0)
+                self._file.truncate()
+                self._read_pos = 0
+                self._write_pos = 0
+            return item
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self.count = 0
+
+
+class PipelineStage:
+    """流水线中的一个阶段: 有界队列 + 独立工作线程"""
+
+    def __init__(self, name, handler, workers=1, maxsize=10000, policy='block', spill_dir=None):
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"未知的背压策略: {policy}")
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.policy = policy
+        self.queue = queue.Queue(maxsize)
+        self.spill = SpillBuffer(spill_dir) if policy == 'spill' else None
+        self.next_stage = None
+
+        self._threads = []
+        self._running = False
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            'enqueued': 0,
+            'processed': 0,
+            'dropped': 0,
+            'spilled': 0,
+            'errors': 0,
+            'max_depth': 0,
+        }
+        
+        registry = get_registry()
+        labels = {'stage': name}
+        self._m_latency = registry.histogram('pipeline_stage_seconds', '阶段处理耗时', labels)
+        self._m_wait = registry.histogram('pipeline_queue_wait_seconds', '消息在队列中的等待时间', labels)
+        self._m_end_to_end = registry.histogram('pipeline_end_to_end_seconds', '从接收到最后一个阶段完成的耗时')
+        self._m_dropped = registry.counter('pipeline_dropped_total', '背压丢弃的消息数', labels)
+        self._m_errors = registry.counter('pipeline_errors_total', '处理出错的消息数', labels)
+        self._m_spilled = registry.counter('pipeline_spilled_total', '溢出到磁盘的消息数', labels)
+        registry.gauge('pipeline_queue_depth', '队列深度(含溢出区)', labels, fn=self.depth)
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self.stats[key] += n
+
+    def depth(self):
+        """当前积压的消息数(包括溢出到磁盘的部分)"""
+        spilled = self.spill.count if self.spill else 0
+        return self.queue.qsize() + spilled
+
+    def put(self, item, received_at=None):
+        """按背压策略把消息放入队列, received_at 为消息最初被接收的时间"""
+        now = time.perf_counter()
+        item = (received_at if received_at is not None else now, now, item)
+        if self.policy == 'block':
+            self.queue.put(item)
+        elif self.policy == 'drop_oldest':
+            while True:
+                try:
+                    self.queue.put_nowait(item)
+                    break
+                except queue.Full:
+                    try:
+                        self.queue.get_nowait()
+                        self.queue.task_done()
+                        self._count('dropped')
+                        self._m_dropped.inc()
+                    except queue.Empty:
+                        pass
+        else:
+            # 已有溢出数据时继续写入溢出区, 保证消息顺序
+            if self.spill.count > 0:
+                self.spill.push(item)
+                self._count('spilled')
+                self._m_spilled.inc()
+            else:
+                try:
+                    self.queue.put_nowait(item)
+                except queue.Full:
+                    self.spill.push(item)
+                    self._count('spilled')
+                    self._m_spilled.inc()
+
+        with self._stats_lock:
+            self.stats['enqueued'] += 1
+            depth = self.depth()
+            if depth > self.stats['max_depth']:
+                self.stats['max_depth'] = depth
+
+    def _refill_from_spill(self):
+        """队列有空位时把溢出区的消息搬回队列"""
+        while self.spill.count > 0 and not self.queue.full():
+            item = self.spill.pop()
+            if item is None:
+                break
+            try:
+                self.queue.put_nowait(item)
+            except queue.Full:
+                # 极少数情况下被并发写入抢占, 放回溢出区末尾
+                self.spill.push(item)
+                break
+
+    def _worker(self):
+        while self._running or not self.queue.empty() or (self.spill and self.spill.count > 0):
+            if self.spill is not None:
+                self._refill_from_spill()
+            try:
+                received_at, enqueued_at, item = self.queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            try:
+                start = time.perf_counter()
+                self._m_wait.observe(start - enqueued_at)
+                result = self.handler(item)
+                end = time.perf_counter()
+                self._m_latency.observe(end - start)
+                self._count('processed')
+                if self.next_stage is None:
+                    self._m_end_to_end.observe(end - received_at)
+                elif result is not None:
+                    self.next_stage.put(result, received_at)
+            except Exception as e:
+                self._count('errors')
+                self._m_errors.inc()
+                print(f"流水线阶段 {self.name} 处理消息时出错: {e}")
+            finally:
+                self.queue.task_done()
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._threads = []
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"pipeline-{self.name}-{i}")
+            t.daemon = True
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout=None):
+        """停止接收新任务, 处理完积压消息后退出"""
+        self._running = False
+        deadline = time.time() + timeout if timeout is not None else None
+        for t in self._threads:
+            remaining = None if deadline is None else max(0, deadline - time.time())
+            t.join(remaining)
+        self._threads = []
+        if self.spill is not None:
+            self.spill.close()
+
+
+class Pipeline:
+    """多阶段处理流水线: 接收 -> 解码 -> 持久化 -> 检测"""
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+        for current, following in zip(self.stages, self.stages[1:]):
+            current.next_stage = following
+
+    def submit(self, item):
+        """由接收线程调用, 只负责把原始消息放入第一个阶段"""
+        self.stages[0].put(item)
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+
+    def stop(self, timeout=None):
+        # 按顺序停止, 上游排空后下游才停止, 关闭时不丢消息
+        for stage in self.stages:
+            stage.stop(timeout)
+
+    def depths(self):
+        """各阶段当前队列深度"""
+        return {stage.name: stage.depth() for stage in self.stages}
+
+    def stats(self):
+        """各阶段计数器快照"""
+        result = {}
+        for stage in self.stages:
+            with stage._stats_lock:
+                snapshot = dict(stage.stats)
+            snapshot['depth'] = stage.depth()
+            result[stage.name] = snapshot
+        return result
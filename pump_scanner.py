@@ -0,0 +1,130 @@
+import time
+
+# 尽早记录启动时间, 启动耗时包括下面所有模块的导入
+_START = time.perf_counter()
+
+import argparse
+import os
+import signal
+import sys
+import threading
+from event_bus import EventBus
+from metrics import get_registry, start_metrics_server
+
+
+def _elapsed_ms(since=_START):
+    return (time.perf_counter() - since) * 1000
+
+
+def report_startup(stage_times):
+    """打印启动耗时并记录到指标, stage_times 为 [(阶段名, 毫秒)]"""
+    total = _elapsed_ms()
+    stages = ', '.join(f'{name} {ms:.0f}ms' for name, ms in stage_times)
+    print(f"启动完成, 耗时 {total:.0f}ms ({stages})")
+    get_registry().gauge('startup_seconds', '从进程启动到开始扫描的耗时').set(total / 1000)
+
+
+def _start_metrics(port):
+    # 设置端口时启用指标和本地采集端点, 否则指标为空操作
+    port = port or os.environ.get('PUMP_SCANNER_METRICS_PORT')
+    if port:
+        start_metrics_server(port=int(port))
+
+
+def _create_scanner(args, event_bus=None):
+    # 扫描器依赖 websocket 等模块, 在这里导入, 使 --help 等命令不必加载它们
+    from scan_pumpfun import PumpFunScanner
+    options = {'event_bus': event_bus, 'db_path': args.db, 'detect_workers': args.detect_workers}
+    if args.ws_url:
+        options['ws_url'] = args.ws_url
+    if args.record:
+        options['record_path'] = args.record
+    if args.alert_webhook:
+        options['alert_webhook'] = args.alert_webhook
+    return PumpFunScanner(**options)
+
+
+def serve(args):
+    """无界面模式: 只运行扫描、入库和检测, 收到 SIGINT/SIGTERM 时排空流水线后退出"""
+    stage_times = [('导入', _elapsed_ms())]
+    _start_metrics(args.metrics_port)
+
+    start = time.perf_counter()
+    scanner = _create_scanner(args)
+    stage_times.append(('创建扫描器', _elapsed_ms(start)))
+
+    start = time.perf_counter()
+    scanner.start_scanning()
+    stage_times.append(('启动扫描', _elapsed_ms(start)))
+    report_startup(stage_times)
+
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda signum, frame: stop.set())
+
+    while not stop.wait(args.status_interval):
+        depths = scanner.pipeline.depths()
+        print(f"状态: 连接 {scanner.connection.state}, 监控 {len(scanner.monitored_tokens)} 个代币, "
+              f"待评分 {scanner.scoring.pending_count()}, 队列 {depths}, 警报 {scanner.alerts.stats['emitted']}")
+
+    print("正在停止扫描器...")
+    scanner.stop_scanning()
+
+
+def ui(args):
+    """带界面模式: 扫描器和界面在同一进程, 通过事件总线推送数据"""
+    # PyQt6 只在界面模式下导入
+    from PyQt6.QtWidgets import QApplication
+    from cyberpunk_ui import CyberpunkUI
+    stage_times = [('导入', _elapsed_ms())]
+    _start_metrics(args.metrics_port)
+
+    # 创建 Qt 应用
+    app = QApplication(sys.argv)
+    event_bus = EventBus()
+
+    print("正在创建扫描器...")
+    start = time.perf_counter()
+    scanner = _create_scanner(args, event_bus)
+    scanner.start_scanning()
+    stage_times.append(('启动扫描', _elapsed_ms(start)))
+
+    print("正在创建UI界面...")
+    start = time.perf_counter()
+    # 与扫描器共用数据库对象
+    window = CyberpunkUI(event_bus=event_bus, db=scanner.db)
+    window.show()
+    stage_times.append(('创建界面', _elapsed_ms(start)))
+    report_startup(stage_times)
+
+    print("应用程序开始运行...")
+    code = app.exec()
+    scanner.stop_scanning()
+    return code
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='pump_scanner', description='pump.fun 新代币扫描器')
+    sub = parser.add_subparsers(dest='command')
+    for name, help in (('serve', '无界面运行扫描器'), ('ui', '运行扫描器和界面')):
+        p = sub.add_parser(name, help=help)
+        p.add_argument('--db', default='pump_fun.db', help='数据库文件')
+        p.add_argument('--ws-url', help='WebSocket 地址, 默认连接 pumpportal.fun')
+        p.add_argument('--record', help='把收到的原始消息录制到该文件(gzip JSONL)')
+        p.add_argument('--detect-workers', type=int, default=0, help='分片检测进程数, 0 表示在检测线程中处理')
+        p.add_argument('--alert-webhook', help='把警报 POST 到该地址, 例如 http://127.0.0.1:8080/alerts')
+        p.add_argument('--metrics-port', type=int, help='指标端点端口, 默认读取 PUMP_SCANNER_METRICS_PORT')
+        if name == 'serve':
+            p.add_argument('--status-interval', type=float, default=60, help='打印运行状态的间隔(秒)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        return serve(args)
+    if args.command == 'ui':
+        return ui(args)
+    parser.print_help()
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
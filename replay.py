@@ -0,0 +1,362 @@
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import os
+import socketserver
+import struct
+import tempfile
+import threading
+import time
+
+# RFC 6455 握手使用的固定 GUID
+_WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+_OP_TEXT = 0x1
+_OP_CLOSE = 0x8
+_OP_PING = 0x9
+_OP_PONG = 0xA
+
+
+class FrameRecorder:
+    """
+    把 WebSocket 收到的原始消息按到达时间录制到 gzip 压缩的 JSONL 文件
+    每行格式: {"t": 到达时间(秒), "frame": 原始消息文本}
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = gzip.open(path, 'wt', encoding='utf-8')
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def write(self, frame, t=None):
+        if isinstance(frame, (bytes, bytearray)):
+            frame = frame.decode('utf-8')
+        line = json.dumps({'t': time.time() if t is None else t, 'frame': frame}, ensure_ascii=False)
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line + '\n')
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                print(f"已录制 {self.count} 条消息到 {self.path}")
+
+
+def load_recording(path):
+    """读取录制文件, 返回 [(到达时间, 原始消息)]"""
+    frames = []
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                frames.append((record['t'], record['frame']))
+    return frames
+
+
+def _encode_frame(payload, opcode=_OP_TEXT):
+    """服务端发往客户端的帧不加掩码"""
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+    return header + payload
+
+
+def _recv_exact(sock, n):
+    data = b''
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            raise ConnectionError("连接已关闭")
+        data += chunk
+    return data
+
+
+def _read_frame(sock):
+    """读取客户端发来的一帧, 返回 (opcode, payload)"""
+    b0, b1 = _recv_exact(sock, 2)
+    opcode = b0 & 0x0F
+    length = b1 & 0x7F
+    if length == 126:
+        length = struct.unpack('!H', _recv_exact(sock, 2))[0]
+    elif length == 127:
+        length = struct.unpack('!Q', _recv_exact(sock, 8))[0]
+    mask = _recv_exact(sock, 4) if b1 & 0x80 else None
+    payload = _recv_exact(sock, length)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return opcode, payload
+
+
+class ReplayServer:
+    """
+    本地 WebSocket 回放服务器, 代替 wss://pumpportal.fun/api/data
+    客户端连接后按录制时的时间间隔发送消息, speed 为回放倍速, 0 表示不等待, 以最快速度发送
+    客户端发来的订阅请求会被读取并忽略, 录制文件中已经包含了当时订阅到的消息
+    """
+
+    def __init__(self, frames, speed=1.0, host='127.0.0.1', port=0):
+        self.frames = frames
+        self.speed = speed
+        self.done = threading.Event()  # 一次完整回放结束
+        self.first_sent_at = None
+        self.last_sent_at = None
+        self.sent = 0
+        server = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(handler):
+                sock = handler.request
+                if not server._handshake(sock):
+                    return
+                send_lock = threading.Lock()
+                closed = threading.Event()
+                reader = threading.Thread(target=server._read_loop, args=(sock, send_lock, closed),
+                                          name="replay-reader")
+                reader.daemon = True
+                reader.start()
+                server._replay(sock, send_lock, closed)
+                # 回放结束后保持连接, 直到客户端主动关闭, 避免触发扫描器重连
+                closed.wait()
+
+        self.server = socketserver.ThreadingTCPServer((host, port), Handler, bind_and_activate=False)
+        self.server.allow_reuse_address = True
+        self.server.daemon_threads = True
+        self.server.server_bind()
+        self.server.server_activate()
+        self._thread = threading.Thread(target=self.server.serve_forever, name="replay-server")
+        self._thread.daemon = True
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'ws://{host}:{port}/api/data'
+
+    def _handshake(self, sock):
+        request = b''
+        while b'\r\n\r\n' not in request:
+            chunk = sock.recv(4096)
+            if not chunk:
+                return False
+            request += chunk
+        key = None
+        for line in request.decode('latin-1').split('\r\n')[1:]:
+            name, _, value = line.partition(':')
+            if name.strip().lower() == 'sec-websocket-key':
+                key = value.strip()
+        if key is None:
+            sock.sendall(b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n')
+            return False
+        accept = base64.b64encode(hashlib.sha1((key + _WS_GUID).encode('ascii')).digest()).decode('ascii')
+        sock.sendall((
+            'HTTP/1.1 101 Switching Protocols\r\n'
+            'Upgrade: websocket\r\n'
+            'Connection: Upgrade\r\n'
+            f'Sec-WebSocket-Accept: {accept}\r\n\r\n'
+        ).encode('ascii'))
+        return True
+
+    def _read_loop(self, sock, send_lock, closed):
+        """读取客户端消息: 回应 ping 和关闭帧, 其他消息丢弃"""
+        try:
+            while True:
+                opcode, payload = _read_frame(sock)
+                if opcode == _OP_PING:
+                    with send_lock:
+                        sock.sendall(_encode_frame(payload, _OP_PONG))
+                elif opcode == _OP_CLOSE:
+                    with send_lock:
+                        sock.sendall(_encode_frame(payload[:2], _OP_CLOSE))
+                    break
+        except (OSError, ConnectionError):
+            pass
+        finally:
+            closed.set()
+
+    def _replay(self, sock, send_lock, closed):
+        if not self.frames:
+            self.done.set()
+            return
+        first_t = self.frames[0][0]
+        start = self.first_sent_at = time.perf_counter()
+        try:
+            for t, frame in self.frames:
+                if closed.is_set():
+                    return
+                if self.speed > 0:
+                    delay = (t - first_t) / self.speed - (time.perf_counter() - start)
+                    if delay > 0:
+                        time.sleep(delay)
+                data = _encode_frame(frame)
+                with send_lock:
+                    sock.sendall(data)
+                self.sent += 1
+        except OSError as e:
+            print(f"回放连接中断: {e}")
+            return
+        self.last_sent_at = time.perf_counter()
+        self.done.set()
+
+    def start(self):
+        self._thread.start()
+        speed = '最快速度' if self.speed <= 0 else f'{self.speed}x'
+        print(f"回放服务器已启动: {self.url} ({len(self.frames)} 条消息, {speed})")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _trade_mints(frames):
+    """录制文件中出现过交易的代币地址, 压测时预先加入监控, 保证交易消息走完整条流水线"""
+    from decoder import MessageDecoder, TradeEvent
+    decoder = MessageDecoder()
+    mints = []
+    seen = set()
+    for _, frame in frames:
+        event = decoder.decode(frame)
+        if isinstance(event, TradeEvent) and event.mint not in seen:
+            seen.add(event.mint)
+            mints.append(event.mint)
+    return mints
+
+
+def _peak_rss_mb():
+    """进程的峰值内存; resource 模块只在 Unix 上可用, 其他平台返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Linux 上 ru_maxrss 的单位是 KB
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def run_benchmark(path, speed=0, queue_size=10000, backpressure='block', detect_workers=0, drain_timeout=600):
+    """用录制文件压测扫描器, 返回吞吐量、端到端延迟分位数和峰值内存"""
+    from metrics import enable_metrics
+    from scan_pumpfun import PumpFunScanner
+    from analyzer import TokenAnalyzer
+
+    frames = load_recording(path)
+    mints = _trade_mints(frames)
+    registry = enable_metrics()
+    db_dir = tempfile.mkdtemp(prefix='pump-bench-')
+    db_path = os.path.join(db_dir, 'bench.db')
+    server = ReplayServer(frames, speed).start()
+    scanner = PumpFunScanner(
+        queue_size=queue_size,
+        backpressure=backpressure,
+        max_monitors=max(len(mints), 1),
+        ws_url=server.url,
+        db_path=db_path,
+        detect_workers=detect_workers,
+        # 录制的代币已经预先加入监控, 不读取 config.yaml, 压测时不请求外部API
+        analyzer=TokenAnalyzer(config_path=None, db_path=db_path),
+        alert_log=os.path.join(db_dir, 'alerts.jsonl'),
+    )
+    for mint in mints:
+        scanner.monitored_tokens[mint] = scanner.create_monitor({'token_address': mint, 'token_name': mint, 'market_cap': 0})
+
+    scanner.start_scanning()
+    try:
+        server.done.wait()
+        # 等待流水线处理完所有消息
+        decode_stage = scanner.pipeline.stages[0]
+        deadline = time.perf_counter() + drain_timeout
+        while time.perf_counter() < deadline:
+            stats = scanner.pipeline.stats()
+            if stats['decode']['processed'] + stats['decode']['errors'] >= server.sent and \
+                    all(s['depth'] == 0 for s in stats.values()):
+                break
+            time.sleep(0.01)
+        drained_at = time.perf_counter()
+    finally:
+        scanner.stop_scanning()
+        server.stop()
+
+    end_to_end = registry.histogram('pipeline_end_to_end_seconds')
+    # 空录制文件没有发送任何消息
+    elapsed = drained_at - server.first_sent_at if server.first_sent_at is not None else 0
+    processed = decode_stage.stats['processed']
+    return {
+        'recording': path,
+        'frames': len(frames),
+        'sent': server.sent,
+        'processed': processed,
+        'elapsed_seconds': round(elapsed, 3),
+        'messages_per_second': round(processed / elapsed, 1) if elapsed > 0 else None,
+        'end_to_end_ms': {
+            name: None if value is None else round(value * 1000, 3)
+            for name, value in (
+                ('p50', end_to_end.percentile(0.50)),
+                ('p90', end_to_end.percentile(0.90)),
+                ('p99', end_to_end.percentile(0.99)),
+            )
+        },
+        'pipeline': scanner.pipeline.stats(),
+        'alerts': scanner.alerts.stats,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='录制/回放 WebSocket 消息, 用于吞吐量压测')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    record = sub.add_parser('record', help='连接真实数据源, 运行扫描器并录制原始消息')
+    record.add_argument('output', help='输出文件, 例如 capture.jsonl.gz')
+    record.add_argument('--duration', type=float, default=600, help='录制时长(秒)')
+
+    serve = sub.add_parser('serve', help='启动本地回放服务器')
+    serve.add_argument('recording')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--speed', type=float, default=1.0, help='回放倍速, 0 表示最快速度')
+
+    bench = sub.add_parser('bench', help='用录制文件压测扫描器')
+    bench.add_argument('recording')
+    bench.add_argument('--speed', type=float, default=0, help='回放倍速, 0 表示最快速度')
+    bench.add_argument('--queue-size', type=int, default=10000)
+    bench.add_argument('--backpressure', default='block', choices=('block', 'drop_oldest', 'spill'))
+    bench.add_argument('--detect-workers', type=int, default=0, help='分片检测进程数, 0 表示在检测线程中处理')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'record':
+        from scan_pumpfun import PumpFunScanner
+        scanner = PumpFunScanner(record_path=args.output)
+        scanner.start_scanning()
+        try:
+            time.sleep(args.duration)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            scanner.stop_scanning()
+    elif args.command == 'serve':
+        server = ReplayServer(load_recording(args.recording), args.speed, args.host, args.port).start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            server.stop()
+    else:
+        result = run_benchmark(args.recording, args.speed, args.queue_size, args.backpressure, args.detect_workers)
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
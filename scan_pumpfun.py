@@ -1,216 +1,448 @@
-import websocket
-import json
 import time
 from datetime import datetime
 import threading
-from database import TokenDatabase
-import asyncio
+import heapq
+import itertools
+from collections import deque, OrderedDict
+from database import TokenDatabase, now_ms
 from analyzer import TokenAnalyzer
+from pipeline import Pipeline, PipelineStage
+from scoring import ScoringService
+from sliding_window import SlidingWindow
+from monitor_registry import MonitorRegistry
+from subscriptions import SubscriptionManager
+from event_bus import TOPIC_TOKEN, TOPIC_TRADE, TOPIC_ANALYTICS
+from decoder import MessageDecoder, CreateEvent
+from metrics import get_registry
+from replay import FrameRecorder
+from connection import ConnectionSupervisor
+from sharded_detection import ShardedDetector, ShardedMonitor
+from candles import CandleEngine
+from trader_aggregates import TraderAggregator
+from alerts import AlertManager, DatabaseSink, JsonlSink, EventBusSink, WebhookSink
 
 class PumpFunScanner:
-    def __init__(self):
-        self.ws = None
-        self.db = TokenDatabase()  # 初始化数据库连接
+    def __init__(self, queue_size=10000, backpressure='spill', db_batch_size=500, db_flush_interval_ms=100,
+                 max_monitors=500, monitor_idle_timeout=1800, monitor_eviction='lru', event_bus=None,
+                 ws_url='wss://pumpportal.fun/api/data', db_path='pump_fun.db', record_path=None, analyzer=None,
+                 detect_workers=0, analytics_interval=5.0, alert_cooldown=300, alert_log='token_alerts.jsonl',
+                 alert_webhook=None):
+        # 进程内事件总线, 入库后的代币和交易推送给界面等订阅者
+        self.event_bus = event_bus
+        # 初始化数据库连接, 交易按批合并提交
+        self.db = TokenDatabase(db_path, batch_size=db_batch_size, flush_interval_ms=db_flush_interval_ms)
+        # 监控代币的 1s/1m/5m K线, 收盘后批量写入 candles 表
+        self.candles = CandleEngine(self.db)
+        # 每个 (交易者, 代币) 的买卖总量和交易次数, 增量定时累加到 trader_stats 表
+        self.trader_stats = TraderAggregator(self.db)
         
-        # 监控的代币信息
-        self.monitored_tokens = {}  # {token_address: TokenMonitor}
+        # 监控的代币信息, 数量有上限, 空闲的监控定期淘汰
+        self.monitored_tokens = MonitorRegistry(max_monitors, monitor_idle_timeout, monitor_eviction)  # {token_address: TokenMonitor}
+        self.sweep_interval = 30  # 秒
+        self._sweep_stop = threading.Event()
+        self._sweep_thread = None
         
-        # WebSocket连接URL
-        self.ws_url = 'wss://pumpportal.fun/api/data'
+        # 只订阅正在监控的代币的交易, 监控集合变化时自动订阅/退订
+        self.subscriptions = SubscriptionManager(self._send_ws)
+        self.monitored_tokens.add_listener(
+            on_add=lambda token_address, monitor: self.subscriptions.subscribe(token_address),
+            on_evict=lambda token_address, monitor, reason: self.subscriptions.unsubscribe(token_address)
+        )
+        
+        # detect_workers > 0 时按代币地址分片到多个检测进程, 本进程只保留轻量的监控记录
+        self.detector = None
+        if detect_workers > 0:
+            self.detector = ShardedDetector(self.on_shard_alert, workers=detect_workers)
+            self.monitored_tokens.add_listener(
+                on_add=lambda token_address, monitor: self.detector.add(token_address, monitor.token_info),
+                on_evict=lambda token_address, monitor, reason: self.detector.remove(token_address)
+            )
+        
+        # 监控代币的向量化特征, 定时批量计算; 未安装 numpy 或 analytics_interval 为 0 时不启用
+        self.analytics = None
+        if analytics_interval:
+            # analytics 连带导入 numpy, 较慢, 只在启用时导入
+            import analytics
+            if analytics.available():
+                self.analytics = analytics.TradeAnalytics(interval=analytics_interval, on_scores=self.on_analytics)
+                self.monitored_tokens.add_listener(
+                    on_evict=lambda token_address, monitor, reason: self.analytics.remove(token_address)
+                )
+        
+        # 可疑活动警报: 按 (代币, 类型) 去重后由投递线程写入数据库、JSONL 文件、界面和 webhook
+        sinks = [DatabaseSink(self.db)]
+        if alert_log:
+            sinks.append(JsonlSink(alert_log))
+        if event_bus is not None:
+            sinks.append(EventBusSink(event_bus))
+        if alert_webhook:
+            sinks.append(WebhookSink(alert_webhook))
+        self.alerts = AlertManager(sinks, cooldown=alert_cooldown)
+        
+        # WebSocket连接URL, 回放测试时指向本地回放服务器
+        self.ws_url = ws_url
+        # 唯一的连接线程, 断线后退避重连并恢复订阅
+        self.connection = ConnectionSupervisor(
+            ws_url,
+            on_message=self.on_message,
+            on_open=self.on_open,
+            on_close=self.on_close,
+            on_error=self.on_error,
+        )
+        # 设置 record_path 时把收到的原始消息录制下来, 供 replay.py 回放
+        self.recorder = FrameRecorder(record_path) if record_path else None
         
         # 添加 TokenAnalyzer 实例
-        self.analyzer = TokenAnalyzer()
+        self.analyzer = analyzer if analyzer is not None else TokenAnalyzer(db_path=db_path)
+        
+        # 评分服务在独立的事件循环中运行, 检测线程只负责提交
+        self.monitor_score_threshold = 10
+        self.scoring = ScoringService(self.analyzer, self.on_token_scored)
+        
+        registry = get_registry()
+        self._m_received = registry.counter('ws_frames_received_total', 'WebSocket收到的消息数')
+        # 消息是解码后的文本, 按字符计数, 不为统计字节数额外编码一次
+        self._m_received_chars = registry.counter('ws_received_chars_total', 'WebSocket收到的消息字符数')
+        registry.gauge('monitored_tokens', '当前监控的代币数', fn=lambda: len(self.monitored_tokens))
+        registry.gauge('scoring_pending', '等待评分的代币数', fn=self.scoring.pending_count)
+        
+        # 消息解码器: 未监控代币的交易在完整解码之前就被丢弃
+        self.decoder = MessageDecoder(is_watched=self.monitored_tokens.__contains__)
+        
+        # 分阶段处理流水线: WebSocket线程只负责接收, 解码/入库/检测各有独立线程
+        self.pipeline = Pipeline([
+            PipelineStage('decode', self.decode_message, maxsize=queue_size, policy=backpressure),
+            PipelineStage('persist', self.persist_event, maxsize=queue_size, policy=backpressure),
+            PipelineStage('detect', self.detect_event, maxsize=queue_size, policy=backpressure),
+        ])
 
     def on_message(self, ws, message):
-        try:
-            data = json.loads(message)
-            print(f"收到WebSocket消息: {data}")  # 调试信息
-            
-            # 处理新代币创建事件
-            if data.get('txType') == 'create':  # 修改这里，使用txType而不是type
-                self.process_create(data)
-            
-            if data.get('txType') == 'buy' or data.get('txType') == 'sell':
-                self.process_trade(data)
+        # 接收阶段: 只入队, 不做任何处理
+        self._m_received.inc()
+        self._m_received_chars.inc(len(message))
+        if self.recorder is not None:
+            self.recorder.write(message)
+        self.pipeline.submit(message)
+
+    def decode_message(self, message):
+        """解码阶段: 预过滤后解码为 CreateEvent / TradeEvent, 不关心的事件返回 None"""
+        return self.decoder.decode(message)
 
-        except Exception as e:
-            print(f"处理WebSocket消息时出错: {e}")
+    def persist_event(self, data):
+        """持久化阶段: 写入数据库, 返回交给检测阶段的事件"""
+        if isinstance(data, CreateEvent):
+            token_info = self.process_create(data)
+            if token_info:
+                if self.event_bus is not None:
+                    self.event_bus.publish(TOPIC_TOKEN, token_info)
+                return ('create', token_info)
+        else:
+            trade_info = self.process_trade(data)
+            if trade_info:
+                if self.event_bus is not None:
+                    self.event_bus.publish(TOPIC_TRADE, trade_info)
+                return ('trade', trade_info)
+        return None
+
+    def detect_event(self, event):
+        """检测阶段: 决定是否监控新代币, 更新监控并检查异常交易"""
+        kind, info = event
+        if kind == 'create':
+            self.detect_create(info)
+        elif kind == 'trade':
+            self.detect_trade(info)
+        elif kind == 'sweep':
+            self.monitored_tokens.evict_idle()
+        elif kind == 'scored':
+            token_info, analysis = info
+            if self.should_monitor_token(analysis):
+                self.monitored_tokens[token_info['token_address']] = self.create_monitor(token_info)
+                print(f"开始监控代币: {token_info['token_name']}")
 
     def on_error(self, ws, error):
         print(f"WebSocket错误: {error}")
 
     def on_close(self, ws, close_status_code, close_msg):
+        # 重连由连接监管器负责, 这里只记录状态
         print("WebSocket连接关闭")
-        # 尝试重新连接
-        time.sleep(5)
-        self.start_scanning()
+        self.subscriptions.on_disconnected()
 
     def on_open(self, ws):
         print("WebSocket连接已建立")
-        # 订阅新代币事件
-        subscribe_msg = {
-            "method": "subscribeNewToken"
-        }
-        ws.send(json.dumps(subscribe_msg))
+        # 订阅新代币事件, 并恢复所有监控代币的交易订阅
+        self.subscriptions.on_connected()
+
+    def _send_ws(self, text):
+        """订阅管理器使用的发送函数"""
+        self.connection.send(text)
 
-    async def should_monitor_token(self, token_info):
+    def should_monitor_token(self, analysis):
         """
         判断是否需要监控该代币
         基于 Google 搜索结果判断
         """
-        try:
-            # 获取代币的提及分析
-            analysis = await self.analyzer.analyze_token_mentions(
-                token_info['token_address'],
-                token_info['token_name']
-            )
-            
-            # 如果总提及次数超过10，则开始监控
-            return analysis['total_score'] > 10
-            
-        except Exception as e:
-            print(f"检查代币提及度时出错: {e}")
-            return False
+        # 如果总提及次数超过10，则开始监控
+        return analysis['total_score'] > self.monitor_score_threshold
+
+    def create_monitor(self, token_info):
+        """分片模式下检测状态在检测进程中, 注册表里只放 ShardedMonitor"""
+        if self.detector is not None:
+            return ShardedMonitor(token_info)
+        return TokenMonitor(token_info)
+
+    def on_shard_alert(self, alert):
+        """分片检测进程发回的警报, 在收集线程上调用"""
+        self.alert_suspicious_activity(alert['token_address'], alert['token_name'], alert['detections'])
+
+    def alert_suspicious_activity(self, token_address, token_name, detections):
+        """提交给警报管理器, 只做去重和入队, 写入在投递线程中进行"""
+        self.alerts.report(token_address, token_name, detections)
+
+    def on_analytics(self, tokens, features):
+        """批量分析结果, 在分析线程上调用"""
+        if self.event_bus is not None:
+            self.event_bus.publish(TOPIC_ANALYTICS, {'timestamp': now_ms(), 'tokens': tokens, 'features': features})
+
+    def on_token_scored(self, token_info, analysis):
+        """评分完成回调(运行在评分线程), 结果交回检测阶段处理, 监控表只由检测线程修改"""
+        self.pipeline.stages[-1].put(('scored', (token_info, analysis)))
 
     def process_trade(self, data):
         """处理交易数据"""
-        token_address = data.get('mint')
+        token_address = data.mint
         if token_address in self.monitored_tokens:
-            monitor = self.monitored_tokens[token_address]
-            
             trade_info = {
-                'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                'timestamp': now_ms(),
                 'token_address': token_address,
-                'trader_address': data.get('traderPublicKey'),
-                'token_amount': data.get('tokenAmount', 0),
-                'sol_amount': data.get('vSolInBondingCurve', 0),
-                'market_cap': data.get('marketCapSol', 0),
-                'bonding_curve': data.get('bondingCurveKey'),
-                'v_tokens': data.get('vTokensInBondingCurve', 0),
-                'v_sol': data.get('vSolInBondingCurve', 0),
-                'type': data.get('txType'),
-                'signature': data.get('signature', '')  # 添加交易签名
+                'trader_address': data.trader,
+                'token_amount': data.token_amount,
+                'sol_amount': data.sol_amount,
+                'market_cap': data.market_cap_sol,
+                'bonding_curve': data.bonding_curve,
+                'v_tokens': data.v_tokens,
+                'v_sol': data.v_sol,
+                'type': data.tx_type,
+                'signature': data.signature  # 添加交易签名
             }
             
-            # 存入数据库
-            self.db.add_trade(trade_info)
-            
-            # 更新监控信息
-            monitor = self.monitored_tokens[token_address]
-            monitor.update_trade(trade_info)
-            
-            # 检查是否有异常交易
-            if monitor.check_suspicious_activity():
-                self.alert_suspicious_activity(token_address, monitor)
+            # 存入数据库, 并更新K线和交易者统计; 重复投递的交易已在表中, 不再重复累计
+            if not self.db.add_trade(trade_info):
+                return None
+            self.candles.update(trade_info)
+            self.trader_stats.update(trade_info)
+            return trade_info
+        return None
+
+    def detect_trade(self, trade_info):
+        """更新监控信息并检查异常交易"""
+        monitor = self.monitored_tokens.get(trade_info['token_address'])
+        if monitor is None:
+            return
+        
+        # 更新监控信息
+        monitor.update_trade(trade_info)
+        self.monitored_tokens.touch(trade_info['token_address'])
+        if self.analytics is not None:
+            self.analytics.add_trade(trade_info)
+        if self.detector is not None:
+            # 检测在分片进程中进行, 警报通过 on_shard_alert 返回
+            self.detector.submit_trade(trade_info)
+            return
+        
+        # 检查是否有异常交易
+        detections = monitor.check_suspicious_activity()
+        if detections:
+            self.alert_suspicious_activity(trade_info['token_address'], monitor.token_info.get('token_name'), detections)
 
     def process_create(self, data):
         """处理新代币数据"""
         token_info = {
-            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            'token_address': data.get('mint'),
-            'token_name': data.get('name'),
-            'token_symbol': data.get('symbol'),
-            'market_cap': data.get('marketCapSol', 0),  # 使用marketCapSol
-            'initial_buy': data.get('initialBuy', 0),   # 添加initialBuy
-            'v_tokens': data.get('vTokensInBondingCurve', 0),  # 添加代币数量
-            'v_sol': data.get('vSolInBondingCurve', 0)  # 添加SOL数量
+            'timestamp': now_ms(),
+            'token_address': data.mint,
+            'token_name': data.name,
+            'token_symbol': data.symbol,
+            'market_cap': data.market_cap_sol,  # 使用marketCapSol
+            'initial_buy': data.initial_buy,   # 添加initialBuy
+            'v_tokens': data.v_tokens,  # 添加代币数量
+            'v_sol': data.v_sol  # 添加SOL数量
         }
         
-        print(f"处理新代币数据: {token_info}")
-        
         # 存入数据库
         if self.db.add_new_token(token_info):
             print(f"新代币已添加到数据库: {token_info['token_name']}")
-            
-            # 使用异步方式调用 should_monitor_token
-            loop = asyncio.get_event_loop()
-            should_monitor = loop.run_until_complete(self.should_monitor_token(token_info))
-            
-            if should_monitor:
-                self.monitored_tokens[token_info['token_address']] = TokenMonitor(token_info)
-                print(f"开始监控代币: {token_info['token_name']}")
+            return token_info
+        return None
+
+    def detect_create(self, token_info):
+        """提交新代币到评分队列, 无评分模式下跳过"""
+        if self.analyzer.enabled:
+            self.scoring.submit(token_info)
 
     def start_scanning(self):
-        websocket.enableTrace(True)
-        self.ws = websocket.WebSocketApp(
-            self.ws_url,
-            on_message=self.on_message,
-            on_error=self.on_error,
-            on_close=self.on_close,
-            on_open=self.on_open
-        )
-        
-        # 在单独的线程中运行WebSocket
-        wst = threading.Thread(target=self.ws.run_forever)
-        wst.daemon = True
-        wst.start()
+        # 流水线和评分服务只启动一次, 重连时复用
+        self.pipeline.start()
+        self.scoring.start()
+        self.candles.start()
+        self.trader_stats.start()
+        self.alerts.start()
+        if self.analytics is not None:
+            self.analytics.start()
+        if self.detector is not None:
+            self.detector.start()
+        if self._sweep_thread is None:
+            self._sweep_thread = threading.Thread(target=self._sweep_loop, name="monitor-sweep")
+            self._sweep_thread.daemon = True
+            self._sweep_thread.start()
+        # 连接只建立一次, 之后的重连都在连接线程内部完成
+        self.connection.start()
+
+    def _sweep_loop(self):
+        """定期让检测线程淘汰空闲监控, 监控表始终只由检测线程修改"""
+        while not self._sweep_stop.wait(self.sweep_interval):
+            self.pipeline.stages[-1].put(('sweep', None))
+
+    def stop_scanning(self):
+        """关闭连接并排空流水线中的积压消息"""
+        self.connection.stop()
+        self._sweep_stop.set()
+        # 先停评分, 停止前完成的评分结果进入检测队列, 随流水线一起排空
+        self.scoring.stop()
+        self.analyzer.close()
+        self.pipeline.stop()
+        if self.detector is not None:
+            self.detector.stop()
+        self.candles.stop()
+        self.trader_stats.stop()
+        self.alerts.stop()
+        if self.analytics is not None:
+            self.analytics.stop()
+        self.db.close()
+        if self.recorder is not None:
+            self.recorder.close()
 
 class TokenMonitor:
-    def __init__(self, token_info):
+    def __init__(self, token_info, history_size=1000, max_traders=5000):
         self.token_info = token_info
         self.market_cap = token_info['market_cap']
-        self.trades = []
-        self.trader_stats = {}  # {trader_address: TraderStats}
+        self.trades = deque(maxlen=history_size)  # 环形缓冲区, 只保留最近的交易
+        self.trader_stats = OrderedDict()  # {trader_address: TraderStats}, 超过上限时淘汰最久未交易的
+        self.max_traders = max_traders
         self.last_update = datetime.now()
         
         # 警报阈值
         self.large_trade_threshold = 1000  # SOL
         self.rapid_trades_threshold = 3     # 次数
         self.rapid_trades_window = 300      # 5分钟
+        self.large_trade_lookback = 10      # 只检查最近10笔交易
+        
+        # 增量检测状态: 最近N笔是否为大额交易, 以及当前处于频繁交易状态的交易者
+        self.recent_large_flags = deque(maxlen=self.large_trade_lookback)
+        self.recent_large_count = 0
+        self.rapid_traders = {}  # {trader_address: 频繁状态的过期时间(秒)}
+        self._rapid_expiry_heap = []  # [(过期时间, trader_address)], 延迟删除
+        self.volume_window = SlidingWindow(self.rapid_trades_window)
+        self.last_event_time = None
         
     def update_trade(self, trade_info):
         """更新交易信息"""
         self.trades.append(trade_info)
         self.market_cap = trade_info['market_cap']
+        event_time = trade_info['timestamp'] / 1000
+        self.last_event_time = event_time
+        self.volume_window.add(event_time, trade_info['token_amount'])
+        
+        # 维护最近N笔交易中大额交易的数量
+        is_large = trade_info['token_amount'] * trade_info['market_cap'] > self.large_trade_threshold
+        if len(self.recent_large_flags) == self.recent_large_flags.maxlen:
+            self.recent_large_count -= self.recent_large_flags[0]
+        self.recent_large_flags.append(is_large)
+        self.recent_large_count += is_large
         
         trader = trade_info['trader_address']
-        if trader not in self.trader_stats:
-            self.trader_stats[trader] = TraderStats()
+        stats = self.trader_stats.get(trader)
+        if stats is None:
+            stats = self.trader_stats[trader] = TraderStats(self.rapid_trades_threshold, self.rapid_trades_window)
+            if len(self.trader_stats) > self.max_traders:
+                self.trader_stats.popitem(last=False)
+        else:
+            self.trader_stats.move_to_end(trader)
             
-        self.trader_stats[trader].add_trade(trade_info)
+        stats.add_trade(trade_info)
+        if stats.rapid:
+            # 交易者越过阈值时立即标记, 并记录该状态何时过期
+            expiry = stats.rapid_until()
+            self.rapid_traders[trader] = expiry
+            heapq.heappush(self._rapid_expiry_heap, (expiry, trader))
         self.last_update = datetime.now()
         
-    def check_suspicious_activity(self):
-        """检查可疑活动"""
-        suspicious = False
+    def _expire_rapid_traders(self, now):
+        """移除频繁交易状态已过期的交易者"""
+        heap = self._rapid_expiry_heap
+        while heap and heap[0][0] <= now:
+            expiry, trader = heapq.heappop(heap)
+            # 堆中可能有旧的过期时间, 只有与当前记录一致时才移除
+            if self.rapid_traders.get(trader) == expiry:
+                del self.rapid_traders[trader]
+        
+    def check_suspicious_activity(self, now=None):
+        """
+        检查可疑活动, 返回检测结果列表, 没有可疑活动时为空列表
+        每项为 {'activity_type', 'description', 'magnitude', ...}, magnitude 用于评定严重度
+        """
+        if now is None:
+            now = self.last_event_time if self.last_event_time is not None else time.time()
+        detections = []
         
         # 检查大额交易
-        for trade in self.trades[-10:]:  # 只检查最近10笔交易
-            if trade['token_amount'] * trade['market_cap'] > self.large_trade_threshold:
-                suspicious = True
-                break
+        if self.recent_large_count > 0:
+            detections.append({
+                'activity_type': 'large_trade',
+                'description': f"最近{len(self.recent_large_flags)}笔交易中有{self.recent_large_count}笔大额交易",
+                'magnitude': self.recent_large_count,
+                'market_cap': self.market_cap,
+            })
         
         # 检查频繁交易
-        for stats in self.trader_stats.values():
-            if stats.check_rapid_trades(self.rapid_trades_threshold, self.rapid_trades_window):
-                suspicious = True
-                break
-                
-        return suspicious
+        self._expire_rapid_traders(now)
+        if self.rapid_traders:
+            detections.append({
+                'activity_type': 'rapid_trades',
+                'description': f"{len(self.rapid_traders)}个交易者在{self.rapid_trades_window}秒内"
+                               f"交易{self.rapid_trades_threshold}次以上",
+                'magnitude': len(self.rapid_traders),
+                'traders': list(itertools.islice(self.rapid_traders, 20)),
+            })
+        return detections
 
 class TraderStats:
-    def __init__(self):
-        self.trades = []
+    def __init__(self, rapid_trades_threshold=3, rapid_trades_window=300):
+        self.rapid_trades_threshold = rapid_trades_threshold
+        # 只需要保留达到阈值所需的事件, 高频交易者也不会无限占用内存
+        self.window = SlidingWindow(rapid_trades_window, max_events=max(rapid_trades_threshold, 100))
+        self.trade_count = 0
         self.total_buy_amount = 0
         self.total_sell_amount = 0
         self.last_trade_time = None
+        self.rapid = False
         
     def add_trade(self, trade_info):
         """添加新的交易记录"""
-        self.trades.append(trade_info)
-        self.last_trade_time = datetime.now()
+        self.trade_count += 1
+        self.last_trade_time = trade_info['timestamp']
+        self.window.add(trade_info['timestamp'] / 1000, trade_info['token_amount'])
+        self.rapid = self.window.count >= self.rapid_trades_threshold
         
         if trade_info['type'] == 'buy':
             self.total_buy_amount += trade_info['token_amount']
         else:
             self.total_sell_amount += trade_info['token_amount']
             
-    def check_rapid_trades(self, threshold, window):
-        """检查是否存在频繁交易"""
-        if len(self.trades) < threshold:
-            return False
+    def rapid_until(self):
+        """频繁交易状态的过期时间: 倒数第 threshold 笔交易移出窗口的时刻"""
+        t = self.window.nth_latest_time(self.rapid_trades_threshold)
+        return None if t is None else t + self.window.window
             
-        recent_trades = [t for t in self.trades 
-                        if (datetime.now() - datetime.strptime(t['timestamp'], "%Y-%m-%d %H:%M:%S")).seconds < window]
-        
-        return len(recent_trades) >= threshold
\ No newline at end of file
+    def check_rapid_trades(self, now=None):
+        """检查是否存在频繁交易"""
+        self.window.evict(now if now is not None else time.time())
+        return self.window.count >= self.rapid_trades_threshold
@@ -0,0 +1,126 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from database import TokenDatabase
+
+
+class ScoreCache:
+    """
+    代币评分缓存
+    内存层按 LRU 淘汰, 每个条目有独立的过期时间; 可选的 SQLite 层让评分在重启后仍然有效,
+    启动时预加载到内存层, 读取只查内存, 不会在评分的事件循环上等待磁盘
+    """
+
+    def __init__(self, max_size=10000, ttl=300, negative_ttl=60, db_path=None):
+        self.max_size = max_size
+        self.ttl = ttl                    # 正常评分的有效期(秒)
+        self.negative_ttl = negative_ttl  # 零分或失败结果的有效期(秒)
+        self.db_path = db_path
+
+        self._entries = OrderedDict()  # {key: (value, expires_at)}
+        self._lock = threading.Lock()
+        self._conn = None
+
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'preloaded': 0,
+        }
+
+        if self.db_path:
+            self._init_disk_tier()
+
+    def _init_disk_tier(self):
+        """打开持久层并把未过期的条目预加载到内存层, 之后的读取不再访问磁盘"""
+        # 表由 database.py 的迁移创建, 缓存单独使用时也先执行迁移
+        TokenDatabase(self.db_path).close_connection()
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        now = time.time()
+        # 启动时清理已过期的条目
+        self._conn.execute('DELETE FROM score_cache WHERE expires_at <= ?', (now,))
+        self._conn.commit()
+        rows = self._conn.execute(
+            'SELECT cache_key, data, expires_at FROM score_cache ORDER BY expires_at DESC LIMIT ?',
+            (self.max_size,)
+        ).fetchall()
+        # 最晚过期的条目最后加入, 排在 LRU 的最近使用端
+        for key, data, expires_at in reversed(rows):
+            self._store(key, json.loads(data), expires_at)
+        self.stats['preloaded'] = len(rows)
+
+    @staticmethod
+    def is_negative(value):
+        """零分或失败的结果使用更短的有效期"""
+        if value is None:
+            return True
+        if isinstance(value, dict):
+            return not value.get('total_score')
+        return not value
+
+    def get(self, key):
+        """读取缓存, 未命中或已过期时返回 None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return value
+                del self._entries[key]
+                self.stats['expirations'] += 1
+
+            self.stats['misses'] += 1
+            return None
+
+    def set(self, key, value, ttl=None):
+        """写入缓存, 未指定 ttl 时按结果是否为零分选择有效期"""
+        if ttl is None:
+            ttl = self.negative_ttl if self.is_negative(value) else self.ttl
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._store(key, value, expires_at)
+            if self._conn is not None:
+                try:
+                    self._conn.execute(
+                        'INSERT OR REPLACE INTO score_cache (cache_key, data, expires_at) VALUES (?, ?, ?)',
+                        (key, json.dumps(value), expires_at)
+                    )
+                    self._conn.commit()
+                except Exception as e:
+                    print(f"写入评分缓存失败: {e}")
+
+    def _store(self, key, value, expires_at):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[1] > time.time()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_stats(self):
+        """命中/未命中/淘汰计数, 用于调整缓存大小"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['size'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,144 @@
+import asyncio
+import bisect
+import itertools
+import threading
+import time
+
+
+class TokenBucket:
+    """令牌桶限流器, 速率与外部API配额保持一致"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate            # 每秒补充的令牌数
+        self.capacity = capacity    # 允许的突发请求数
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """等待直到拿到一个令牌"""
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class ScoringService:
+    """
+    代币评分服务
+    在独立线程的事件循环中运行, 按市值/初始买入优先评分, 并发数和请求速率都有上限
+    """
+
+    def __init__(self, analyzer, on_scored, max_concurrency=4, rate_per_second=1.0,
+                 burst=5, max_pending=10000):
+        self.analyzer = analyzer
+        self.on_scored = on_scored  # 回调: on_scored(token_info, analysis)
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.bucket = TokenBucket(rate_per_second, burst)
+
+        # 按优先级排序的待评分列表, 末尾是最优先的代币
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._seq = itertools.count()
+
+        self._loop = None
+        self._wakeup = None
+        self._thread = None
+        self._ready = threading.Event()
+        self.stats = {'submitted': 0, 'scored': 0, 'dropped': 0, 'errors': 0}
+
+    @staticmethod
+    def priority(token_info):
+        """优先级: 市值优先, 其次是初始买入量"""
+        return (token_info.get('market_cap') or 0, token_info.get('initial_buy') or 0)
+
+    def submit(self, token_info):
+        """由检测线程调用, 只负责入队"""
+        # 序号取负数, 同优先级时先提交的先评分
+        entry = (self.priority(token_info), -next(self._seq), token_info)
+        with self._pending_lock:
+            bisect.insort(self._pending, entry)
+            self.stats['submitted'] += 1
+            if len(self._pending) > self.max_pending:
+                # 队列已满时丢弃优先级最低的代币
+                self._pending.pop(0)
+                self.stats['dropped'] += 1
+        if self._ready.is_set():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def pending_count(self):
+        with self._pending_lock:
+            return len(self._pending)
+
+    def _pop_best(self):
+        with self._pending_lock:
+            if self._pending:
+                return self._pending.pop()[2]
+        return None
+
+    async def _next_token(self):
+        while True:
+            token_info = self._pop_best()
+            if token_info is not None:
+                return token_info
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+    async def _worker(self):
+        while True:
+            token_info = await self._next_token()
+            await self.bucket.acquire()
+            try:
+                analysis = await self.analyzer.analyze_token_mentions(
+                    token_info['token_address'],
+                    token_info['token_name']
+                )
+                self.stats['scored'] += 1
+                self.on_scored(token_info, analysis)
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"代币评分失败 {token_info['token_address']}: {e}")
+
+    async def _main(self):
+        self._wakeup = asyncio.Event()
+        workers = [asyncio.ensure_future(self._worker()) for _ in range(self.max_concurrency)]
+        self._ready.set()
+        try:
+            await asyncio.gather(*workers)
+        except asyncio.CancelledError:
+            pass
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._main_task = self._loop.create_task(self._main())
+        try:
+            self._loop.run_until_complete(self._main_task)
+        finally:
+            self._loop.close()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name="token-scoring")
+        self._thread.daemon = True
+        self._thread.start()
+        self._ready.wait()
+        # 启动前已提交的代币
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def stop(self, timeout=5):
+        if self._thread is None:
+            return
+        self._ready.clear()
+        self._loop.call_soon_threadsafe(self._main_task.cancel)
+        self._thread.join(timeout)
+        self._thread = None
+        self._loop = None
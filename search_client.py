@@ -0,0 +1,84 @@
+import http.client
+import json
+import queue
+import threading
+from urllib.parse import urlencode
+
+CUSTOM_SEARCH_HOST = 'www.googleapis.com'
+CUSTOM_SEARCH_PATH = '/customsearch/v1'
+
+
+class SearchAPIError(Exception):
+    """搜索API返回了非 200 状态码"""
+
+    def __init__(self, status, body):
+        super().__init__(f"HTTP {status}: {body[:200]}")
+        self.status = status
+        self.body = body
+
+
+class CustomSearchClient:
+    """
+    Google Custom Search JSON API 的最小客户端
+    直接请求 REST 接口, 不需要下载 discovery 文档; 复用 keep-alive 连接, 线程安全
+    """
+
+    def __init__(self, api_key, host=CUSTOM_SEARCH_HOST, timeout=10, pool_size=4):
+        self.api_key = api_key
+        self.host = host
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(pool_size)  # 空闲连接, 后进先出, 优先复用最近用过的连接
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'connections_opened': 0, 'retries': 0}
+
+    def _acquire(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                self.stats['connections_opened'] += 1
+            return http.client.HTTPSConnection(self.host, timeout=self.timeout)
+
+    def _release(self, conn):
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def _request(self, path):
+        conn = self._acquire()
+        try:
+            conn.request('GET', path, headers={'Accept': 'application/json', 'Connection': 'keep-alive'})
+            response = conn.getresponse()
+            body = response.read()
+        except Exception:
+            conn.close()
+            raise
+        if response.will_close:
+            conn.close()
+        else:
+            self._release(conn)
+        return response.status, body
+
+    def search(self, q, cx, **params):
+        """执行一次搜索, 返回解析后的 JSON 字典"""
+        path = CUSTOM_SEARCH_PATH + '?' + urlencode(dict(params, key=self.api_key, cx=cx, q=q))
+        with self._lock:
+            self.stats['requests'] += 1
+        try:
+            status, body = self._request(path)
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            # 空闲的 keep-alive 连接可能已被服务端关闭, 换一条新连接重试一次
+            with self._lock:
+                self.stats['retries'] += 1
+            status, body = self._request(path)
+        if status != 200:
+            raise SearchAPIError(status, body.decode('utf-8', 'replace'))
+        return json.loads(body)
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
@@ -0,0 +1,282 @@
+import multiprocessing
+import pickle
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime
+from multiprocessing.connection import wait
+from sliding_window import SlidingWindow
+from metrics import get_registry
+
+# 父进程发往检测进程的消息, 第一个字节是消息类型
+MSG_TRADES = b'T'   # 一批交易记录
+MSG_ADD = b'A'      # 开始监控: pickle((token_address, token_info))
+MSG_REMOVE = b'R'   # 停止监控: token_address
+MSG_STOP = b'S'
+
+# 交易记录: 类型(0买/1卖), 毫秒时间戳, 代币数量, 市值, 代币地址长度, 交易者地址长度, 后面跟两个地址
+_TRADE_HEADER = struct.Struct('<BqddHH')
+_TRADE_TYPES = ('buy', 'sell')
+
+
+def shard_for(token_address, shards):
+    """按代币地址分片, 同一代币的交易总是发往同一个进程"""
+    return zlib.crc32(token_address.encode('utf-8')) % shards
+
+
+def pack_trade(trade_info):
+    mint = trade_info['token_address'].encode('utf-8')
+    trader = trade_info['trader_address'].encode('utf-8')
+    return _TRADE_HEADER.pack(
+        1 if trade_info['type'] == 'sell' else 0,
+        trade_info['timestamp'],
+        trade_info['token_amount'],
+        trade_info['market_cap'],
+        len(mint),
+        len(trader),
+    ) + mint + trader
+
+
+def unpack_trades(data, offset=1):
+    """逐条解出一批交易记录, 返回 TokenMonitor 使用的 trade_info 字典"""
+    size = _TRADE_HEADER.size
+    end = len(data)
+    while offset < end:
+        side, timestamp, token_amount, market_cap, mint_len, trader_len = _TRADE_HEADER.unpack_from(data, offset)
+        offset += size
+        mint = data[offset:offset + mint_len].decode('utf-8')
+        offset += mint_len
+        trader = data[offset:offset + trader_len].decode('utf-8')
+        offset += trader_len
+        yield {
+            'token_address': mint,
+            'trader_address': trader,
+            'timestamp': timestamp,
+            'token_amount': token_amount,
+            'market_cap': market_cap,
+            'type': _TRADE_TYPES[side],
+        }
+
+
+def _alert_details(token_address, monitor, detections):
+    """检测进程发回的警报内容, 只包含可序列化的摘要"""
+    return {
+        'token_address': token_address,
+        'token_name': monitor.token_info.get('token_name'),
+        'market_cap': monitor.market_cap,
+        'detections': detections,
+    }
+
+
+def _worker_main(shard, conn, alert_conn, monitor_options):
+    """
+    检测进程: 只维护属于本分片的 TokenMonitor, 每批交易的警报合并成一条消息发回
+    同一批中同一代币多次触发时只发回最后一次, 去重和冷却由父进程的 AlertManager 负责
+    """
+    from scan_pumpfun import TokenMonitor
+    monitors = {}
+    while True:
+        try:
+            data = conn.recv_bytes()
+        except (EOFError, OSError):
+            break
+        kind = data[:1]
+        if kind == MSG_TRADES:
+            alerts = {}
+            for trade_info in unpack_trades(data):
+                token_address = trade_info['token_address']
+                monitor = monitors.get(token_address)
+                if monitor is None:
+                    continue
+                monitor.update_trade(trade_info)
+                detections = monitor.check_suspicious_activity()
+                if detections:
+                    alerts[token_address] = _alert_details(token_address, monitor, detections)
+            if alerts:
+                alert_conn.send(list(alerts.values()))
+        elif kind == MSG_ADD:
+            token_address, token_info = pickle.loads(data[1:])
+            monitors[token_address] = TokenMonitor(token_info, **monitor_options)
+        elif kind == MSG_REMOVE:
+            monitors.pop(data[1:].decode('utf-8'), None)
+        elif kind == MSG_STOP:
+            break
+    alert_conn.close()
+
+
+class ShardedMonitor:
+    """
+    父进程中代替 TokenMonitor 放入 MonitorRegistry 的轻量对象
+    检测状态在检测进程中, 这里只保留注册表淘汰所需的 last_update 和 volume_window
+    """
+
+    def __init__(self, token_info, window=300):
+        self.token_info = token_info
+        self.market_cap = token_info.get('market_cap')
+        self.last_update = datetime.now()
+        self.volume_window = SlidingWindow(window)
+
+    def update_trade(self, trade_info):
+        self.market_cap = trade_info['market_cap']
+        self.volume_window.add(trade_info['timestamp'] / 1000, trade_info['token_amount'])
+        self.last_update = datetime.now()
+
+
+class ShardedDetector:
+    """
+    多进程分片检测
+    交易按代币地址哈希到 N 个检测进程, 以紧凑的二进制记录成批通过管道发送;
+    各进程的警报由一个收集线程统一交给 on_alert(alert) 回调
+    """
+
+    def __init__(self, on_alert, workers=4, batch_size=256, flush_interval_ms=10, monitor_options=None):
+        self.on_alert = on_alert
+        self.workers = workers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.monitor_options = monitor_options or {}
+
+        self._processes = []
+        self._conns = []
+        self._alert_conns = []
+        self._buffers = []   # 每个分片待发送的交易记录
+        self._counts = []
+        self._send_locks = []
+        self._stop = threading.Event()
+        self._flush_thread = None
+        self._collector_thread = None
+        self.stats = {'trades_sent': 0, 'batches_sent': 0, 'alerts': 0}
+
+        registry = get_registry()
+        self._m_batches = registry.counter('detect_shard_batches_total', '发往检测进程的交易批次数')
+        self._m_alerts = registry.counter('detect_shard_alerts_total', '检测进程发回的警报数')
+
+    def start(self):
+        if self._processes:
+            return
+        # 使用 spawn, 避免在已有多个线程的进程中 fork
+        ctx = multiprocessing.get_context('spawn')
+        for shard in range(self.workers):
+            trade_recv, trade_send = ctx.Pipe(duplex=False)
+            alert_recv, alert_send = ctx.Pipe(duplex=False)
+            process = ctx.Process(
+                target=_worker_main, name=f"detect-shard-{shard}",
+                args=(shard, trade_recv, alert_send, self.monitor_options)
+            )
+            process.daemon = True
+            process.start()
+            # 子进程持有的一端在父进程中关闭, 子进程退出时父进程才能读到 EOF
+            trade_recv.close()
+            alert_send.close()
+            self._processes.append(process)
+            self._conns.append(trade_send)
+            self._alert_conns.append(alert_recv)
+            self._buffers.append(bytearray(MSG_TRADES))
+            self._counts.append(0)
+            self._send_locks.append(threading.Lock())
+
+        self._stop.clear()
+        self._flush_thread = threading.Thread(target=self._flush_loop, name="detect-shard-flusher")
+        self._flush_thread.daemon = True
+        self._flush_thread.start()
+        self._collector_thread = threading.Thread(target=self._collect_loop, name="detect-shard-alerts")
+        self._collector_thread.daemon = True
+        self._collector_thread.start()
+        print(f"分片检测已启动: {self.workers} 个进程")
+
+    def _send(self, shard, data):
+        with self._send_locks[shard]:
+            self._conns[shard].send_bytes(data)
+
+    def _flush_shard(self, shard):
+        with self._send_locks[shard]:
+            if self._counts[shard] == 0:
+                return
+            data, self._buffers[shard] = self._buffers[shard], bytearray(MSG_TRADES)
+            count, self._counts[shard] = self._counts[shard], 0
+            self._conns[shard].send_bytes(data)
+        self.stats['trades_sent'] += count
+        self.stats['batches_sent'] += 1
+        self._m_batches.inc()
+
+    def flush(self):
+        for shard in range(len(self._conns)):
+            self._flush_shard(shard)
+
+    def _flush_loop(self):
+        """定时发送未满一批的交易, 低流量时延迟不超过 flush_interval"""
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def add(self, token_address, token_info):
+        # 扫描开始前加入的监控也需要检测进程
+        self.start()
+        shard = shard_for(token_address, self.workers)
+        # 先发出之前缓冲的交易, 保证控制消息与交易的先后顺序
+        self._flush_shard(shard)
+        self._send(shard, MSG_ADD + pickle.dumps((token_address, token_info), pickle.HIGHEST_PROTOCOL))
+
+    def remove(self, token_address):
+        if not self._processes:
+            return
+        shard = shard_for(token_address, self.workers)
+        self._flush_shard(shard)
+        self._send(shard, MSG_REMOVE + token_address.encode('utf-8'))
+
+    def submit_trade(self, trade_info):
+        shard = shard_for(trade_info['token_address'], self.workers)
+        record = pack_trade(trade_info)
+        with self._send_locks[shard]:
+            self._buffers[shard] += record
+            self._counts[shard] += 1
+            full = self._counts[shard] >= self.batch_size
+        if full:
+            self._flush_shard(shard)
+
+    def _collect_loop(self):
+        """收集线程: 等待任一检测进程发回警报"""
+        conns = list(self._alert_conns)
+        while conns:
+            for conn in wait(conns):
+                try:
+                    alerts = conn.recv()
+                except (EOFError, OSError):
+                    conns.remove(conn)
+                    continue
+                self.stats['alerts'] += len(alerts)
+                self._m_alerts.inc(len(alerts))
+                for alert in alerts:
+                    try:
+                        self.on_alert(alert)
+                    except Exception as e:
+                        print(f"处理分片检测警报时出错: {e}")
+
+    def stop(self, timeout=5):
+        """发送剩余交易后通知检测进程退出, 等待警报收集完毕"""
+        if not self._processes:
+            return
+        self._stop.set()
+        if self._flush_thread is not None:
+            self._flush_thread.join()
+        self.flush()
+        for shard in range(len(self._conns)):
+            try:
+                self._send(shard, MSG_STOP)
+            except OSError:
+                pass
+        deadline = time.time() + timeout
+        for process in self._processes:
+            process.join(max(0, deadline - time.time()))
+            if process.is_alive():
+                process.terminate()
+        if self._collector_thread is not None:
+            self._collector_thread.join(max(0, deadline - time.time()))
+        for conn in self._conns + self._alert_conns:
+            conn.close()
+        self._processes = []
+        self._conns = []
+        self._alert_conns = []
+        self._buffers = []
+        self._counts = []
+        self._send_locks = []
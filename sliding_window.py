@@ -0,0 +1,46 @@
+from collections import deque
+
+
+class SlidingWindow:
+    """
+    时间滑动窗口
+    事件到达时淘汰过期条目, 增量维护窗口内的事件数和数值总和, 每次更新均摊 O(1)
+    """
+
+    def __init__(self, window, max_events=None):
+        self.window = window          # 窗口长度(秒)
+        self.max_events = max_events  # 窗口内最多保留的事件数, None 表示只按时间淘汰
+        self._events = deque()        # [(事件时间, 数值)]
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, t, value=0.0):
+        """加入一个事件, t 为秒级时间戳"""
+        self._events.append((t, value))
+        self.count += 1
+        self.total += value
+        self.evict(t)
+        if self.max_events is not None and self.count > self.max_events:
+            _, old = self._events.popleft()
+            self.count -= 1
+            self.total -= old
+
+    def evict(self, now):
+        """淘汰窗口之外的事件"""
+        events = self._events
+        while events and now - events[0][0] >= self.window:
+            _, value = events.popleft()
+            self.count -= 1
+            self.total -= value
+        if not events:
+            # 清空时归零, 避免浮点累计误差
+            self.total = 0.0
+
+    def nth_latest_time(self, n):
+        """倒数第 n 个事件的时间, 事件不足 n 个时返回 None"""
+        if n <= 0 or n > len(self._events):
+            return None
+        return self._events[-n][0]
+
+    def __len__(self):
+        return self.count
@@ -0,0 +1,109 @@
+import json
+import threading
+
+
+class SubscriptionManager:
+    """
+    代币交易订阅管理
+    跟随监控集合动态订阅/退订, 短时间内的多次变化合并成一条消息, 重连后自动恢复全部订阅
+    """
+
+    def __init__(self, send, coalesce_interval=0.2, max_keys_per_message=100):
+        self._send = send  # send(text), 连接不可用时应抛出异常
+        self.coalesce_interval = coalesce_interval  # 秒
+        self.max_keys_per_message = max_keys_per_message
+
+        self._subscribed = set()  # 期望订阅的代币集合
+        self._pending_subscribe = set()
+        self._pending_unsubscribe = set()
+        self._connected = False
+        self._lock = threading.Lock()
+        self._timer = None
+        self.stats = {'messages_sent': 0, 'send_errors': 0, 'replays': 0}
+
+    def subscribe(self, mint):
+        with self._lock:
+            if mint in self._subscribed:
+                return
+            self._subscribed.add(mint)
+            if mint in self._pending_unsubscribe:
+                # 刚退订又重新订阅, 两者抵消
+                self._pending_unsubscribe.discard(mint)
+            else:
+                self._pending_subscribe.add(mint)
+            self._schedule_flush()
+
+    def unsubscribe(self, mint):
+        with self._lock:
+            if mint not in self._subscribed:
+                return
+            self._subscribed.discard(mint)
+            if mint in self._pending_subscribe:
+                self._pending_subscribe.discard(mint)
+            else:
+                self._pending_unsubscribe.add(mint)
+            self._schedule_flush()
+
+    def subscribed(self):
+        with self._lock:
+            return set(self._subscribed)
+
+    def _schedule_flush(self):
+        # 调用方持有锁
+        if self._timer is None and self._connected:
+            self._timer = threading.Timer(self.coalesce_interval, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _chunks(self, keys):
+        keys = sorted(keys)
+        for i in range(0, len(keys), self.max_keys_per_message):
+            yield keys[i:i + self.max_keys_per_message]
+
+    def _send_method(self, method, keys=None):
+        message = {"method": method}
+        if keys is not None:
+            message["keys"] = keys
+        try:
+            self._send(json.dumps(message))
+            self.stats['messages_sent'] += 1
+            return True
+        except Exception as e:
+            self.stats['send_errors'] += 1
+            print(f"发送订阅消息失败 {method}: {e}")
+            return False
+
+    def flush(self):
+        """发送合并后的订阅/退订消息"""
+        with self._lock:
+            self._timer = None
+            if not self._connected:
+                return
+            to_subscribe, self._pending_subscribe = self._pending_subscribe, set()
+            to_unsubscribe, self._pending_unsubscribe = self._pending_unsubscribe, set()
+
+        for keys in self._chunks(to_unsubscribe):
+            self._send_method("unsubscribeTokenTrade", keys)
+        for keys in self._chunks(to_subscribe):
+            self._send_method("subscribeTokenTrade", keys)
+
+    def on_connected(self):
+        """连接建立后恢复全部订阅"""
+        with self._lock:
+            self._connected = True
+            # 完整重放会覆盖所有未发送的变化
+            self._pending_subscribe = set()
+            self._pending_unsubscribe = set()
+            keys = set(self._subscribed)
+            self.stats['replays'] += 1
+
+        self._send_method("subscribeNewToken")
+        for chunk in self._chunks(keys):
+            self._send_method("subscribeTokenTrade", chunk)
+
+    def on_disconnected(self):
+        with self._lock:
+            self._connected = False
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
@@ -0,0 +1,82 @@
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PyQt6.QtGui import QColor
+
+# 买卖方向的显示颜色
+SIDE_COLORS = {
+    'buy': QColor('#00ff00'),
+    'sell': QColor('#ff0000'),
+}
+
+
+class RingBufferTableModel(QAbstractTableModel):
+    """
+    固定容量的表格模型
+    行数据保存在环形缓冲区中, 超出容量时丢弃最旧的行, 内存和重绘开销不随运行时间增长
+    """
+
+    def __init__(self, headers, capacity=5000, side_column=None, parent=None):
+        super().__init__(parent)
+        self.headers = list(headers)
+        self.capacity = capacity
+        self.side_column = side_column  # 交易类型所在列, 用于买卖着色
+
+        self._buffer = [None] * capacity
+        self._head = 0   # 最旧一行在缓冲区中的位置
+        self._size = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._size
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def row(self, index):
+        """按显示顺序取第 index 行(0 为最旧)"""
+        return self._buffer[(self._head + index) % self.capacity]
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= self._size:
+            return None
+        value = self.row(index.row())[index.column()]
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            return '' if value is None else str(value)
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            return Qt.AlignmentFlag.AlignCenter
+        if role == Qt.ItemDataRole.ForegroundRole and index.column() == self.side_column:
+            return SIDE_COLORS.get(str(value).lower())
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.headers[section]
+        return None
+
+    def append_rows(self, rows):
+        """批量追加行, 每次调用最多触发一次删除和一次插入通知"""
+        rows = list(rows)[-self.capacity:]
+        if not rows:
+            return
+
+        overflow = self._size + len(rows) - self.capacity
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            for i in range(overflow):
+                self._buffer[(self._head + i) % self.capacity] = None
+            self._head = (self._head + overflow) % self.capacity
+            self._size -= overflow
+            self.endRemoveRows()
+
+        first = self._size
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        for i, row in enumerate(rows):
+            self._buffer[(self._head + first + i) % self.capacity] = tuple(row)
+        self._size += len(rows)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self._buffer = [None] * self.capacity
+        self._head = 0
+        self._size = 0
+        self.endResetModel()
@@ -0,0 +1,22 @@
+import os
+import sys
+
+# 项目模块都在仓库根目录, 测试直接导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from database import TokenDatabase
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'pump_fun.db')
+
+
+@pytest.fixture
+def db(db_path):
+    """已执行全部迁移的逐行写入数据库, 测试结束时关闭"""
+    db = TokenDatabase(db_path)
+    yield db
+    db.close()
@@ -0,0 +1,123 @@
+import json
+import os
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from archive import TradeArchive, TieredTradeStore
+from database import now_ms
+
+DAY_MS = 86400 * 1000
+TOKENS = ['Aa1token', 'Bb2token', 'Cc3token']
+
+
+def _fill(db, count=300):
+    """两天前开始、跨越约一天半的交易"""
+    start = now_ms() - 3 * DAY_MS
+    for i in range(count):
+        db.add_trade({
+            'token_address': TOKENS[i % len(TOKENS)],
+            'trader_address': f'W{i % 7}',
+            'timestamp': start + i * (DAY_MS // 200),
+            'type': 'sell' if i % 3 == 0 else 'buy',
+            'token_amount': 1000.0 + i,
+            'sol_amount': 0.1 * i,
+            'market_cap': 30.0,
+            'bonding_curve': 'bc',
+            'v_tokens': 1e9 - i,
+            'v_sol': 30.0 + i,
+            'signature': f'sig{i}',
+        })
+
+
+def _segment_dirs(root):
+    found = []
+    for dirpath, dirnames, _ in os.walk(root):
+        found.extend(os.path.join(dirpath, d) for d in dirnames if d.startswith('seg-'))
+    return sorted(found)
+
+
+def test_crash_before_delete_is_rolled_back(tmp_path, db, monkeypatch):
+    _fill(db)
+    before = {token: db.get_token_trades_between(token) for token in TOKENS}
+    root = str(tmp_path / 'archive')
+
+    # 第一个分块的分段写完后、删除 SQLite 中的行之前进程中断
+    original = TradeArchive._write_chunk
+
+    def crash(self, rows, min_id, max_id):
+        original(self, rows, min_id, max_id)
+        raise RuntimeError('simulated crash')
+
+    monkeypatch.setattr(TradeArchive, '_write_chunk', crash)
+    archive = TradeArchive(root, db.db_path)
+    with pytest.raises(RuntimeError):
+        archive.archive(DAY_MS, batch_rows=100)
+    archive.close()
+    assert os.path.exists(os.path.join(root, '_pending.json'))
+    assert _segment_dirs(root)
+    monkeypatch.setattr(TradeArchive, '_write_chunk', original)
+
+    # 重启后: 未完成的分段被清理, 行仍在 SQLite 中, 合并查询不受影响
+    archive = TradeArchive(root, db.db_path)
+    archive.recover()
+    assert not os.path.exists(os.path.join(root, '_pending.json'))
+    assert not _segment_dirs(root)
+    store = TieredTradeStore(db, archive)
+    assert {token: store.get_token_trades(token) for token in TOKENS} == before
+
+    # 重新归档后每行只出现一次
+    archived = archive.archive(DAY_MS, batch_rows=100)
+    assert archived > 0
+    for token in TOKENS:
+        assert store.get_token_trades(token) == before[token]
+    assert sum(len(seg['id']) for seg in archive.scan()) == archived
+    archive.close()
+
+
+def test_crash_after_delete_keeps_segments(tmp_path, db):
+    _fill(db)
+    before = {token: db.get_token_trades_between(token) for token in TOKENS}
+    root = str(tmp_path / 'archive')
+    archive = TradeArchive(root, db.db_path)
+    archived = archive.archive(DAY_MS, batch_rows=1000)
+    segments = _segment_dirs(root)
+    assert archived > 0 and segments
+
+    # 删除已提交但状态文件还没来得及移除时中断
+    with open(os.path.join(root, '_pending.json'), 'w', encoding='utf-8') as f:
+        json.dump({'min_id': 1, 'max_id': archived, 'cutoff': now_ms() - DAY_MS}, f)
+
+    archive.recover()
+    assert not os.path.exists(os.path.join(root, '_pending.json'))
+    assert _segment_dirs(root) == segments
+    store = TieredTradeStore(db, archive)
+    for token in TOKENS:
+        assert store.get_token_trades(token) == before[token]
+    archive.close()
+
+
+def test_crash_during_segment_write_leaves_no_tmp_dirs(tmp_path, db, monkeypatch):
+    _fill(db)
+    root = str(tmp_path / 'archive')
+
+    # 分段文件写了一半, 临时目录还没改名时中断
+    def crash(self, path, rows):
+        os.makedirs(os.path.join(os.path.dirname(path), '.tmp-' + os.path.basename(path)))
+        raise RuntimeError('simulated crash')
+
+    monkeypatch.setattr(TradeArchive, '_write_segment', crash)
+    archive = TradeArchive(root, db.db_path)
+    with pytest.raises(RuntimeError):
+        archive.archive(DAY_MS, batch_rows=100)
+    monkeypatch.undo()
+
+    def tmp_dirs():
+        return [d for _, dirnames, _ in os.walk(root) for d in dirnames if d.startswith('.tmp-seg-')]
+
+    assert tmp_dirs()
+    # 重新归档时分块范围不同, 旧的临时目录由 recover 清理
+    assert archive.archive(DAY_MS, batch_rows=150) > 0
+    assert not tmp_dirs()
+    archive.close()
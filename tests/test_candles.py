@@ -0,0 +1,60 @@
+
+from candles import CandleEngine
+
+MINUTE = 60 * 1000
+START = 1700000040000 - 1700000040000 % MINUTE
+
+
+def _trade(offset_ms, price, sol_amount=1.0, token_amount=10.0):
+    return {
+        'timestamp': START + offset_ms,
+        'token_address': 'T1',
+        'v_sol': price * 1e9,
+        'v_tokens': 1e9,
+        'sol_amount': sol_amount,
+        'token_amount': token_amount,
+    }
+
+
+def test_closed_candles_are_flushed(db):
+    engine = CandleEngine(db, intervals=(60,))
+    for offset, price in ((0, 2.0), (10000, 3.0), (20000, 1.0), (30000, 1.5)):
+        engine.update(_trade(offset, price))
+    # 下一分钟的交易让上一根K线收盘
+    engine.update(_trade(MINUTE + 5000, 4.0))
+    assert engine.flush() == 1
+    assert db.get_candles('T1', 60) == [(START, 2.0, 3.0, 1.0, 1.5, 4.0, 40.0, 4)]
+    # 查询包括未收盘的K线
+    assert engine.get_candles('T1', 60)[-1] == (START + MINUTE, 4.0, 4.0, 4.0, 4.0, 1.0, 10.0, 1)
+
+
+def test_restart_merges_into_the_same_candle(db):
+    engine = CandleEngine(db, intervals=(60,))
+    engine.update(_trade(0, 2.0))
+    engine.update(_trade(10000, 5.0))
+    # 停止时写入未收盘的K线
+    engine.stop()
+    assert db.get_candles('T1', 60) == [(START, 2.0, 5.0, 2.0, 5.0, 2.0, 20.0, 2)]
+
+    # 重启后同一分钟的交易: 开盘价保留, 最高/最低取极值, 成交量累加
+    engine = CandleEngine(db, intervals=(60,))
+    engine.update(_trade(20000, 1.0, sol_amount=3.0))
+    engine.update(_trade(30000, 3.0))
+    assert engine.get_candles('T1', 60) == [(START, 2.0, 5.0, 1.0, 3.0, 6.0, 40.0, 4)]
+    engine.stop()
+    assert db.get_candles('T1', 60) == [(START, 2.0, 5.0, 1.0, 3.0, 6.0, 40.0, 4)]
+
+
+def test_failed_flush_is_retried(db, monkeypatch):
+    engine = CandleEngine(db, intervals=(60,))
+    engine.update(_trade(0, 2.0))
+    engine.update(_trade(MINUTE, 3.0))
+
+    def broken(rows):
+        raise RuntimeError('disk full')
+
+    monkeypatch.setattr(db, 'upsert_candles', broken)
+    assert engine.flush() == 0
+    monkeypatch.undo()
+    assert engine.flush() == 1
+    assert db.get_candles('T1', 60) == [(START, 2.0, 2.0, 2.0, 2.0, 1.0, 10.0, 1)]
@@ -0,0 +1,25 @@
+import os
+import threading
+
+from database import TokenDatabase
+
+
+def test_close_closes_connections_left_by_other_threads(db_path):
+    db = TokenDatabase(db_path, batch_size=10)
+
+    # 写入方和查询方线程各自打开连接后直接退出
+    threads = [
+        threading.Thread(target=db.add_new_token, args=({
+            'token_address': 'T1', 'token_name': 'Token', 'token_symbol': 'TK', 'timestamp': 1000,
+            'market_cap': 30.0, 'initial_buy': 1.0, 'v_tokens': 1e9, 'v_sol': 30.0,
+        },)),
+        threading.Thread(target=db.get_candles, args=('T1', 60)),
+    ]
+    for t in threads:
+        t.start()
+        t.join()
+    assert os.path.exists(db_path + '-wal')
+
+    db.close()
+    # 最后一个连接关闭时 SQLite 合并并删除 WAL 文件
+    assert not os.path.exists(db_path + '-wal')
@@ -0,0 +1,105 @@
+import sqlite3
+import time
+
+import database
+from database import TokenDatabase, MIGRATIONS
+
+
+def _local_ms(text):
+    return int(time.mktime(time.strptime(text, '%Y-%m-%d %H:%M:%S'))) * 1000
+
+
+def _create_legacy_db(path):
+    """迁移框架出现之前的数据库: 只有初始表, 时间列是本地时间字符串"""
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    database._migration_initial_schema(cursor)
+    cursor.execute(database.INSERT_TOKEN_SQL, ('T1', 'Token', 'TK', '2024-01-02 03:04:05', 30.0, 1.0, 1e9, 30.0))
+    trades = [
+        ('T1', 'W1', '2024-01-02 03:04:06', 'buy', 100.0, 1.0, 30.0, 'bc', 1e9, 30.0, 'sig1'),
+        ('T1', 'W1', '2024-01-02 03:04:07', 'sell', 40.0, 0.4, 30.0, 'bc', 1e9, 30.0, 'sig2'),
+        ('T1', 'W2', '2024-01-02 03:04:08', 'buy', 10.0, 0.1, 30.0, 'bc', 1e9, 30.0, 'sig3'),
+    ]
+    cursor.executemany(database.INSERT_TRADE_SQL, trades)
+    cursor.execute('''
+        INSERT INTO suspicious_activities (token_address, timestamp, activity_type, description, severity)
+        VALUES ('T1', '2024-01-02 03:04:09', 'large_trade', 'd', 2)
+    ''')
+    conn.commit()
+    conn.close()
+
+
+def test_migrations_upgrade_legacy_database(db_path):
+    _create_legacy_db(db_path)
+
+    db = TokenDatabase(db_path)
+    try:
+        assert db.get_schema_version() == MIGRATIONS[-1][0]
+        conn, cursor = db.get_connection()
+
+        # 本地时间字符串转换为整数毫秒时间戳
+        cursor.execute('SELECT creation_time FROM tokens')
+        assert cursor.fetchone()[0] == _local_ms('2024-01-02 03:04:05')
+        cursor.execute('SELECT timestamp, typeof(timestamp) FROM trades ORDER BY id')
+        rows = cursor.fetchall()
+        assert [r[0] for r in rows] == [_local_ms(f'2024-01-02 03:04:0{s}') for s in (6, 7, 8)]
+        assert {r[1] for r in rows} == {'integer'}
+        cursor.execute('SELECT timestamp FROM suspicious_activities')
+        assert cursor.fetchone()[0] == _local_ms('2024-01-02 03:04:09')
+
+        # 交易者统计由已有交易回填
+        cursor.execute('SELECT * FROM trader_stats ORDER BY trader_address')
+        assert cursor.fetchall() == [
+            ('W1', 'T1', 100.0, 40.0, 2, _local_ms('2024-01-02 03:04:07')),
+            ('W2', 'T1', 10.0, 0.0, 1, _local_ms('2024-01-02 03:04:08')),
+        ]
+
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'index')")
+        names = {r[0] for r in cursor.fetchall()}
+        assert {'candles', 'idx_trades_token_id', 'idx_trades_timestamp',
+                'idx_trader_stats_token_volume', 'idx_trader_stats_last_trade', 'score_cache'} <= names
+    finally:
+        db.close()
+
+
+def test_migrations_run_once(db_path):
+    _create_legacy_db(db_path)
+    TokenDatabase(db_path).close()
+
+    db = TokenDatabase(db_path)
+    try:
+        conn, cursor = db.get_connection()
+        cursor.execute('SELECT COUNT(*) FROM schema_version')
+        assert cursor.fetchone()[0] == len(MIGRATIONS)
+        # 回填和时间戳转换不会重复执行
+        cursor.execute('SELECT SUM(trade_count) FROM trader_stats')
+        assert cursor.fetchone()[0] == 3
+        cursor.execute('SELECT MIN(timestamp) FROM trades')
+        assert cursor.fetchone()[0] == _local_ms('2024-01-02 03:04:06')
+    finally:
+        db.close()
+
+
+def test_failed_migration_rolls_back(db_path, monkeypatch):
+
+    def broken(cursor):
+        cursor.execute('CREATE TABLE half_done (x INTEGER)')
+        raise RuntimeError('boom')
+
+    monkeypatch.setattr(database, 'MIGRATIONS', MIGRATIONS + [(MIGRATIONS[-1][0] + 1, 'broken', broken)])
+    try:
+        TokenDatabase(db_path)
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError('迁移失败应当抛出异常')
+
+    monkeypatch.setattr(database, 'MIGRATIONS', MIGRATIONS)
+    db = TokenDatabase(db_path)
+    try:
+        assert db.get_schema_version() == MIGRATIONS[-1][0]
+        conn, cursor = db.get_connection()
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'half_done'")
+        assert cursor.fetchone()[0] == 0
+    finally:
+        db.close()
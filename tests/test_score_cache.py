@@ -0,0 +1,21 @@
+import time
+
+from score_cache import ScoreCache
+
+
+def test_disk_tier_is_preloaded_after_restart(db_path):
+    cache = ScoreCache(ttl=300, db_path=db_path)
+    cache.set('T1', {'total_score': 5, 'timestamp': time.time()})
+    cache.set('T2', {'total_score': 0, 'timestamp': time.time()}, ttl=-1)  # 已过期
+    cache.close()
+
+    cache = ScoreCache(ttl=300, db_path=db_path)
+    try:
+        assert cache.stats['preloaded'] == 1
+        # 读取只查内存层
+        cache._conn.close()
+        assert cache.get('T1')['total_score'] == 5
+        assert cache.get('T2') is None
+        assert cache.get_stats()['hits'] == 1
+    finally:
+        cache._conn = None
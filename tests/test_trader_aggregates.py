@@ -0,0 +1,106 @@
+import pytest
+
+from database import TokenDatabase
+from trader_aggregates import TraderAggregator
+
+
+def _trade(trader, token, side, amount, timestamp, signature=None):
+    return {
+        'trader_address': trader,
+        'token_address': token,
+        'type': side,
+        'token_amount': amount,
+        'sol_amount': amount / 100,
+        'timestamp': timestamp,
+        'market_cap': 30.0,
+        'bonding_curve': 'bc',
+        'v_tokens': 1e9,
+        'v_sol': 30.0,
+        'signature': signature or f'{trader}-{token}-{timestamp}',
+    }
+
+
+def test_flushes_add_to_stored_totals(db):
+    aggregator = TraderAggregator(db)
+    aggregator.update(_trade('W1', 'T1', 'buy', 100.0, 1000))
+    aggregator.update(_trade('W1', 'T1', 'sell', 30.0, 2000))
+    aggregator.update(_trade('W2', 'T1', 'buy', 500.0, 1500))
+    assert aggregator.flush() == 2
+    # 没有变化时不写入
+    assert aggregator.flush() == 0
+
+    # 重启后的增量累加到已有的行
+    aggregator = TraderAggregator(db)
+    aggregator.update(_trade('W1', 'T1', 'buy', 50.0, 3000))
+    assert aggregator.wallet('W1') == [('W1', 'T1', 150.0, 30.0, 3, 3000)]
+    assert [row[0] for row in aggregator.leaderboard('T1')] == ['W2', 'W1']
+    assert aggregator.active_traders(2500) == [('W1', 1, 150.0, 30.0, 3, 3000)]
+
+
+def test_failed_flush_is_retried(db, monkeypatch):
+    aggregator = TraderAggregator(db)
+    aggregator.update(_trade('W1', 'T1', 'buy', 100.0, 1000))
+
+    def broken(rows):
+        raise RuntimeError('database is locked')
+
+    monkeypatch.setattr(db, 'upsert_trader_stats', broken)
+    assert aggregator.flush() == 0
+    assert aggregator.stats['errors'] == 1
+
+    # 失败期间的新增量与未写入的合并, 恢复后一次写入
+    aggregator.update(_trade('W1', 'T1', 'sell', 40.0, 900))
+    aggregator.update(_trade('W1', 'T1', 'buy', 10.0, 2000))
+    monkeypatch.undo()
+    assert aggregator.flush() == 1
+    assert db.get_trader_stats('W1') == [('W1', 'T1', 110.0, 40.0, 3, 2000)]
+
+
+@pytest.mark.parametrize('batch_size', [0, 100])
+def test_redelivered_trades_are_reported(db_path, batch_size):
+    db = TokenDatabase(db_path, batch_size=batch_size)
+    try:
+        trade = _trade('W1', 'T1', 'buy', 100.0, 1000, signature='sig1')
+        assert db.add_trade(trade) is True
+        assert db.add_trade(dict(trade)) is False
+        db.flush()
+        conn, cursor = db.get_connection()
+        cursor.execute('SELECT COUNT(*) FROM trades')
+        assert cursor.fetchone()[0] == 1
+    finally:
+        db.close()
+
+
+def test_redelivery_after_restart_or_eviction_is_reported(db_path):
+    db = TokenDatabase(db_path, batch_size=100)
+    db.add_trade(_trade('W1', 'T1', 'buy', 100.0, 1000, signature='sig1'))
+    db.add_trade(_trade('W1', 'T1', 'buy', 100.0, 1001, signature='sig2'))
+    db.close()
+
+    # 重启后内存中的集合为空, 按唯一索引查表
+    db = TokenDatabase(db_path, batch_size=100)
+    db._recent_trades_limit = 1
+    try:
+        assert db.add_trade(_trade('W1', 'T1', 'buy', 100.0, 1000, signature='sig1')) is False
+        assert db.add_trade(_trade('W1', 'T1', 'buy', 100.0, 1002, signature='sig3')) is True
+        db.flush()
+        # sig1 已被淘汰出集合
+        assert db.add_trade(_trade('W1', 'T1', 'buy', 100.0, 1000, signature='sig1')) is False
+    finally:
+        db.close()
+
+
+def test_failed_batch_buffer_is_capped(db_path, monkeypatch):
+    db = TokenDatabase(db_path, batch_size=1000, flush_interval_ms=3600 * 1000)
+    db._max_pending = 3
+    try:
+        for i in range(5):
+            db.add_trade(_trade('W1', 'T1', 'buy', 1.0, i, signature=f'sig{i}'))
+        monkeypatch.setattr('database.INSERT_TRADE_SQL', 'INSERT INTO missing_table VALUES (?)')
+        assert db.flush() == 0
+        # 只保留最新的 3 行
+        assert [row[-1] for row in db._pending_trades] == ['sig2', 'sig3', 'sig4']
+        monkeypatch.undo()
+        assert db.flush() == 3
+    finally:
+        db.close()
@@ -0,0 +1,108 @@
+import threading
+from metrics import get_registry
+
+
+class TraderAggregator:
+    """
+    交易者统计的延迟写入
+    按 (交易者, 代币) 在内存中累计自上次写入以来的增量, 定时把有变化的行在一个事务中累加到 trader_stats 表
+    """
+
+    def __init__(self, db, flush_interval=1.0):
+        self.db = db
+        self.flush_interval = flush_interval
+
+        self._dirty = {}  # {(trader_address, token_address): [买入量, 卖出量, 交易次数, 最后交易时间]}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {'trades': 0, 'flushed': 0, 'errors': 0}
+
+        registry = get_registry()
+        registry.gauge('trader_stats_dirty', '等待写入的交易者统计行数', fn=lambda: len(self._dirty))
+        self._m_flushed = registry.counter('trader_stats_flushed_total', '写入数据库的交易者统计行数')
+
+    def update(self, trade_info):
+        """由持久化阶段对每笔入库的交易调用, 数量与 TraderStats 一致按代币数量统计"""
+        key = (trade_info['trader_address'], trade_info['token_address'])
+        amount = trade_info['token_amount'] or 0.0
+        with self._lock:
+            self.stats['trades'] += 1
+            delta = self._dirty.get(key)
+            if delta is None:
+                delta = self._dirty[key] = [0.0, 0.0, 0, 0]
+            if trade_info['type'] == 'buy':
+                delta[0] += amount
+            else:
+                delta[1] += amount
+            delta[2] += 1
+            if trade_info['timestamp'] > delta[3]:
+                delta[3] = trade_info['timestamp']
+
+    def _merge(self, dirty):
+        # 写入失败的增量放回去, 与之后的增量合并
+        for key, (buy, sell, count, last) in dirty.items():
+            delta = self._dirty.get(key)
+            if delta is None:
+                self._dirty[key] = [buy, sell, count, last]
+            else:
+                delta[0] += buy
+                delta[1] += sell
+                delta[2] += count
+                delta[3] = max(delta[3], last)
+
+    def flush(self):
+        """把有变化的行写入数据库"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        if not dirty:
+            return 0
+        rows = [key + tuple(delta) for key, delta in dirty.items()]
+        try:
+            self.db.upsert_trader_stats(rows)
+        except Exception as e:
+            print(f"写入交易者统计失败: {e}")
+            self.stats['errors'] += 1
+            with self._lock:
+                self._merge(dirty)
+            return 0
+        self.stats['flushed'] += len(rows)
+        self._m_flushed.inc(len(rows))
+        return len(rows)
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+        self.db.close_connection()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._flush_loop, name="trader-stats-flusher")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    # ---- 查询: 先写入未提交的增量, 再走索引读取 ----
+
+    def leaderboard(self, token_address, limit=20):
+        """代币内成交量最大的交易者"""
+        self.flush()
+        return self.db.get_token_leaderboard(token_address, limit)
+
+    def wallet(self, trader_address):
+        """钱包在各代币上的统计"""
+        self.flush()
+        return self.db.get_trader_stats(trader_address)
+
+    def active_traders(self, since_ms, limit=20):
+        """since_ms 之后最活跃的交易者"""
+        self.flush()
+        return self.db.get_active_traders(since_ms, limit)